@@ -0,0 +1,115 @@
+# benchmarks/bench_backends.py
+"""
+Throughput and latency of the OCR backends on synthetic PGS-style subtitle images
+(white text with a black outline on a transparent background).
+
+Gemini runs against the local stand-in API (benchmarks.fake_gemini), so its numbers show the
+pipeline overhead plus the configured network latency; Tesseract runs for real and is skipped
+when the binary is not installed. Per-image latency is the time from the start of the run
+until that image's result arrived.
+
+    python -m benchmarks.bench_backends [--images 200] [--latency 1.5] [--workers N]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from benchmarks.fake_gemini import FakeGeminiAPI
+from src.hedging import percentile
+from src.local_ocr import TesseractBackend
+from src.ocr import GeminiBackend
+from src.subtitle_track import SubtitleTrack
+
+WORDS = ("the", "night", "is", "dark", "and", "full", "of", "terrors", "we", "should", "go", "back",
+         "winter", "is", "coming", "hold", "the", "door", "what", "do", "you", "want", "from", "me")
+
+def render_subtitle(path: str, text: str):
+    from PIL import Image, ImageDraw, ImageFont
+
+    try:
+        font = ImageFont.truetype(os.path.join("assets", "fonts", "NotoSans-Regular.ttf"), 42)
+    except OSError:
+        font = ImageFont.load_default()
+    probe = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = probe.multiline_textbbox((0, 0), text, font=font, stroke_width=3)
+    img = Image.new("RGBA", (right - left + 20, bottom - top + 20), (0, 0, 0, 0))
+    ImageDraw.Draw(img).multiline_text((10 - left, 10 - top), text, font=font, fill=(255, 255, 255, 255),
+                                       stroke_width=3, stroke_fill=(0, 0, 0, 255), align="center")
+    img.save(path)
+
+def make_session(folder: str, count: int, seed: int = 7) -> tuple[SubtitleTrack, list[str]]:
+    rng = random.Random(seed)
+    events, truth = [], []
+    for i in range(count):
+        lines = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 7))).capitalize() for _ in range(rng.randint(1, 2))]
+        text = "\n".join(lines)
+        name = f"sub_{i:05d}.png"
+        render_subtitle(os.path.join(folder, name), text)
+        events.append({"start_ms": i * 3000, "end_ms": i * 3000 + 2000, "image_file": name})
+        truth.append(text)
+    return SubtitleTrack.from_events(events), truth
+
+def word_accuracy(expected: str, actual: str) -> float:
+    want, got = expected.lower().split(), actual.lower().split()
+    return sum(1 for a, b in zip(want, got) if a == b) / max(1, len(want))
+
+def run_backend(label: str, backend, track: SubtitleTrack, truth: list[str], folder: str, check_text: bool):
+    arrivals, texts, failed = {}, {}, []
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def on_result(index, text, confidence):
+        with lock:
+            arrivals.setdefault(index, time.perf_counter() - start)
+            texts[index] = text
+
+    def on_failed(indices):
+        failed.extend(indices)
+
+    error = backend.recognize(track, list(range(len(track))), folder, threading.Event(), on_result, on_failed)
+    elapsed = time.perf_counter() - start
+    backend.close()
+    if error:
+        print(f"{label:<22} skipped: {error}")
+        return
+    latencies = list(arrivals.values()) or [0.0]
+    line = (f"{label:<22} {elapsed:7.2f} s  {len(arrivals) / elapsed:7.1f} img/s  "
+            f"first {min(latencies):6.2f} s  p50 {percentile(latencies, 50):6.2f} s  p95 {percentile(latencies, 95):6.2f} s  "
+            f"{len(failed)} failed")
+    if check_text:
+        accuracy = sum(word_accuracy(truth[i], texts.get(i, "")) for i in range(len(truth))) / max(1, len(truth))
+        line += f"  word accuracy {accuracy:.1%}"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=1.5, help="fake Gemini seconds per request")
+    parser.add_argument("--latency-per-image", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=None, help="Tesseract processes (default: core count)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        track, truth = make_session(folder, args.images)
+        logs = os.path.join(folder, "logs")
+        os.makedirs(logs)
+        print(f"{args.images} synthetic subtitle images, {os.cpu_count()} cores")
+
+        api = FakeGeminiAPI(latency=args.latency, latency_per_image=args.latency_per_image)
+        cwd = os.getcwd()
+        os.chdir(folder) # thống kê BatchPlanner ghi vào app_data của thư mục tạm
+        try:
+            gemini = GeminiBackend("key", "gemini-2.5-flash", {}, [], args.batch_size, 3, "OCR prompt", logs,
+                                   stream=True, model_factory=api.model_factory)
+            run_backend("gemini (stand-in API)", gemini, track, truth, folder, check_text=False)
+        finally:
+            os.chdir(cwd)
+        run_backend("tesseract (local)", TesseractBackend("English", args.workers), track, truth, folder, check_text=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/bench_parsers.py
+"""
+Benchmark for the timing-file parsers on synthetic 50k-event files.
+
+Compares the streaming parsers in src.utils against a full-tree baseline
+(ET.parse / lxml.html) and reports wall time and peak Python heap usage.
+
+    python -m benchmarks.bench_parsers [--events 50000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+from src.utils import iter_bdsup2sub_xml, iter_subtitle_edit_html, ms_to_srt_time, format_time_for_srt
+
+def _tc(ms: int, fps: int = 24) -> str:
+    s, rem = divmod(ms, 1000)
+    m, s = divmod(s, 60)
+    h, m = divmod(m, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}:{rem * fps // 1000:02d}"
+
+def write_synthetic_xml(path: str, count: int):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<BDN Version="0.93">\n')
+        f.write('<Description><Format VideoFormat="1080p" FrameRate="23.976" DropFrame="False"/></Description>\n<Events>\n')
+        for i in range(count):
+            start = i * 3000
+            f.write(f'<Event InTC="{_tc(start)}" OutTC="{_tc(start + 2000)}" Forced="False">'
+                    f'<Graphic Width="1200" Height="90" X="360" Y="950">temp_{i + 1:05d}.png</Graphic></Event>\n')
+        f.write('</Events>\n</BDN>\n')
+
+def write_synthetic_html_table(path: str, count: int):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<html><body><table>\n<tr><th>#</th><th>Time</th><th>Dur</th><th>Text</th><th>Image</th></tr>\n')
+        for i in range(count):
+            start = i * 3000
+            f.write(f'<tr><td>{i + 1}</td><td>{ms_to_srt_time(start)} --> {ms_to_srt_time(start + 2000)}</td>'
+                    f'<td>2.0</td><td></td><td><img src="{i + 1:05d}.png"></td></tr>\n')
+        f.write('</table></body></html>\n')
+
+def write_synthetic_html_body(path: str, count: int):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<html><body>\n')
+        for i in range(count):
+            start = i * 3000
+            f.write(f"<div>#{i + 1}:{ms_to_srt_time(start).replace(',', '.')}->{ms_to_srt_time(start + 2000).replace(',', '.')}"
+                    f"<br /><img src='{i + 1:05d}.png' /></div>\n")
+        f.write('</body></html>\n')
+
+def baseline_xml(path: str) -> list:
+    """Full-tree parse, as parse_bdsup2sub_xml did before the streaming rewrite."""
+    root = ET.parse(path).getroot()
+    frame_rate = float(root.find('Description/Format').get('FrameRate', '23.976'))
+    events = []
+    for event in root.findall('Events/Event'):
+        graphic = event.find('Graphic')
+        if graphic is not None and graphic.text:
+            events.append({'start_srt': format_time_for_srt(event.get('InTC'), frame_rate),
+                           'end_srt': format_time_for_srt(event.get('OutTC'), frame_rate),
+                           'image_file': graphic.text.strip()})
+    return events
+
+def baseline_html(path: str) -> list:
+    from lxml import html
+    with open(path, 'r', encoding='utf-8') as f:
+        doc = html.fromstring(f.read())
+    events = []
+    for row in doc.findall('.//tr')[1:]:
+        cols = row.findall('.//td')
+        start_srt, end_srt = [t.strip() for t in cols[1].text_content().split('-->')]
+        events.append({'start_srt': start_srt, 'end_srt': end_srt, 'image_file': cols[4].find('.//img').get('src')})
+    return events
+
+def measure(label: str, func, path: str):
+    # Thời gian và bộ nhớ được đo ở hai lượt riêng vì tracemalloc làm chậm code tạo nhiều object
+    started = time.perf_counter()
+    count = sum(1 for _ in func(path))
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    for _ in func(path): pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<34} {count:>8} events  {elapsed * 1000:>9.1f} ms  peak {peak / 1e6:>8.2f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = os.path.join(tmp, "synthetic.xml")
+        table_path = os.path.join(tmp, "synthetic_table.html")
+        body_path = os.path.join(tmp, "synthetic_body.html")
+        write_synthetic_xml(xml_path, args.events)
+        write_synthetic_html_table(table_path, args.events)
+        write_synthetic_html_body(body_path, args.events)
+
+        measure("XML   ET.parse (baseline)", baseline_xml, xml_path)
+        measure("XML   iterparse (streaming)", iter_bdsup2sub_xml, xml_path)
+        try:
+            measure("HTML  lxml.html tree (baseline)", baseline_html, table_path)
+            measure("HTML  table iterparse (streaming)", iter_subtitle_edit_html, table_path)
+        except ImportError:
+            print("lxml not installed; skipping HTML table benchmark.")
+        measure("HTML  body-text (streaming)", iter_subtitle_edit_html, body_path)
+
+if __name__ == "__main__":
+    main()
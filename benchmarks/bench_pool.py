@@ -0,0 +1,75 @@
+# benchmarks/bench_pool.py
+"""
+OCR throughput with one API key versus a pool of keys/models, against the local stand-in API.
+
+The pool run includes an invalid key and a key with a tight requests-per-minute quota, so the
+output also shows members being taken out of rotation while the others keep working.
+
+    python -m benchmarks.bench_pool [--images 400] [--latency 0.3]
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.fake_gemini import FakeGeminiAPI
+from src.ocr import run_ocr_pipeline
+from src.subtitle_track import SubtitleTrack
+
+def make_session(folder: str, count: int) -> SubtitleTrack:
+    images = os.path.join(folder, "images")
+    os.makedirs(images, exist_ok=True)
+    events = []
+    for i in range(count):
+        name = f"sub_{i:05d}.png"
+        with open(os.path.join(images, name), "wb") as f:
+            f.write(os.urandom(1500 + (i * 37) % 3000))
+        events.append({"start_ms": i * 3000, "end_ms": i * 3000 + 2000, "image_file": name})
+    return SubtitleTrack.from_events(events)
+
+def run(label: str, api: FakeGeminiAPI, api_pool: list, count: int, batch_size: int) -> dict:
+    with tempfile.TemporaryDirectory() as folder:
+        track = make_session(folder, count)
+        logs = os.path.join(folder, "logs")
+        os.makedirs(logs)
+        cwd = os.getcwd()
+        os.chdir(folder) # thống kê BatchPlanner ghi vào app_data của thư mục tạm
+        try:
+            failed = set()
+            start = time.perf_counter()
+            _, message = run_ocr_pipeline(
+                track, os.path.join(folder, "images"), logs, "key-main", "gemini-2.5-flash", {}, [],
+                batch_size, 5, "OCR prompt", threading.Event(), None, None, failed,
+                api_pool=api_pool, model_factory=api.model_factory,
+            )
+            elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+    done = sum(1 for e in track if e["text"])
+    print(f"{label:<28} {elapsed:7.2f} s  {done / elapsed:7.1f} img/s  {done}/{count} done, "
+          f"{len(failed)} failed, {api.total_calls()} calls, errors {dict(api.errors)}  ({message})")
+    return {"elapsed": elapsed, "done": done}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=400)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    single = run("single key", FakeGeminiAPI(latency=args.latency), [], args.images, args.batch_size)
+    pool = [
+        {"api_key": "key-a", "max_concurrent": 2},
+        {"api_key": "key-b", "max_concurrent": 2},
+        {"api_key": "key-quota", "max_concurrent": 2},
+        {"api_key": "key-revoked"},
+        {"api_key": "key-a", "model": "gemini-2.5-flash-lite", "rpm": 30},
+    ]
+    api = FakeGeminiAPI(latency=args.latency, bad_keys={"key-revoked"}, key_rpm={"key-quota": 3})
+    pooled = run("pool (5 members, 2 unhealthy)", api, pool, args.images, args.batch_size)
+    print(f"Speedup: {single['elapsed'] / pooled['elapsed']:.2f}x")
+
+if __name__ == "__main__":
+    main()
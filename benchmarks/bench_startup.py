@@ -0,0 +1,110 @@
+# benchmarks/bench_startup.py
+"""
+Startup cost of the GUI: import-time breakdown of `src.gui` by package, a check that
+the heavy, subsystem-specific dependencies stay unloaded until first use, and time to the first
+drawn frame of SubtitlePreviewer. Each measurement runs in a fresh interpreter. Exits with
+status 1 when a budget is exceeded, so it can gate a CI job.
+
+    python -m benchmarks.bench_startup [--import-budget-ms 800] [--frame-budget-ms 2500] [--module src.gui]
+
+Time to first frame needs a display; without one it is skipped (not failed).
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+# Chỉ được nạp khi dùng tới: gọi API Gemini, phân tích hardsub, đọc XML BDSup2Sub
+DEFERRED_MODULES = ("google.generativeai", "cv2", "lxml", "bs4", "tqdm")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_LOADED_CHECK = """
+import sys, json, importlib
+importlib.import_module({module!r})
+print(json.dumps([m for m in {deferred!r} if m in sys.modules]))
+"""
+
+_FIRST_FRAME = """
+import time
+started = time.perf_counter()
+from src.gui import SubtitlePreviewer
+imported = time.perf_counter()
+app = SubtitlePreviewer()
+app.update()
+print(f"{(imported - started) * 1000:.1f} {(time.perf_counter() - started) * 1000:.1f}")
+app.destroy()
+"""
+
+def _run(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True)
+
+def import_breakdown(module: str) -> tuple[float, list[tuple[str, float]]]:
+    """Total import time of `module` in ms and the time spent in each top-level package's own modules."""
+    result = _run(f"import {module}", "-X", "importtime")
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    per_package = defaultdict(float)
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line: continue
+        own, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit(): continue # dòng tiêu đề
+        # Cộng thời gian riêng (self) theo gói để không tính trùng gói con; tổng lấy cumulative của import cấp cao nhất
+        per_package[name.strip().split(".")[0]] += int(own.replace("import time:", "")) / 1000
+        if not name[1:].startswith(" "): total += int(cumulative) / 1000
+    return total, sorted(per_package.items(), key=lambda item: -item[1])
+
+def loaded_deferred(module: str) -> list[str]:
+    result = _run(_LOADED_CHECK.format(module=module, deferred=DEFERRED_MODULES))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def first_frame() -> tuple[float, float] | None:
+    """(import ms, first frame ms) of the real window, or None without a display."""
+    if sys.platform.startswith("linux") and not os.environ.get("DISPLAY"): return None
+    result = _run(_FIRST_FRAME)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    imported, frame = result.stdout.strip().splitlines()[-1].split()
+    return float(imported), float(frame)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="src.gui", help="module whose import cost is measured")
+    parser.add_argument("--import-budget-ms", type=float, default=800)
+    parser.add_argument("--frame-budget-ms", type=float, default=2500)
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args()
+    failures = []
+
+    total, packages = import_breakdown(args.module)
+    print(f"import {args.module}: {total:.0f} ms (budget {args.import_budget_ms:.0f} ms)")
+    for name, ms in packages[:args.top]:
+        print(f"  {name:<28} {ms:8.1f} ms")
+    if total > args.import_budget_ms:
+        failures.append(f"import time {total:.0f} ms > {args.import_budget_ms:.0f} ms")
+
+    loaded = loaded_deferred(args.module)
+    print(f"deferred dependencies loaded at startup: {', '.join(loaded) or 'none'}")
+    if loaded:
+        failures.append(f"loaded at import: {', '.join(loaded)}")
+
+    frame = first_frame()
+    if frame is None:
+        print("time to first frame: skipped (no display)")
+    else:
+        print(f"time to first frame: {frame[1]:.0f} ms (imports {frame[0]:.0f} ms, budget {args.frame_budget_ms:.0f} ms)")
+        if frame[1] > args.frame_budget_ms:
+            failures.append(f"first frame {frame[1]:.0f} ms > {args.frame_budget_ms:.0f} ms")
+
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
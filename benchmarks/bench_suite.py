@@ -0,0 +1,236 @@
+# benchmarks/bench_suite.py
+"""
+Offline end-to-end benchmark suite. Everything runs on synthetic input and the local
+stand-in API (benchmarks.fake_gemini), so no quota is spent and runs are repeatable:
+
+    parsers     parse_bdsup2sub_xml / parse_subtitle_edit_html on generated timing files
+    ocr_*       run_ocr_pipeline on rendered subtitle PNGs + BDSup2Sub-style XML, once per
+                API profile (clean, server errors, slow tail, truncated output)
+    hardsub     run_hardsub_pipeline on a generated video with burned-in top/bottom text
+                (skipped without OpenCV or the EAST model)
+
+Results are written as JSON with the commit they were measured on; --compare reads an earlier
+result file, prints the change per metric and exits with status 1 when a scenario got slower
+than --tolerance.
+
+    python -m benchmarks.bench_suite [--images 240] [--output results.json] [--compare baseline.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from benchmarks.bench_backends import render_subtitle, WORDS
+from benchmarks.bench_parsers import write_synthetic_xml, write_synthetic_html_body
+from benchmarks.fake_gemini import FakeGeminiAPI
+from src.ocr import run_ocr_pipeline
+from src.subtitle_track import SubtitleTrack
+from src.utils import parse_bdsup2sub_xml, parse_subtitle_edit_html
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_VERSION = 1
+# Hồ sơ API giả cho từng kịch bản OCR: lỗi máy chủ, đuôi độ trễ dài, đầu ra bị cắt (MAX_TOKENS)
+API_PROFILES = {
+    "clean": {},
+    "errors": {"error_rate": 0.15},
+    "slow_tail": {"slow_fraction": 0.1, "slow_factor": 8.0},
+    "truncated": {"max_output_tokens": 120},
+}
+# Chỉ số mà giá trị lớn hơn là tệ hơn; --compare dựa vào đây để báo hồi quy
+LOWER_IS_BETTER = ("seconds", "failed", "calls")
+PARSER_REPEATS = 3
+
+def git_commit() -> str | None:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+def make_softsub_session(folder: str, count: int, seed: int = 7) -> str:
+    """Rendered subtitle PNGs named like BDSup2Sub output plus the matching XML; returns the XML path."""
+    rng = random.Random(seed)
+    for i in range(count):
+        text = "\n".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 7))).capitalize() for _ in range(rng.randint(1, 2)))
+        render_subtitle(os.path.join(folder, f"temp_{i + 1:05d}.png"), text)
+    xml_path = os.path.join(folder, "synthetic.xml")
+    write_synthetic_xml(xml_path, count)
+    return xml_path
+
+def make_hardsub_video(path: str, seconds: int, fps: int = 10, size: tuple[int, int] = (640, 360)) -> int:
+    """
+    Video with a moving background and burned-in text: a bottom line shown 2 s out of every 3 s
+    and a top line every 6 s. Returns the number of subtitle events drawn.
+    """
+    import cv2
+    import numpy as np
+
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    events = set()
+    for frame_idx in range(seconds * fps):
+        t = frame_idx / fps
+        frame = np.full((height, width, 3), 40, np.uint8)
+        cv2.rectangle(frame, (int(t * 40) % width, 120), (int(t * 40) % width + 80, 220), (90, 120, 160), -1)
+        if t % 3 < 2:
+            events.add(("bottom", int(t // 3)))
+            cv2.putText(frame, f"Bottom line number {int(t // 3)}", (60, height - 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 3)
+        if t % 6 < 2:
+            events.add(("top", int(t // 6)))
+            cv2.putText(frame, f"Sign {int(t // 6)}", (240, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 0), 3)
+        writer.write(frame)
+    writer.release()
+    return len(events)
+
+def bench_parsers(folder: str, count: int) -> dict:
+    xml_path = os.path.join(folder, "parsers.xml")
+    html_path = os.path.join(folder, "parsers.html")
+    write_synthetic_xml(xml_path, count)
+    write_synthetic_html_body(html_path, count)
+    result = {}
+    for name, func, path in (("xml", parse_bdsup2sub_xml, xml_path), ("html", parse_subtitle_edit_html, html_path)):
+        # Lấy lần nhanh nhất trong PARSER_REPEATS lần để giảm nhiễu giữa các lần chạy
+        timings = []
+        for _ in range(PARSER_REPEATS):
+            started = time.perf_counter()
+            events = func(path) or []
+            timings.append(time.perf_counter() - started)
+        result[f"{name}_seconds"] = min(timings)
+        result[f"{name}_events"] = len(events)
+    return result
+
+def bench_ocr(folder: str, xml_path: str, profile: dict, latency: float, batch_size: int) -> dict:
+    track = SubtitleTrack.from_events(parse_bdsup2sub_xml(xml_path))
+    # Thư mục làm việc riêng cho mỗi kịch bản: thống kê BatchPlanner trong app_data không được mang sang kịch bản sau
+    workdir = tempfile.mkdtemp(prefix="run-", dir=os.path.dirname(folder))
+    logs = os.path.join(workdir, "logs")
+    os.makedirs(logs)
+    api = FakeGeminiAPI(latency=latency, latency_per_image=latency / 50, **profile)
+    failed = set()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        started = time.perf_counter()
+        _, message = run_ocr_pipeline(
+            track, folder, logs, "key-main", "gemini-2.5-flash", {}, [],
+            batch_size, 5, "OCR prompt", threading.Event(), None, None, failed,
+            model_factory=api.model_factory,
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        os.chdir(cwd)
+    done = sum(1 for text in track.texts if text)
+    return {"seconds": elapsed, "images_per_second": done / elapsed if elapsed else 0.0, "done": done,
+            "failed": len(failed), "calls": api.total_calls(), "input_tokens": api.input_tokens,
+            "output_tokens": api.output_tokens, "errors": dict(api.errors), "message": message}
+
+def bench_hardsub(folder: str, seconds: int) -> dict:
+    try:
+        from src.hardsub_processor import run_hardsub_pipeline, EAST_MODEL_PATH
+    except ImportError as e:
+        return {"skipped": f"OpenCV not available ({e})"}
+    if not os.path.exists(os.path.join(REPO_ROOT, EAST_MODEL_PATH)):
+        return {"skipped": f"{EAST_MODEL_PATH} not found"}
+    video_path = os.path.join(folder, "hardsub.mp4")
+    expected = make_hardsub_video(video_path, seconds)
+    images = os.path.join(folder, "hardsub_images")
+    os.makedirs(images, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(REPO_ROOT) # EAST_MODEL_PATH là đường dẫn tương đối
+    try:
+        started = time.perf_counter()
+        subtitles, error = run_hardsub_pipeline(video_path, images, {"use_gpu": False}, None, threading.Event())
+        elapsed = time.perf_counter() - started
+    finally:
+        os.chdir(cwd)
+    if error:
+        return {"skipped": error}
+    return {"seconds": elapsed, "frames_per_second": seconds * 10 / elapsed, "events": len(subtitles or []), "expected_events": expected}
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Prints the change of every shared numeric metric; returns the regressions beyond `tolerance`."""
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} ({baseline.get('timestamp', '?')}):")
+    for scenario, metrics in current["results"].items():
+        old = baseline.get("results", {}).get(scenario, {})
+        for key, value in metrics.items():
+            before = old.get(key)
+            if not isinstance(value, (int, float)) or not isinstance(before, (int, float)) or not before: continue
+            change = (value - before) / before
+            print(f"  {scenario + '.' + key:<36} {before:>12.4g} -> {value:<12.4g} {change:+7.1%}")
+            if key.endswith(LOWER_IS_BETTER) and change > tolerance:
+                regressions.append(f"{scenario}.{key} {change:+.1%}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=240, help="synthetic subtitle images for the OCR scenarios")
+    parser.add_argument("--events", type=int, default=20000, help="events in the synthetic parser inputs")
+    parser.add_argument("--batch-size", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake Gemini seconds per request")
+    parser.add_argument("--video-seconds", type=int, default=30)
+    parser.add_argument("--only", nargs="*", help="scenario names to run (default: all)")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown before --compare fails")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline log output")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR, format="%(levelname)s %(message)s")
+
+    # Backoff giữa các lần thử lại được giữ nguyên: đó là một phần chi phí của kịch bản 'errors'
+    wanted = lambda name: not args.only or name in args.only
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        if wanted("parsers"):
+            results["parsers"] = bench_parsers(folder, args.events)
+        ocr_names = [f"ocr_{name}" for name in API_PROFILES if wanted(f"ocr_{name}")]
+        if ocr_names:
+            session = os.path.join(folder, "session")
+            os.makedirs(session)
+            xml_path = make_softsub_session(session, args.images)
+            for name in ocr_names:
+                results[name] = bench_ocr(session, xml_path, API_PROFILES[name[4:]], args.latency, args.batch_size)
+        if wanted("hardsub"):
+            results["hardsub"] = bench_hardsub(folder, args.video_seconds)
+
+    for scenario, metrics in results.items():
+        shown = ", ".join(f"{k} {v:.3g}" if isinstance(v, float) else f"{k} {v}" for k, v in metrics.items() if k != "message")
+        print(f"{scenario:<16} {shown}")
+
+    report = {
+        "version": RESULTS_VERSION,
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("only", "output", "compare", "tolerance", "verbose")},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("Warning: baseline was measured with different settings; numbers may not be comparable.")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("FAIL: " + "; ".join(regressions))
+            sys.exit(1)
+        print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# benchmarks/fake_gemini.py
+"""
+Local stand-in for the google.generativeai model API, used by the benchmarks.
+
+FakeGeminiAPI.model_factory(api_key, model_name) can be passed anywhere the pipeline takes a
+model_factory (see src.model_pool.make_model). Models answer OCR batches with a JSON array
+shaped like the real prompt's output, honour stream=True, and can be configured per key and
+per model with latency, random server errors, invalid keys, requests-per-minute quotas and
+output truncation.
+"""
+
+import json
+import random
+import threading
+import time
+from collections import defaultdict, deque
+
+TOKENS_PER_IMAGE = 258 # Gemini tính một ảnh nhỏ ~258 token đầu vào
+
+class FakeAPIError(Exception):
+    """Carries the same 'HTTP status + message' text as google.api_core exceptions."""
+
+class _FinishReason:
+    def __init__(self, name: str, value: int):
+        self.name = name
+        self.value = value
+
+    def __eq__(self, other):
+        return other == self.value or other is self
+
+    __hash__ = object.__hash__
+
+STOP = _FinishReason("STOP", 1)
+MAX_TOKENS = _FinishReason("MAX_TOKENS", 2)
+
+class _Usage:
+    def __init__(self, prompt_tokens: int, output_tokens: int, cached_tokens: int = 0):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.cached_content_token_count = cached_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+class _Candidate:
+    def __init__(self, finish_reason):
+        self.finish_reason = finish_reason
+
+class FakeResponse:
+    def __init__(self, text: str | None, usage: _Usage | None = None, finish_reason=None):
+        self._text = text
+        self.usage_metadata = usage
+        self.candidates = [_Candidate(finish_reason)] if finish_reason is not None else []
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            raise ValueError("The response has no text parts.")
+        return self._text
+
+def estimate_text_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+class FakeModel:
+    def __init__(self, api: "FakeGeminiAPI", api_key: str, model_name: str, system_instruction: str | None = None, cached_content=None):
+        self.api = api
+        self.api_key = api_key
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.cached_content = cached_content
+
+    def generate_content(self, contents, generation_config=None, safety_settings=None, stream=False):
+        api = self.api
+        api.check_request(self.api_key, self.model_name)
+        images = [part for part in contents if isinstance(part, dict)]
+        prompt_text = "".join(part for part in contents if isinstance(part, str))
+        if self.system_instruction:
+            prompt_text += self.system_instruction
+        cached_tokens = self.cached_content.token_count if self.cached_content is not None else 0
+        prompt_tokens = estimate_text_tokens(prompt_text) + cached_tokens + TOKENS_PER_IMAGE * len(images)
+
+        entries = [{"index": i, "text": api.text_for(part)} for i, part in enumerate(images)]
+        text = json.dumps(entries, ensure_ascii=False)
+        max_output = (generation_config or {}).get("max_output_tokens") or api.max_output_tokens
+        finish_reason = STOP
+        if estimate_text_tokens(text) > max_output:
+            text = text[:max_output * 4]
+            finish_reason = MAX_TOKENS
+        usage = _Usage(prompt_tokens, estimate_text_tokens(text), cached_tokens)
+        api.record(self.api_key, self.model_name, usage)
+
+        latency = api.latency_for(self.model_name, len(images))
+        if not stream:
+            api.sleep(latency)
+            return FakeResponse(text, usage, finish_reason)
+        return self._stream(text, usage, finish_reason, latency)
+
+    def _stream(self, text, usage, finish_reason, latency):
+        api = self.api
+        step = max(1, api.chunk_chars)
+        chunk_count = max(1, -(-len(text) // step))
+        api.sleep(latency * 0.3) # thời gian đến chunk đầu tiên
+        for k in range(0, len(text), step):
+            if api.stall_after_chars is not None and k >= api.stall_after_chars:
+                api.sleep(api.stall_seconds)
+            yield FakeResponse(text[k:k + step])
+            api.sleep(latency * 0.7 / chunk_count)
+        yield FakeResponse(None, usage, finish_reason)
+
+class FakeCachedContent:
+    """Minimal stand-in for genai.caching.CachedContent."""
+
+    def __init__(self, name: str, model: str, system_instruction: str, ttl_seconds: float):
+        self.name = name
+        self.model = model
+        self.system_instruction = system_instruction
+        self.token_count = estimate_text_tokens(system_instruction)
+        self.expire_time = time.time() + ttl_seconds
+
+    def delete(self):
+        pass
+
+class FakeGeminiAPI:
+    """
+    Configurable fake service. All knobs are plain attributes so a benchmark can change
+    them between runs:
+
+        latency        seconds per request (plus latency_per_image * images)
+        model_latency  {model_name: seconds} overrides `latency`
+        slow_fraction  share of requests that take slow_factor times longer (tail latency)
+        error_rate     share of requests failing with a 500
+        bad_keys       keys rejected with an auth error
+        key_rpm        {api_key: requests per minute} before 429s
+        max_output_tokens  default output cap when the request sets none
+        min_cache_tokens   context caches smaller than this are refused, like the real API
+    """
+
+    def __init__(self, latency: float = 0.05, latency_per_image: float = 0.0, error_rate: float = 0.0,
+                 slow_fraction: float = 0.0, slow_factor: float = 10.0, max_output_tokens: int = 8192,
+                 bad_keys=(), key_rpm: dict | None = None, model_latency: dict | None = None,
+                 chunk_chars: int = 64, seed: int = 1234, time_scale: float = 1.0, min_cache_tokens: int = 1024):
+        self.latency = latency
+        self.latency_per_image = latency_per_image
+        self.error_rate = error_rate
+        self.slow_fraction = slow_fraction
+        self.slow_factor = slow_factor
+        self.max_output_tokens = max_output_tokens
+        self.bad_keys = set(bad_keys)
+        self.key_rpm = dict(key_rpm or {})
+        self.model_latency = dict(model_latency or {})
+        self.chunk_chars = chunk_chars
+        self.stall_after_chars = None
+        self.stall_seconds = 0.0
+        self.time_scale = time_scale
+        self.min_cache_tokens = min_cache_tokens
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = defaultdict(deque)
+        self.calls = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.input_tokens = 0
+        self.cached_tokens = 0
+        self.output_tokens = 0
+        self.caches = {}
+
+    def model_factory(self, api_key: str, model_name: str, **kwargs) -> FakeModel:
+        return FakeModel(self, api_key, model_name, **kwargs)
+
+    def cache_factory(self, api_key: str, model_name: str, system_instruction: str, ttl_seconds: float = 3600) -> FakeCachedContent:
+        """Same signature as src.model_pool.create_cached_content."""
+        if api_key in self.bad_keys:
+            raise FakeAPIError("400 API key not valid. Please pass a valid API key.")
+        tokens = estimate_text_tokens(system_instruction)
+        if tokens < self.min_cache_tokens:
+            raise FakeAPIError(f"400 Cached content is too small. total_token_count={tokens}, min_total_token_count={self.min_cache_tokens}")
+        with self._lock:
+            cache = FakeCachedContent(f"cachedContents/fake-{len(self.caches) + 1}", model_name, system_instruction, ttl_seconds)
+            self.caches[cache.name] = cache
+        return cache
+
+    def cache_deleter(self, api_key: str, cache: FakeCachedContent):
+        with self._lock:
+            self.caches.pop(cache.name, None)
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            # Event.wait thay cho time.sleep để benchmark có thể vá time.sleep của pipeline (backoff) mà không ảnh hưởng
+            threading.Event().wait(seconds * self.time_scale)
+
+    def text_for(self, part: dict) -> str:
+        data = part.get("data", "")
+        return f"Subtitle line {len(data) % 997}"
+
+    def latency_for(self, model_name: str, images: int) -> float:
+        with self._lock:
+            slow = self._random.random() < self.slow_fraction
+        base = self.model_latency.get(model_name, self.latency) + self.latency_per_image * images
+        return base * (self.slow_factor if slow else 1.0)
+
+    def check_request(self, api_key: str, model_name: str):
+        with self._lock:
+            if api_key in self.bad_keys:
+                self.errors["auth"] += 1
+                raise FakeAPIError("400 API key not valid. Please pass a valid API key.")
+            rpm = self.key_rpm.get(api_key)
+            if rpm:
+                now = time.monotonic()
+                window = self._recent[api_key]
+                while window and now - window[0] >= 60 * self.time_scale:
+                    window.popleft()
+                if len(window) >= rpm:
+                    self.errors["quota"] += 1
+                    raise FakeAPIError("429 Resource has been exhausted (e.g. check quota).")
+                window.append(now)
+            if self._random.random() < self.error_rate:
+                self.errors["server"] += 1
+                raise FakeAPIError("500 An internal error has occurred.")
+            self.calls[(api_key, model_name)] += 1
+
+    def record(self, api_key: str, model_name: str, usage: _Usage):
+        with self._lock:
+            self.input_tokens += usage.prompt_token_count
+            self.cached_tokens += usage.cached_content_token_count
+            self.output_tokens += usage.candidates_token_count
+
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
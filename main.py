@@ -1,9 +1,12 @@
 # main.py
 
 import logging
+import multiprocessing
 from src.gui import SubtitlePreviewer
 
 if __name__ == "__main__":
+    # Cần cho process pool (probe ffprobe) khi chạy bản đóng gói PyInstaller trên Windows
+    multiprocessing.freeze_support()
     # Cấu hình logging cơ bản để ghi ra file và console
     logging.basicConfig(level=logging.INFO, 
                         format='%(asctime)s - %(levelname)s - %(message)s',
@@ -15,4 +18,5 @@ if __name__ == "__main__":
     logging.info("Khởi động ứng dụng.")
     app = SubtitlePreviewer()
     app.mainloop()
+    app.app_context.release_session_lock()
     logging.info("Ứng dụng đã đóng.")
@@ -9,11 +9,22 @@ import logging
 from datetime import datetime
 import threading
 
-from src.settings import load_settings, save_settings, TEMP_DIR_NAME
+from src.settings import load_settings, get_settings_store, TEMP_DIR_NAME
 from src.video_processor import inspect_video_subtitles, extract_pgs_subtitles
-from src.ocr import run_ocr_pipeline, get_available_models
+from src.ocr import run_ocr_pipeline, get_available_models, BATCH_LOG_PATTERN
 from src.utils import parse_bdsup2sub_xml, parse_subtitle_edit_html
-from src.hardsub_processor import run_hardsub_pipeline
+from src.subtitle_track import SubtitleTrack
+from src.session_catalog import SessionCatalog, directory_size, lock_session_dir, unlock_session_dir
+from src.probe_cache import get_video_timing
+from src.subtitle_export import LiveExport, export_track
+from src.model_catalog import ModelCatalog
+from src.payload_cache import get_payload_cache
+from src.telemetry import BatchTelemetry, TELEMETRY_FILE_NAME
+from src.tracing import tracing, trace_path, span
+from src.work_queue import WorkQueue, split_batches, split_segments, merge_segment_events, HARDSUB_SEGMENT_SECONDS
+
+SESSION_TRACK_FILE = "session_track.npz"
+LIVE_EXPORT_NAME = "live_subtitles"
 
 def resource_path(relative_path: str) -> str:
     """ Get absolute path to resource, works for dev and for PyInstaller """
@@ -24,7 +35,7 @@ def resource_path(relative_path: str) -> str:
     return os.path.join(base_path, relative_path)
 
 class AppContext:
-    def __init__(self):
+    def __init__(self, collect_garbage: bool = True):
         self.settings = load_settings()
         self.api_key = self.settings.get("api_key", "")
         self.model_name = self.settings.get("last_model", "")
@@ -32,7 +43,21 @@ class AppContext:
         self.max_retries = self.settings.get("max_retries", 5)
         self.ocr_prompt_template = self._load_ocr_prompt_template()
         self.ocr_language = self.settings.get("ocr_language", "Auto")
+        self.ocr_backend = self.settings.get("ocr_backend", "gemini")
+        self.cascade_confidence = self.settings.get("cascade_confidence", 0.85)
         self.generation_config = self.settings.get("generation_config", {})
+        self.stream_ocr = self.settings.get("stream_ocr", False)
+        self.stream_stall_timeout = self.settings.get("stream_stall_timeout", 90)
+        self.hedge_requests = self.settings.get("hedge_requests", False)
+        self.hedge_model = self.settings.get("hedge_model", "")
+        self.api_pool = self.settings.get("api_pool", [])
+        self.prompt_cache_mode = self.settings.get("prompt_cache", "auto")
+        get_payload_cache(self.settings.get("payload_cache_mb", 256))
+        self.last_ocr_report = None
+        self.trace_jobs = self.settings.get("trace_jobs", False)
+        self.profile_hot_loops = self.settings.get("profile_hot_loops", False)
+        self.work_queue_path = self.settings.get("work_queue_path", "")
+        self.live_export_format = self.settings.get("live_export_format", "srt")
         
         bdsup2sub_setting = self.settings.get("bdsup2sub_path", "assets/BDSup2Sub.jar")
         resolved_path = resource_path(bdsup2sub_setting)
@@ -44,18 +69,28 @@ class AppContext:
 
         self.safety_settings = self.settings.get("safety_settings", [])
 
-        self.subtitles = []
+        self.subtitles = SubtitleTrack()
         self.current_index = -1
         self.image_folder = ""
         self.timing_file_path = ""
         self.current_session_dir = None
+        self.failed_indices = set()
 
         self._ensure_app_temp_dir()
+        self.catalog = SessionCatalog(TEMP_DIR_NAME)
+        self.model_catalog = ModelCatalog(get_available_models)
+        # Job server tắt dọn dẹp tự động: nó dọn app_temp một chỗ, biết được phiên của mọi job đang chạy
+        if collect_garbage:
+            threading.Thread(target=self.collect_session_garbage, daemon=True).start()
 
     def _ensure_app_temp_dir(self):
         os.makedirs(TEMP_DIR_NAME, exist_ok=True)
 
-    def _create_new_session_dir(self, base_name: str) -> str:
+    @property
+    def current_session_name(self) -> str | None:
+        return os.path.basename(os.path.normpath(self.current_session_dir)) if self.current_session_dir else None
+
+    def _create_new_session_dir(self, base_name: str, kind: str = "softsub", source_path: str | None = None, stream_index: int | None = None) -> str:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         safe_base_name = "".join(c for c in base_name if c.isalnum() or c in (' ', '.', '_')).rstrip()
         session_name = f"{safe_base_name}_{timestamp}_{str(uuid.uuid4())[:4]}"
@@ -64,37 +99,107 @@ class AppContext:
         os.makedirs(os.path.join(session_path, "images"), exist_ok=True)
         os.makedirs(os.path.join(session_path, "logs"), exist_ok=True)
         self.current_session_dir = session_path
+        lock_session_dir(session_path)
+        self.catalog.register(session_name, session_path, kind, source_path, stream_index)
         logging.info(f"New session directory created: {session_path}")
         return session_path
 
+    def _record_session_timing(self, timing_file: str):
+        if self.current_session_name:
+            self.catalog.update(self.current_session_name, timing_file=timing_file, event_count=len(self.subtitles),
+                                disk_bytes=directory_size(self.current_session_dir))
+
+    def _save_session_track(self, ocr_completed: bool):
+        """Persists OCR texts with the track so reloading the session does not re-parse every batch log."""
+        if not self.current_session_dir or not self.subtitles: return
+        track_file = os.path.join(self.current_session_dir, SESSION_TRACK_FILE)
+        try:
+            self.subtitles.save(track_file)
+        except Exception as e:
+            logging.error(f"Could not save session track: {e}")
+            return
+        self.catalog.update(
+            self.current_session_name, track_file=track_file, event_count=len(self.subtitles),
+            ocr_done_count=sum(1 for text in self.subtitles.texts if text), ocr_completed=int(ocr_completed),
+            disk_bytes=directory_size(self.current_session_dir),
+        )
+
+    def protected_sessions(self) -> set[str]:
+        """Sessions the cleanup must not remove; read at removal time, not when the cleanup starts."""
+        return {self.current_session_name} if self.current_session_name else set()
+
+    def collect_session_garbage(self, protect=None) -> tuple[list[str], int]:
+        """Applies the temp quota and age limit to app_temp; `protect` (set or callable) defaults to this context's session."""
+        quota_mb = self.settings.get("temp_quota_mb")
+        max_age_days = self.settings.get("temp_max_age_days")
+        try:
+            return self.catalog.collect_garbage(quota_mb * 1024 * 1024 if quota_mb else None, max_age_days, protect or self.protected_sessions)
+        except Exception as e:
+            logging.error(f"Session cleanup failed: {e}")
+            return [], 0
+
+    def release_session_lock(self):
+        """Lets the cleanup consider the current session again (called when it is closed or the app exits)."""
+        if self.current_session_dir: unlock_session_dir(self.current_session_dir)
+
     def cleanup_current_session_temp(self):
+        # Thư mục phiên được giữ lại để có thể tải lại; collect_session_garbage giữ app_temp trong hạn mức
+        self.release_session_lock()
         if self.current_session_dir and os.path.exists(self.current_session_dir):
             try:
-                # shutil.rmtree(self.current_session_dir)
-                logging.info(f"Session directory cleaned up: {self.current_session_dir}")
+                self.catalog.refresh_size(self.current_session_name)
+                logging.info(f"Session closed: {self.current_session_dir}")
+                get_payload_cache().discard_folder(self.current_session_dir)
             except Exception as e:
-                logging.error(f"Error cleaning up session directory: {e}")
+                logging.error(f"Error updating session catalog: {e}")
         # Reset all state variables
         self.current_session_dir = None
         self.image_folder = ""
         self.timing_file_path = ""
-        self.subtitles = []
+        self.subtitles = SubtitleTrack()
         self.current_index = -1
+        self.failed_indices = set()
 
     def update_settings(self, key, value):
         self.settings[key] = value
-        save_settings(self.settings)
+        get_settings_store().set(key, value)
         if key == "api_key": self.api_key = value
         elif key == "last_model": self.model_name = value
         elif key == "batch_size": self.batch_size = value
         elif key == "max_retries": self.max_retries = value
         elif key == "ocr_language": self.ocr_language = value
+        elif key == "ocr_backend": self.ocr_backend = value
+        elif key == "cascade_confidence": self.cascade_confidence = value
         elif key == "generation_config": self.generation_config = value
+        elif key == "stream_ocr": self.stream_ocr = value
+        elif key == "stream_stall_timeout": self.stream_stall_timeout = value
+        elif key == "hedge_requests": self.hedge_requests = value
+        elif key == "hedge_model": self.hedge_model = value
+        elif key == "api_pool": self.api_pool = value
+        elif key == "prompt_cache": self.prompt_cache_mode = value
+        elif key == "payload_cache_mb": get_payload_cache(value)
+        elif key == "trace_jobs": self.trace_jobs = value
+        elif key == "profile_hot_loops": self.profile_hot_loops = value
+        elif key == "work_queue_path": self.work_queue_path = value
+        elif key == "live_export_format": self.live_export_format = value
         elif key == "bdsup2sub_path": self.bdsup2sub_path = value
         elif key == "safety_settings": self.safety_settings = value
 
+    def _trace(self, session_dir: str, job: str):
+        """Trace context for one job: spans go to traces/trace_<job>_<time>.json in the session directory when tracing is on."""
+        return tracing(trace_path(session_dir, job) if self.trace_jobs else None, self.profile_hot_loops)
+
     def get_available_models(self) -> tuple[list, str | None]:
-        return get_available_models(self.api_key)
+        """Fetches the model list from the API and refreshes the cached catalog."""
+        return self.model_catalog.refresh(self.api_key)
+
+    def get_cached_models(self) -> tuple[list | None, bool]:
+        """(models, fresh) for the current API key from the on-disk catalog, without a network call."""
+        return self.model_catalog.cached(self.api_key)
+
+    def validate_model(self, model_name: str | None = None) -> bool | None:
+        """Whether `model_name` (default: the selected model) is available to the API key; None if the catalog is stale."""
+        return self.model_catalog.validate(self.api_key, model_name or self.model_name)
 
     def inspect_video_subtitles(self, video_path: str) -> tuple[list, str | None]:
         return inspect_video_subtitles(video_path)
@@ -102,9 +207,10 @@ class AppContext:
     def extract_subtitles_from_video(self, video_path: str, stream_index: int, progress_callback=None, cancellation_event=None) -> tuple[str | None, str | None, str | None]:
         logging.info(f"Extracting subtitles from {os.path.basename(video_path)} (stream {stream_index})...")
         base_name = os.path.splitext(os.path.basename(video_path))[0]
-        session_dir = self._create_new_session_dir(base_name)
+        session_dir = self._create_new_session_dir(base_name, "softsub", os.path.abspath(video_path), stream_index)
         
-        image_folder, timing_file, error = extract_pgs_subtitles(video_path, stream_index, session_dir, self.bdsup2sub_path, progress_callback, cancellation_event)
+        with self._trace(session_dir, "extract"), span("extract", "app", stream=stream_index):
+            image_folder, timing_file, error = extract_pgs_subtitles(video_path, stream_index, session_dir, self.bdsup2sub_path, progress_callback, cancellation_event)
         
         if error:
             if error != "Extraction cancelled by user.":
@@ -113,7 +219,8 @@ class AppContext:
 
         self.image_folder = image_folder
         self.timing_file_path = timing_file
-        shutil.copy(timing_file, os.path.join(session_dir, os.path.basename(timing_file)))
+        session_timing_path = os.path.join(session_dir, os.path.basename(timing_file))
+        shutil.copy(timing_file, session_timing_path)
 
         if timing_file.lower().endswith(".xml"):
             subtitles = parse_bdsup2sub_xml(timing_file)
@@ -121,7 +228,9 @@ class AppContext:
             subtitles = [] 
         
         if subtitles:
-            self.subtitles = subtitles
+            self.subtitles = SubtitleTrack.from_events(subtitles)
+            self._record_session_timing(session_timing_path)
+            logging.info(f"Found {len(subtitles)} subtitles in timing file.")
         else:
             error_msg = "Error reading timing file after extraction."
             logging.error(error_msg)
@@ -132,7 +241,7 @@ class AppContext:
     def load_timing_file(self, timing_path: str) -> tuple[list | None, str | None]:
         logging.info(f"Loading timing file: {os.path.basename(timing_path)}")
         base_name = os.path.splitext(os.path.basename(timing_path))[0]
-        session_dir = self._create_new_session_dir(base_name)
+        session_dir = self._create_new_session_dir(base_name, "timing", os.path.abspath(timing_path))
         
         session_timing_path = os.path.join(session_dir, os.path.basename(timing_path))
         shutil.copy(timing_path, session_timing_path)
@@ -154,99 +263,265 @@ class AppContext:
         self.image_folder = session_image_folder
         self.timing_file_path = session_timing_path
 
-        if timing_path.lower().endswith(".xml"):
-            subtitles = parse_bdsup2sub_xml(session_timing_path)
-        elif timing_path.lower().endswith(".html"):
-            subtitles = parse_subtitle_edit_html(session_timing_path)
-        else:
-            return None, "Unsupported file format."
+        with self._trace(session_dir, "timing"), span("parse_timing", "app", images=copied_count):
+            if timing_path.lower().endswith(".xml"):
+                subtitles = parse_bdsup2sub_xml(session_timing_path)
+            elif timing_path.lower().endswith(".html"):
+                subtitles = parse_subtitle_edit_html(session_timing_path)
+            else:
+                return None, "Unsupported file format."
         
         if subtitles:
-            self.subtitles = subtitles
+            self.subtitles = SubtitleTrack.from_events(subtitles)
+            self._record_session_timing(session_timing_path)
             logging.info(f"Successfully loaded {len(subtitles)} subtitles from timing file.")
-            return subtitles, None
+            return self.subtitles, None
         else:
             logging.error("Error reading timing file. File might be corrupt or empty.")
             return None, "Error reading timing file. File might be corrupt or empty."
 
-    def run_ocr_pipeline(self, cancellation_event: threading.Event, progress_callback=None, indices_to_process=None) -> tuple[list | None, str]:
-        if not all([self.api_key, self.model_name, self.image_folder, self.current_session_dir]):
-            return None, "Missing configuration information to run OCR."
-        
-        log_folder = os.path.join(self.current_session_dir, "logs")
-        os.makedirs(log_folder, exist_ok=True)
-
-        # Kiểm tra xem đây có phải là phiên hardsub không và chọn prompt phù hợp
-        is_hardsub_session = self.subtitles and 'channel' in self.subtitles[0]
-        if is_hardsub_session:
+    def _build_ocr_prompt(self) -> str:
+        # Phiên hardsub (track có kênh trên/dưới) dùng prompt riêng
+        if self.subtitles.has_channels:
             try:
                 with open(resource_path("assets/prompt_hardsub.txt"), "r", encoding="utf-8") as f:
-                    current_ocr_prompt = f.read()
+                    prompt = f.read()
                 logging.info("Using dedicated hardsub OCR prompt.")
             except Exception as e:
                 logging.error(f"Could not load hardsub prompt: {e}. Falling back to default.")
-                current_ocr_prompt = self.ocr_prompt_template
+                prompt = self.ocr_prompt_template
         else:
-            current_ocr_prompt = self.ocr_prompt_template
+            prompt = self.ocr_prompt_template
 
         if self.ocr_language and self.ocr_language.lower() != 'auto':
-            current_ocr_prompt += f"\nImportant: The language of the subtitles is {self.ocr_language}. Extract text in this language only."
-
-        subtitles, message = run_ocr_pipeline(
-            self.subtitles,
-            self.image_folder,
-            log_folder,
-            self.api_key,
-            self.model_name,
-            self.generation_config,
-            self.safety_settings,
-            self.batch_size,
-            self.max_retries,
-            current_ocr_prompt,
-            cancellation_event,
-            progress_callback,
-            indices_to_process
-        )
-        if subtitles:
-            # Xử lý hậu kỳ cho hardsub
-            if is_hardsub_session:
-                logging.info("Post-processing hardsub results...")
-                for sub in subtitles:
-                    if sub.get('channel') == 'top' and sub.get('text'):
-                        sub['text'] = f"{{\\an8}}{sub.get('text', '')}"
-                
-                # Sắp xếp lại phụ đề theo thời gian bắt đầu
-                subtitles.sort(key=lambda x: x['start_srt'])
-                logging.info("Hardsub results sorted by start time.")
+            prompt += f"\nImportant: The language of the subtitles is {self.ocr_language}. Extract text in this language only."
+        return prompt
 
+    def _start_live_export(self, indices_to_process=None) -> LiveExport | None:
+        """Opens session_dir/live_subtitles.<format>, which fills up in display order while OCR runs."""
+        if not self.live_export_format: return None
+        path = os.path.join(self.current_session_dir, f"{LIVE_EXPORT_NAME}.{self.live_export_format}")
+        try:
+            live = LiveExport(self.subtitles, path, self.live_export_format)
+        except (OSError, KeyError) as e:
+            logging.warning(f"Live export disabled: {e}")
+            return None
+        if indices_to_process is not None:
+            # Phụ đề không OCR lại lần này đã có kết quả cuối cùng
+            pending = set(indices_to_process)
+            try:
+                live.mark_done([i for i in range(len(self.subtitles)) if i not in pending])
+            except OSError as e:
+                live.close()
+                logging.warning(f"Live export disabled: {e}")
+                return None
+        return live
+
+    def export_subtitles(self, path: str, fmt: str | None = None) -> tuple[int, str | None]:
+        """Saves the current track as SRT, ASS or WebVTT (from `fmt` or the extension). Returns (cues written, error)."""
+        try:
+            count = export_track(self.subtitles, path, fmt)
+        except (OSError, KeyError) as e:
+            return 0, f"Could not save subtitle file: {e}"
+        logging.info(f"Saved {count} subtitles to {path}.")
+        return count, None
+
+    def run_ocr_pipeline(self, cancellation_event: threading.Event, progress_callback=None, indices_to_process=None) -> tuple[list | None, str]:
+        needs_api = self.ocr_backend != "tesseract"
+        if not all([self.image_folder, self.current_session_dir]) or (needs_api and not all([self.api_key, self.model_name])):
+            return None, "Missing configuration information to run OCR."
+        if needs_api and self.validate_model() is False:
+            return None, f"Model '{self.model_name}' is not available for this API key. Reload the model list."
+        
+        log_folder = os.path.join(self.current_session_dir, "logs")
+        os.makedirs(log_folder, exist_ok=True)
+
+        current_ocr_prompt = self._build_ocr_prompt()
+
+        telemetry = BatchTelemetry(os.path.join(self.current_session_dir, TELEMETRY_FILE_NAME))
+        live = self._start_live_export(indices_to_process)
+        try:
+            with self._trace(self.current_session_dir, "ocr"), span("ocr", "app", backend=self.ocr_backend, model=self.model_name):
+                subtitles, message = run_ocr_pipeline(
+                    self.subtitles,
+                    self.image_folder,
+                    log_folder,
+                    self.api_key,
+                    self.model_name,
+                    self.generation_config,
+                    self.safety_settings,
+                    self.batch_size,
+                    self.max_retries,
+                    current_ocr_prompt,
+                    cancellation_event,
+                    progress_callback,
+                    indices_to_process,
+                    self.failed_indices,
+                    self.stream_ocr,
+                    self.stream_stall_timeout,
+                    self.hedge_requests,
+                    self.hedge_model,
+                    self.api_pool,
+                    backend=self.ocr_backend,
+                    ocr_language=self.ocr_language,
+                    cascade_confidence=self.cascade_confidence,
+                    prompt_mode=self.prompt_cache_mode,
+                    telemetry=telemetry,
+                    result_listener=live.mark_done if live else None
+                )
+        finally:
+            # Đóng tệp cả khi pipeline ném lỗi, để không rò handle và phần đã ghi vẫn được flush
+            if live: live.close()
+        self.last_ocr_report = telemetry.report()
+        self.catalog.set_failed_indices(self.current_session_name, self.failed_indices)
+        if subtitles:
+            # Vị trí trên/dưới của phụ đề hardsub nằm ở cột channel của track; bộ ghi phụ đề (src.subtitle_export) tự định vị
             self.subtitles = subtitles
+            self._save_session_track(ocr_completed=not self.failed_indices)
             return subtitles, message
+        # Kết quả từng phần (khi bị huỷ) đã được ghi trực tiếp vào track, lưu lại để không mất
+        self._save_session_track(ocr_completed=False)
         return None, message
 
     def process_hardsub_video(self, video_path: str, options: dict, progress_callback=None, cancellation_event=None) -> tuple[list | None, str | None]:
         logging.info(f"Starting hardsub analysis for: {os.path.basename(video_path)}")
         base_name = os.path.splitext(os.path.basename(video_path))[0]
-        session_dir = self._create_new_session_dir(f"HARDSUB_{base_name}")
+        session_dir = self._create_new_session_dir(f"HARDSUB_{base_name}", "hardsub", os.path.abspath(video_path))
 
         self.image_folder = os.path.join(session_dir, "images")
         os.makedirs(self.image_folder, exist_ok=True)
         
-        subtitles, error = run_hardsub_pipeline(
-            video_path, self.image_folder, options, progress_callback, cancellation_event
-        )
+        # cv2/numpy của pipeline hardsub chỉ được nạp khi phân tích video đầu tiên
+        from src.hardsub_processor import run_hardsub_pipeline
+        with self._trace(session_dir, "hardsub"), span("hardsub", "app"):
+            subtitles, error = run_hardsub_pipeline(
+                video_path, self.image_folder, options, progress_callback, cancellation_event
+            )
 
         if error:
             logging.error(f"Hardsub pipeline failed: {error}")
             return None, error
 
         if subtitles:
-            self.subtitles = subtitles
-            self.timing_file_path = os.path.join(session_dir, "hardsub_log.json")
-            with open(self.timing_file_path, 'w', encoding='utf-8') as f:
-                json.dump(subtitles, f, indent=2)
+            track = SubtitleTrack.from_events(subtitles)
+            # Sắp xếp một lần trước khi lưu để chỉ số trong batch log luôn ứng với thứ tự hiển thị
+            track.sort_by_start()
+            self.subtitles = track
+            self.timing_file_path = os.path.join(session_dir, "hardsub_track.npz")
+            track.save(self.timing_file_path)
+            self._record_session_timing(self.timing_file_path)
 
         return self.subtitles, None
 
+    def _work_queue(self, queue_path: str | None) -> tuple[WorkQueue | None, str | None]:
+        path = queue_path or self.work_queue_path
+        if not path: return None, "No shared work queue configured."
+        try:
+            return WorkQueue(path), None
+        except Exception as e:
+            return None, f"Could not open work queue '{path}': {e}"
+
+    def distribute_ocr(self, queue_path: str | None = None, indices_to_process=None) -> tuple[int, str | None]:
+        """
+        Puts the current session's OCR work into the shared queue as batches for remote
+        workers (python -m src.work_queue worker). Workers use their own API keys; the model,
+        prompt and generation settings travel with each batch. Returns (batches queued, error).
+        """
+        if not all([self.image_folder, self.current_session_dir, self.model_name]):
+            return 0, "Missing configuration information to run OCR."
+        queue, error = self._work_queue(queue_path)
+        if error: return 0, error
+        session = os.path.abspath(self.current_session_dir)
+        indices = sorted(indices_to_process) if indices_to_process is not None else list(range(len(self.subtitles)))
+        config = {
+            "model_name": self.model_name, "generation_config": self.generation_config, "safety_settings": self.safety_settings,
+            "batch_size": self.batch_size, "max_retries": self.max_retries, "prompt": self._build_ocr_prompt(),
+            "backend": self.ocr_backend, "ocr_language": self.ocr_language, "cascade_confidence": self.cascade_confidence,
+        }
+        payloads = []
+        for number, batch in enumerate(split_batches(indices, self.batch_size)):
+            events = [{key: value for key, value in self.subtitles[i].items() if key in ("start_ms", "end_ms", "image_file", "channel")} for i in batch]
+            payloads.append({"indices": batch, "events": events, "image_folder": os.path.abspath(self.image_folder),
+                             # Mỗi task ghi log vào thư mục riêng để không ghi đè batch log của phiên
+                             "log_folder": os.path.join(session, "logs", "distributed", f"part_{number:04d}"), "config": config})
+        queue.remove(session, "ocr_batch")
+        queue.enqueue(session, "ocr_batch", payloads)
+        logging.info(f"Queued {len(payloads)} OCR batches ({len(indices)} images) in {queue.path}.")
+        return len(payloads), None
+
+    def collect_distributed_ocr(self, queue_path: str | None = None) -> tuple[dict | None, str | None]:
+        """
+        Merges finished remote batches into the current session and saves it. Can be called
+        repeatedly while workers are still running; returns the task counts per state.
+        """
+        queue, error = self._work_queue(queue_path)
+        if error: return None, error
+        session = os.path.abspath(self.current_session_dir)
+        merged = []
+        for task in queue.tasks(session, "ocr_batch"):
+            if task["state"] == "done":
+                result = task["result"]
+                for index, text in result["texts"].items():
+                    self.subtitles[int(index)]['text'] = text
+                    self.failed_indices.discard(int(index))
+                for index, score in result.get("confidence", {}).items():
+                    self.subtitles.confidence[int(index)] = score
+                self.failed_indices.update(result["failed"])
+                merged.append(task["id"])
+            elif task["state"] == "failed":
+                self.failed_indices.update(task["payload"]["indices"])
+        if merged:
+            queue.mark_merged(merged)
+            logging.info(f"Merged {len(merged)} remote OCR batches.")
+        counts = queue.counts(session)
+        self.catalog.set_failed_indices(self.current_session_name, self.failed_indices)
+        self._save_session_track(ocr_completed=not self.failed_indices and set(counts) <= {"merged"})
+        return counts, None
+
+    def distribute_hardsub(self, video_path: str, options: dict, queue_path: str | None = None, segment_seconds: float = HARDSUB_SEGMENT_SECONDS) -> tuple[int, str | None]:
+        """Creates a hardsub session and queues the video's scan as segments for remote workers. Returns (segments queued, error)."""
+        queue, error = self._work_queue(queue_path)
+        if error: return 0, error
+        fps, total_frames = get_video_timing(video_path)
+        if not fps or not total_frames: return 0, "Could not determine video FPS and length."
+        base_name = os.path.splitext(os.path.basename(video_path))[0]
+        session_dir = self._create_new_session_dir(f"HARDSUB_{base_name}", "hardsub", os.path.abspath(video_path))
+        self.image_folder = os.path.join(session_dir, "images")
+        os.makedirs(self.image_folder, exist_ok=True)
+        self.subtitles = SubtitleTrack()
+        payloads = [{"segment": number, "start_frame": start, "end_frame": end, "video_path": os.path.abspath(video_path),
+                     "image_folder": os.path.abspath(self.image_folder), "options": options}
+                    for number, (start, end) in enumerate(split_segments(total_frames, fps, segment_seconds))]
+        queue.enqueue(os.path.abspath(session_dir), "hardsub_segment", payloads)
+        logging.info(f"Queued {len(payloads)} hardsub segments of {os.path.basename(video_path)} in {queue.path}.")
+        return len(payloads), None
+
+    def collect_distributed_hardsub(self, queue_path: str | None = None) -> tuple[list | None, str | None]:
+        """
+        Once every segment of the current hardsub session is scanned, joins their events into
+        the session track (same as process_hardsub_video). Returns (None, None) while segments
+        are still pending.
+        """
+        queue, error = self._work_queue(queue_path)
+        if error: return None, error
+        tasks = queue.tasks(os.path.abspath(self.current_session_dir), "hardsub_segment")
+        if not tasks: return None, "No queued hardsub segments for this session."
+        failed = [t for t in tasks if t["state"] == "failed"]
+        if failed: return None, f"{len(failed)} hardsub segment(s) failed: {failed[0]['error']}"
+        if any(t["state"] not in ("done", "merged") for t in tasks): return None, None
+
+        tasks.sort(key=lambda t: t["payload"]["start_frame"])
+        events = merge_segment_events([t["result"]["events"] for t in tasks])
+        track = SubtitleTrack.from_events(events)
+        track.sort_by_start()
+        self.subtitles = track
+        self.timing_file_path = os.path.join(self.current_session_dir, "hardsub_track.npz")
+        track.save(self.timing_file_path)
+        self._record_session_timing(self.timing_file_path)
+        queue.mark_merged([t["id"] for t in tasks])
+        logging.info(f"Merged {len(tasks)} hardsub segments into {len(track)} events.")
+        return self.subtitles, None
+
     def load_session_from_folder(self, session_folder_path: str) -> tuple[list | None, str | None]:
         if not os.path.isdir(session_folder_path):
             return None, "Session folder does not exist."
@@ -254,18 +529,43 @@ class AppContext:
         self.cleanup_current_session_temp()
 
         self.current_session_dir = session_folder_path
+        lock_session_dir(session_folder_path)
         self.image_folder = os.path.join(session_folder_path, "images")
         log_folder = os.path.join(session_folder_path, "logs")
         os.makedirs(log_folder, exist_ok=True)
 
-        timing_file = None
-        for f in os.listdir(session_folder_path):
-            if f.lower().endswith(('.xml', '.html', '.json')): # Add json for hardsub logs
-                timing_file = os.path.join(session_folder_path, f)
-                break
+        session_name = self.current_session_name
+        record = self.catalog.get(session_name)
+        if record is None:
+            self.catalog.sync_with_disk()
+            record = self.catalog.get(session_name) or {}
+        self.catalog.touch(session_name)
+
+        # Nhanh: track đã lưu sau lần OCR trước chứa sẵn văn bản, không cần đọc lại log
+        track_file = record.get("track_file")
+        if track_file and os.path.exists(track_file):
+            try:
+                self.subtitles = SubtitleTrack.load(track_file)
+                self.timing_file_path = record.get("timing_file") or track_file
+                self.failed_indices = self.catalog.get_failed_indices(session_name)
+                return self.subtitles, f"Loaded {record.get('ocr_done_count', 0)} OCR results from session catalog. Ready to review and save."
+            except Exception as e:
+                logging.error(f"Error loading session track '{track_file}': {e}. Falling back to batch logs.")
+
+        timing_file = record.get("timing_file")
+        if not timing_file or not os.path.exists(timing_file):
+            # Phiên cũ chưa có trong catalog: đoán file timing như trước
+            timing_file = None
+            for f in os.listdir(session_folder_path):
+                # Bỏ qua trace do phiên bản trước ghi thẳng vào thư mục phiên
+                if f.startswith("trace_") and f.lower().endswith(".json"):
+                    continue
+                if f.lower().endswith(('.xml', '.html', '.npz', '.json')): # npz/json for hardsub tracks
+                    timing_file = os.path.join(session_folder_path, f)
+                    break
         
         if not timing_file:
-            return None, "No timing file (.xml, .html, .json) found in this session directory."
+            return None, "No timing file (.xml, .html, .npz, .json) found in this session directory."
         
         self.timing_file_path = timing_file
 
@@ -273,37 +573,49 @@ class AppContext:
             subtitles = parse_bdsup2sub_xml(timing_file)
         elif timing_file.lower().endswith(".html"):
             subtitles = parse_subtitle_edit_html(timing_file)
-        elif timing_file.lower().endswith(".json"): # Handle hardsub log
-            with open(timing_file, 'r', encoding='utf-8') as f:
-                subtitles = json.load(f)
+        elif timing_file.lower().endswith(".npz"): # Handle hardsub track
+            try:
+                subtitles = SubtitleTrack.load(timing_file)
+            except Exception as e:
+                logging.error(f"Error loading hardsub track '{timing_file}': {e}")
+                subtitles = None
+        elif timing_file.lower().endswith(".json"): # Handle legacy hardsub log
+            try:
+                with open(timing_file, 'r', encoding='utf-8') as f:
+                    subtitles = SubtitleTrack.from_events(json.load(f))
+            except Exception as e:
+                logging.error(f"Error loading legacy hardsub log '{timing_file}': {e}")
+                subtitles = None
         else:
             return None, "Unsupported timing file format."
         
         if not subtitles:
             return None, "Error reading timing file in session. File might be corrupt or empty."
         
-        self.subtitles = subtitles
-        
-        self.settings['last_failed_batches'] = []
-        save_settings(self.settings)
+        self.subtitles = subtitles if isinstance(subtitles, SubtitleTrack) else SubtitleTrack.from_events(subtitles)
+        self.catalog.update(session_name, timing_file=timing_file, event_count=len(self.subtitles))
+        self.failed_indices = self.catalog.get_failed_indices(session_name)
 
         log_files_found = 0
         if os.path.isdir(log_folder):
-            for filename in sorted(os.listdir(log_folder)):
-                if filename.startswith("batch_") and filename.endswith(".json"):
-                    try:
-                        batch_start_index = int(filename.replace("batch_", "").replace(".json", ""))
-                        with open(os.path.join(log_folder, filename), 'r', encoding='utf-8') as f:
-                            results = json.load(f)
-                        log_files_found += 1
-                        for res in results:
-                            absolute_index = batch_start_index + res.get('index', -1)
-                            if 0 <= absolute_index < len(self.subtitles):
-                                self.subtitles[absolute_index]['text'] = res.get('text', '')
-                    except Exception as e:
-                        logging.error(f"Error parsing or saving log {filename}: {e}")
+            # Mỗi yêu cầu có log riêng (batch_<chỉ số đầu>_<id>.json, log cũ không có id); áp dụng theo thời điểm ghi để kết quả bổ sung đến sau
+            log_files = [(os.path.getmtime(os.path.join(log_folder, f)), f) for f in os.listdir(log_folder) if BATCH_LOG_PATTERN.match(f)]
+            for _, filename in sorted(log_files):
+                try:
+                    batch_start_index = int(BATCH_LOG_PATTERN.match(filename).group(1))
+                    with open(os.path.join(log_folder, filename), 'r', encoding='utf-8') as f:
+                        results = json.load(f)
+                    log_files_found += 1
+                    for res in results:
+                        # Log mới ghi sẵn chỉ số tuyệt đối; log cũ chỉ có chỉ số tương đối trong batch
+                        absolute_index = res['absolute_index'] if 'absolute_index' in res else batch_start_index + res.get('index', -1)
+                        if 0 <= absolute_index < len(self.subtitles):
+                            self.subtitles[absolute_index]['text'] = res.get('text', '')
+                except Exception as e:
+                    logging.error(f"Error parsing or saving log {filename}: {e}")
         
         if log_files_found > 0:
+            self._save_session_track(ocr_completed=False)
             return self.subtitles, f"Loaded {log_files_found} batches from log files. Ready to review and save."
         else:
             return self.subtitles, "No log files found. Only original structure loaded."
@@ -311,8 +623,8 @@ class AppContext:
     def get_session_list(self) -> list[str]:
         if not os.path.isdir(TEMP_DIR_NAME):
             return []
-        sessions = [d for d in os.listdir(TEMP_DIR_NAME) if os.path.isdir(os.path.join(TEMP_DIR_NAME, d))]
-        return sorted(sessions, reverse=True)
+        self.catalog.sync_with_disk()
+        return [session["name"] for session in self.catalog.list_sessions()]
 
     def _load_ocr_prompt_template(self) -> str:
         prompt_path = resource_path("assets/prompt.txt")
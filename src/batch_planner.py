@@ -0,0 +1,157 @@
+# src/batch_planner.py
+
+import os
+import json
+import logging
+import tempfile
+import threading
+from collections import deque
+
+from src.settings import APP_DATA_DIR_NAME
+
+PLANNER_STATS_FILE = "batch_planner.json"
+
+DEFAULT_MAX_OUTPUT_TOKENS = 8192
+# Giới hạn request inline của Gemini là ~20 MB sau base64 (x4/3); giữ dư địa cho prompt
+DEFAULT_MAX_INPUT_BYTES = 12 * 1024 * 1024
+# Phần JSON cố định cho mỗi ảnh: {"index": n, "text": "..."} cùng dấu phẩy, xuống dòng
+TOKENS_PER_ENTRY = 14
+INITIAL_TOKENS_PER_BYTE = 0.002
+OUTPUT_SAFETY = 0.7
+MIN_SCALE, MAX_SCALE = 0.1, 1.0
+SHRINK_FACTOR, GROW_FACTOR = 0.6, 1.15
+EMA_ALPHA = 0.3
+# Số phản hồi dư dả liên tiếp cần có trước khi nới rộng lại mục tiêu
+GROW_AFTER_STREAK = 3
+
+class BatchPlanner:
+    """
+    Builds OCR batches against an input-byte budget and an expected output-token budget
+    instead of a fixed image count.
+
+    Output tokens per image are estimated as TOKENS_PER_ENTRY + tokens_per_byte * PNG size
+    (wider subtitle images hold more text and compress to more bytes). tokens_per_byte is
+    learned per model from `usage_metadata`; a truncated response shrinks the target,
+    comfortable headroom grows it back. Learned values are kept in app_data between runs.
+    """
+
+    def __init__(self, model_name: str, max_images: int, max_output_tokens: int | None = None,
+                 max_input_bytes: int = DEFAULT_MAX_INPUT_BYTES, stats_dir: str = APP_DATA_DIR_NAME):
+        self.model_name = model_name
+        self.max_images = max(1, int(max_images))
+        self.max_output_tokens = max_output_tokens or DEFAULT_MAX_OUTPUT_TOKENS
+        self.max_input_bytes = max_input_bytes
+        self.stats_path = os.path.join(stats_dir, PLANNER_STATS_FILE)
+        self._lock = threading.Lock()
+        self._caps = {} # chỉ số đầu của batch bị cắt -> số ảnh tối đa khi gửi lại batch đó
+        self._comfortable_streak = 0
+        stats = self._load_stats().get(model_name, {})
+        self.tokens_per_byte = stats.get("tokens_per_byte", INITIAL_TOKENS_PER_BYTE)
+        self.scale = stats.get("scale", MAX_SCALE)
+        self.samples = stats.get("samples", 0)
+
+    @property
+    def output_target(self) -> int:
+        return int(self.max_output_tokens * OUTPUT_SAFETY * self.scale)
+
+    def estimate_output_tokens(self, image_bytes: int) -> float:
+        return TOKENS_PER_ENTRY + self.tokens_per_byte * image_bytes
+
+    def take_batch(self, pending: deque, image_sizes: dict[int, int]) -> list[int]:
+        """
+        Pops the next batch of subtitle indices from the front of `pending`.
+        Always takes at least one index so a single oversized image still gets sent. When the
+        front of the queue is a truncated batch put back by its worker, the batch is at most half
+        its old size, whichever worker takes it.
+        """
+        with self._lock:
+            cap = self._caps.pop(pending[0], None) if pending else None
+            limit = self.max_images if cap is None else min(self.max_images, cap)
+            target = self.output_target
+            batch, input_bytes, est_tokens = [], 0, 0.0
+            reason = "end of queue"
+            while pending:
+                if len(batch) >= limit:
+                    reason = "image cap"
+                    break
+                size = image_sizes.get(pending[0], 0)
+                tokens = self.estimate_output_tokens(size)
+                if batch and input_bytes + size > self.max_input_bytes:
+                    reason = "input bytes"
+                    break
+                if batch and est_tokens + tokens > target:
+                    reason = "output tokens"
+                    break
+                batch.append(pending.popleft())
+                input_bytes += size
+                est_tokens += tokens
+            logging.info(
+                f"Batch planner: {len(batch)} images, {input_bytes / 1024:.0f} KB, ~{est_tokens:.0f} output tokens "
+                f"(target {target}, scale {self.scale:.2f}, {self.tokens_per_byte * 1024:.2f} tok/KB, limited by {reason}) [{self.model_name}]"
+            )
+            return batch
+
+    def observe(self, batch_size: int, input_bytes: int, output_tokens: int | None, truncated: bool, first_index: int | None = None):
+        """
+        Feeds back one response. output_tokens is usage_metadata.candidates_token_count (None if
+        unknown); first_index is the batch's first subtitle index, which caps the batch's re-send
+        after a truncation.
+        """
+        with self._lock:
+            observed = None
+            if output_tokens is not None and input_bytes > 0:
+                observed = max(output_tokens - TOKENS_PER_ENTRY * batch_size, 0) / input_bytes
+            if truncated:
+                # Phản hồi bị cắt chỉ cho biết cận dưới của tỉ lệ token thật
+                if observed is not None: self.tokens_per_byte = max(self.tokens_per_byte, observed)
+                self._comfortable_streak = 0
+                old_scale = self.scale
+                self.scale = max(MIN_SCALE, self.scale * SHRINK_FACTOR)
+                cap = max(1, batch_size // 2)
+                if first_index is not None: self._caps[first_index] = cap
+                logging.warning(f"Batch planner: response truncated at {batch_size} images; scale {old_scale:.2f} -> {self.scale:.2f}, re-send <= {cap} images.")
+                return
+            if observed is None: return
+            self.tokens_per_byte = observed if self.samples == 0 else (1 - EMA_ALPHA) * self.tokens_per_byte + EMA_ALPHA * observed
+            self.samples += 1
+            self._comfortable_streak = self._comfortable_streak + 1 if output_tokens < 0.5 * self.output_target else 0
+            if self._comfortable_streak >= GROW_AFTER_STREAK and self.scale < MAX_SCALE:
+                self._comfortable_streak = 0
+                old_scale = self.scale
+                self.scale = min(MAX_SCALE, self.scale * GROW_FACTOR)
+                logging.info(f"Batch planner: {output_tokens} output tokens well under target; scale {old_scale:.2f} -> {self.scale:.2f}.")
+
+    def _load_stats(self) -> dict:
+        try:
+            with open(self.stats_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        except OSError as e:
+            logging.warning(f"Could not read batch planner stats: {e}")
+            return {}
+
+    def save(self):
+        """Stores what was learned for this model (atomic write)."""
+        with self._lock:
+            stats = self._load_stats()
+            stats[self.model_name] = {"tokens_per_byte": self.tokens_per_byte, "scale": self.scale, "samples": self.samples}
+        directory = os.path.dirname(os.path.abspath(self.stats_path))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".planner-", suffix=".tmp", dir=directory)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(stats, f, indent=2)
+            os.replace(tmp_path, self.stats_path)
+        except OSError as e:
+            logging.warning(f"Could not save batch planner stats: {e}")
+
+def image_sizes_for(subtitles, indices, image_folder: str) -> dict[int, int]:
+    """PNG sizes (one stat per image, no reads) used as the planner's input-size and text-length proxy."""
+    sizes = {}
+    for i in indices:
+        try:
+            sizes[i] = os.path.getsize(os.path.join(image_folder, subtitles[i]['image_file']))
+        except OSError:
+            sizes[i] = 0
+    return sizes
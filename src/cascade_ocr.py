@@ -0,0 +1,151 @@
+# src/cascade_ocr.py
+
+import os
+import re
+import time
+import logging
+import threading
+
+from src.ocr_backends import OcrBackend
+from src.local_ocr import tesseract_language
+from src.tool_path_manager import resource_path
+
+DEFAULT_ACCEPT_CONFIDENCE = 0.85
+# Kết quả dưới ngưỡng tin cậy vẫn được nhận nếu qua kiểm tra bảng chữ và từ điển, nhưng không thấp hơn mức này
+CHECKS_MIN_CONFIDENCE = 0.5
+CHARSET_MIN_RATIO = 0.95
+DICTIONARY_MIN_RATIO = 0.8
+DICTIONARY_DIR = os.path.join("assets", "dictionaries")
+
+_LATIN = r"A-Za-zÀ-ɏḀ-ỿ"
+_COMMON = r"0-9\s.,!?;:'\"“”‘’()\[\]\-–—…/&%$#@*+=♪<>"
+# Bảng chữ được phép theo mã ngôn ngữ Tesseract (phần trước dấu '+', '_')
+SCRIPTS = {
+    "eng": _LATIN, "vie": _LATIN, "fra": _LATIN, "deu": _LATIN, "spa": _LATIN, "ita": _LATIN,
+    "por": _LATIN, "nld": _LATIN, "pol": _LATIN, "tur": _LATIN, "ind": _LATIN, "msa": _LATIN, "fil": _LATIN,
+    "rus": r"Ѐ-ӿ",
+    "jpn": r"぀-ヿ一-鿿　-〿＀-￯",
+    "chi": r"一-鿿㐀-䶿　-〿＀-￯",
+    "kor": r"가-힯ᄀ-ᇿ㄰-㆏",
+    "ara": r"؀-ۿݐ-ݿ",
+    "hin": r"ऀ-ॿ",
+    "tha": r"฀-๿",
+}
+# Dấu hiệu điển hình của chữ nhận dạng sai: ký tự lạ lặp lại, chữ số lẫn giữa chữ cái
+_GARBAGE = re.compile(r"[|~^_`{}\\]{2,}|[A-Za-z]\d+[A-Za-z]")
+_WORD = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)?")
+
+def _script_key(language: str) -> str:
+    return re.split(r"[+_]", language)[0]
+
+def charset_ratio(text: str, language: str) -> float:
+    """Share of non-space characters that belong to the language's script (plus digits/punctuation)."""
+    script = SCRIPTS.get(_script_key(language))
+    chars = [c for c in text if not c.isspace()]
+    if not chars: return 0.0
+    if script is None: return 1.0
+    allowed = re.compile(f"[{script}{_COMMON}]")
+    return sum(1 for c in chars if allowed.match(c)) / len(chars)
+
+def load_dictionary(language: str) -> set[str] | None:
+    """Optional word list assets/dictionaries/<code>.txt (one word per line, case-insensitive)."""
+    path = resource_path(os.path.join(DICTIONARY_DIR, f"{_script_key(language)}.txt"))
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {line.strip().lower() for line in f if line.strip()}
+    except OSError:
+        return None
+
+def dictionary_ratio(text: str, dictionary: set[str] | None) -> float:
+    """
+    Share of words found in the dictionary; 0.0 for text with garbage symbol runs or digits
+    inside words. Without a word list no word can be confirmed, so the ratio is 0.0.
+    """
+    if dictionary is None or _GARBAGE.search(text): return 0.0
+    words = _WORD.findall(text)
+    if not words: return 0.0
+    return sum(1 for w in words if w.lower() in dictionary) / len(words)
+
+class CascadeBackend(OcrBackend):
+    """
+    Runs a fast local engine over every image first and accepts its result when the confidence
+    is at least `accept_confidence`, or when it is at least CHECKS_MIN_CONFIDENCE and the text
+    passes the charset and dictionary checks for the OCR language (only possible when
+    assets/dictionaries/ has a word list for it). Everything else (including
+    empty or failed local reads) is sent to the remote backend. If the remote backend fails an
+    image that has a local reading, the local text is kept and the image stays marked failed.
+    """
+
+    name = "cascade"
+    reports_confidence = True
+
+    def __init__(self, local: OcrBackend, remote: OcrBackend, ocr_language: str = "Auto", accept_confidence: float = DEFAULT_ACCEPT_CONFIDENCE):
+        self.local = local
+        self.remote = remote
+        self.language = tesseract_language(ocr_language)
+        self.accept_confidence = accept_confidence
+        self.dictionary = load_dictionary(self.language)
+        if self.dictionary is None:
+            # Không có từ điển thì không kiểm chứng được chữ: chỉ nhận kết quả đạt accept_confidence
+            logging.info(f"Cascade: no word list for '{self.language}'; local results need confidence >= {accept_confidence}.")
+        self.total = 0
+        self.remote_count = 0
+        self.local_seconds = 0.0
+        self.remote_seconds = 0.0
+
+    def accepts(self, text: str, confidence: float | None) -> bool:
+        if not text.strip() or confidence is None: return False
+        if confidence >= self.accept_confidence: return True
+        return (self.dictionary is not None
+                and confidence >= CHECKS_MIN_CONFIDENCE
+                and charset_ratio(text, self.language) >= CHARSET_MIN_RATIO
+                and dictionary_ratio(text, self.dictionary) >= DICTIONARY_MIN_RATIO)
+
+    def recognize(self, subtitles, indices, image_folder, cancellation_event, on_result, on_failed):
+        local_results = {}
+        lock = threading.Lock()
+
+        def on_local(index, text, confidence):
+            with lock:
+                local_results[index] = (text, confidence)
+            if self.accepts(text, confidence):
+                on_result(index, text, confidence)
+
+        started = time.perf_counter()
+        error = self.local.recognize(subtitles, indices, image_folder, cancellation_event, on_local, lambda failed: None)
+        self.local_seconds = time.perf_counter() - started
+        if error:
+            logging.warning(f"Cascade: local engine unavailable ({error}); sending everything to {self.remote.name}.")
+        if cancellation_event.is_set(): return None
+
+        rejected = [i for i in indices if not self.accepts(*local_results.get(i, ("", None)))]
+        self.remote.telemetry = self.telemetry
+        self.total, self.remote_count = len(indices), len(rejected)
+        logging.info(f"Cascade: {len(indices) - len(rejected)}/{len(indices)} accepted locally in {self.local_seconds:.1f}s; {len(rejected)} sent to {self.remote.name}.")
+        if not rejected: return None
+
+        def on_remote_failed(failed):
+            for index in failed:
+                text, confidence = local_results.get(index, ("", None))
+                if text.strip(): on_result(index, text, confidence)
+            on_failed(failed)
+
+        started = time.perf_counter()
+        error = self.remote.recognize(subtitles, rejected, image_folder, cancellation_event, on_result, on_remote_failed)
+        self.remote_seconds = time.perf_counter() - started
+        return error
+
+    def close(self):
+        self.local.close()
+        self.remote.close()
+
+    def summary(self) -> str | None:
+        if not self.total: return None
+        fraction = self.remote_count / self.total
+        line = f"Cascade: {self.remote_count}/{self.total} images ({fraction:.1%}) routed to {self.remote.name}, local pass {self.local_seconds:.1f}s, remote pass {self.remote_seconds:.1f}s."
+        if self.remote_count and self.remote_seconds > 0:
+            # Ước lượng thời gian nếu gửi toàn bộ lên remote, theo tốc độ remote đo được trong lần chạy này
+            remote_only = self.remote_seconds / self.remote_count * self.total
+            line += f" Estimated speedup vs {self.remote.name}-only: {remote_only / (self.local_seconds + self.remote_seconds):.1f}x."
+        parts = [line] + [s for s in (self.local.summary(), self.remote.summary()) if s]
+        return " ".join(parts)
@@ -0,0 +1,30 @@
+# src/db.py
+
+import sqlite3
+from contextlib import closing
+
+class _Transaction:
+    """Connection context that commits on success, rolls back on error and always closes."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        with closing(self.conn):
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        return False
+
+def connect(db_path: str, timeout: float = 10):
+    """
+    Opens a short-lived SQLite connection for use in a `with` block.
+    A connection per call keeps the stores usable from worker threads without sharing connections.
+    """
+    conn = sqlite3.connect(db_path, timeout=timeout)
+    conn.row_factory = sqlite3.Row
+    return _Transaction(conn)
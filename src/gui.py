@@ -5,29 +5,26 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext, font
 from tkextrafont import Font
 import threading
-from PIL import Image, ImageTk
+from PIL import ImageTk
 import logging
 
 from src.app_context import AppContext
-from src.ui_components import SubtitleSelectionDialog, SessionSelectionDialog, create_ocr_controls, create_advanced_settings
+from src.ui_components import SubtitleSelectionDialog, SessionSelectionDialog, create_ocr_controls, create_advanced_settings, OCR_BACKEND_LABELS
 from src.utils import check_tools_availability, is_cuda_available
 from src.settings import TEMP_DIR_NAME
+from src.preview_engine import PreviewEngine, FAST_NAVIGATION_SECONDS
+from src.ui_events import UiEventQueue
+from src.review_grid import ReviewGridWindow
 from src.softsub_tab import create_softsub_tab
 from src.hardsub_tab import create_hardsub_tab
 
 class TextHandler(logging.Handler):
-    def __init__(self, text_widget):
+    def __init__(self, ui_events):
         super().__init__()
-        self.text_widget = text_widget
+        self.ui_events = ui_events
 
     def emit(self, record):
-        msg = self.format(record)
-        def append():
-            self.text_widget.configure(state='normal')
-            self.text_widget.insert(tk.END, msg + '\n')
-            self.text_widget.configure(state='disabled')
-            self.text_widget.yview(tk.END)
-        self.text_widget.after(0, append)
+        self.ui_events.post_log(self.format(record))
 
 class SubtitlePreviewer(tk.Tk):
     def __init__(self):
@@ -38,10 +35,15 @@ class SubtitlePreviewer(tk.Tk):
         self._center_window(1200, 1000)
         
         self.app_context = AppContext()
+        self.preview = PreviewEngine()
+        self._preview_settle_job = None
+        self._preview_resize_job = None
         self._init_vars()
         self._configure_styles()
         self._create_menu()
         self._create_widgets()
+        self.ui_events = UiEventQueue(self, self._apply_progress, self.log_text)
+        self.ui_events.start()
         self._setup_logging()
         
         self.after(100, self.auto_load_models_on_startup)
@@ -63,6 +65,7 @@ class SubtitlePreviewer(tk.Tk):
         self.temp_var = tk.DoubleVar(value=config.get("temperature", 0.5))
         self.temp_display_var = tk.StringVar(value=f"{self.temp_var.get():.2f}")
         self.ocr_lang_var = tk.StringVar(value=self.app_context.ocr_language)
+        self.ocr_backend_var = tk.StringVar(value=OCR_BACKEND_LABELS.get(self.app_context.ocr_backend, "Gemini"))
         self.cancellation_event = threading.Event()
         self.ocr_completed = False
         # Hardsub settings
@@ -136,6 +139,7 @@ class SubtitlePreviewer(tk.Tk):
         self.config(menu=menubar)
         tools_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Tools", menu=tools_menu)
+        tools_menu.add_command(label="Review Grid...", command=self.open_review_grid)
         tools_menu.add_command(label="Manage Cache...", command=self.manage_cache)
 
     def _create_api_config_frame(self, parent):
@@ -173,7 +177,7 @@ class SubtitlePreviewer(tk.Tk):
         self.time_label = ttk.Label(nav_frame, text="00:00:00,000 --> 00:00:00,000", anchor="center")
         self.time_label.grid(row=1, column=0, columnspan=3, sticky="ew", pady=5)
         
-        self.btn_save = ttk.Button(nav_frame, text="Save to .SRT file", command=self.save_srt, style="Save.TButton")
+        self.btn_save = ttk.Button(nav_frame, text="Save subtitles (.srt/.ass/.vtt)", command=self.save_subtitles, style="Save.TButton")
         self.btn_save.grid(row=2, column=0, columnspan=3, sticky="ew", pady=(5, 2))
         return nav_frame
 
@@ -192,6 +196,7 @@ class SubtitlePreviewer(tk.Tk):
         image_container.grid_propagate(False)
         image_container.grid_rowconfigure(0, weight=1)
         image_container.grid_columnconfigure(0, weight=1)
+        image_container.bind("<Configure>", self.on_preview_resize)
         self.image_label = ttk.Label(image_container, text="Subtitle Image Will Appear Here", anchor="center", background="gray")
         self.image_label.grid(row=0, column=0, sticky="nsew")
         self.text_editor = scrolledtext.ScrolledText(right_frame, wrap=tk.WORD, font=self.text_font, height=4)
@@ -212,7 +217,7 @@ class SubtitlePreviewer(tk.Tk):
         self.geometry(f'{width}x{height}+{x}+{y}')
 
     def _setup_logging(self):
-        text_handler = TextHandler(self.log_text)
+        text_handler = TextHandler(self.ui_events)
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%H:%M:%S')
         text_handler.setFormatter(formatter)
         root_logger = logging.getLogger()
@@ -226,7 +231,11 @@ class SubtitlePreviewer(tk.Tk):
             messagebox.showwarning("Missing Tools", msg)
 
     def check_cuda_support(self):
-        if not is_cuda_available():
+        # Nạp cv2 và dò CUDA mất vài giây; chạy nền để cửa sổ hiện ngay
+        threading.Thread(target=lambda: self.ui_events.call(self._apply_cuda_support, is_cuda_available()), daemon=True).start()
+
+    def _apply_cuda_support(self, cuda_available):
+        if not cuda_available:
             self.hardsub_use_gpu_var.set(False)
             if hasattr(self, 'gpu_check'):
                 self.gpu_check.config(state=tk.DISABLED)
@@ -237,14 +246,25 @@ class SubtitlePreviewer(tk.Tk):
             logging.info("CUDA is available. GPU acceleration is enabled.")
 
     def manage_cache(self):
-        messagebox.showinfo("Info", "Cache management feature will be developed in the future.")
+        catalog = self.app_context.catalog
+        catalog.sync_with_disk()
+        sessions = catalog.list_sessions()
+        total_mb = catalog.total_size() / (1024 * 1024)
+        quota_mb = self.app_context.settings.get("temp_quota_mb")
+        max_age_days = self.app_context.settings.get("temp_max_age_days")
+        msg = (f"{len(sessions)} sessions use {total_mb:.1f} MB in {TEMP_DIR_NAME}.\n"
+               f"Quota: {quota_mb} MB, maximum age: {max_age_days} days.\n\n"
+               "Remove sessions that exceed these limits now?")
+        if messagebox.askyesno("Manage Cache", msg):
+            removed, freed = self.app_context.collect_session_garbage()
+            messagebox.showinfo("Manage Cache", f"Removed {len(removed)} sessions, freed {freed / (1024 * 1024):.1f} MB.")
 
     def retry_failed_batches(self):
-        failed_indices = self.app_context.settings.get('last_failed_batches', [])
+        failed_indices = sorted(self.app_context.failed_indices)
         if not failed_indices:
             messagebox.showinfo("Info", "No failed batches to retry.")
             return
-        msg = f"Found {len(failed_indices)} failed batches. Do you want to retry processing them?"
+        msg = f"Found {len(failed_indices)} subtitles in failed batches. Do you want to retry processing them?"
         if messagebox.askyesno("Retry Failed Batches", msg):
             self.start_ocr_thread(indices_to_process=failed_indices)
 
@@ -262,11 +282,14 @@ class SubtitlePreviewer(tk.Tk):
     def save_advanced_settings(self, event=None):
         self.app_context.update_settings("batch_size", self.batch_size_var.get())
         self.app_context.update_settings("ocr_language", self.ocr_lang_var.get().strip())
+        backend = next((key for key, label in OCR_BACKEND_LABELS.items() if label == self.ocr_backend_var.get()), "gemini")
+        self.app_context.update_settings("ocr_backend", backend)
         generation_config = {"temperature": self.temp_var.get()}
         self.app_context.update_settings("generation_config", generation_config)
 
     def start_ocr_thread(self, indices_to_process=None):
-        if not all([self.app_context.api_key, self.app_context.model_name, self.app_context.image_folder]):
+        needs_api = self.app_context.ocr_backend != "tesseract"
+        if not self.app_context.image_folder or (needs_api and not all([self.app_context.api_key, self.app_context.model_name])):
             messagebox.showwarning("Missing Info", "API Key, Model, and a loaded session are required.")
             return
         self._set_controls_state(tk.DISABLED, ocr_running=True)
@@ -283,17 +306,24 @@ class SubtitlePreviewer(tk.Tk):
         self.progress_bar['value'] = 0
         self._set_controls_state(tk.NORMAL)
 
-    def update_ocr_progress(self, message, percentage):
-        self.status_label.config(text=message)
+    def _apply_progress(self, message, percentage):
+        if message is not None: self.status_label.config(text=message)
         self.progress_bar['value'] = percentage
-        self.update_idletasks()
+
+    def update_ocr_progress(self, message, percentage):
+        # Gọi từ luồng worker: chỉ đưa vào hàng đợi, luồng Tk cập nhật theo chu kỳ
+        self.ui_events.post_progress(message, percentage)
 
     def run_ocr_and_update_gui(self, indices_to_process=None):
         subtitles, message = self.app_context.run_ocr_pipeline(self.cancellation_event, self.update_ocr_progress, indices_to_process)
+        self.ui_events.call(self._finish_ocr, subtitles, message)
+
+    def _finish_ocr(self, subtitles, message):
         self.progress_bar['value'] = 0
         if subtitles:
             self.ocr_completed = True
-            self.status_label.config(text=f"OCR Complete! {len(self.app_context.subtitles)} subtitles.")
+            report = self.app_context.last_ocr_report
+            self.status_label.config(text=f"OCR Complete! {len(self.app_context.subtitles)} subtitles." + (f" {report}" if report else ""))
             logging.info(f"OCR Complete! Processed {len(self.app_context.subtitles)} subtitles.")
             if self.app_context.subtitles:
                 self.navigate_to(self.app_context.current_index if self.app_context.current_index != -1 else 0)
@@ -307,24 +337,57 @@ class SubtitlePreviewer(tk.Tk):
         if not self.app_context.subtitles or not (0 <= index < len(self.app_context.subtitles)): return
         self.app_context.current_index = index
         sub = self.app_context.subtitles[index]
+        self.show_preview_image(index, self.preview.is_fast(index))
+        self.text_editor.delete('1.0', tk.END)
+        self.text_editor.insert(tk.END, sub.get('text', ''))
+        self.nav_label.config(text=f"Sub {index + 1} / {len(self.app_context.subtitles)}")
+        self.time_label.config(text=f"{sub['start_srt']} --> {sub['end_srt']}")
+
+    def show_preview_image(self, index, fast=False):
+        ctx = self.app_context
+        container = self.image_label.master
+        container_w, container_h = container.winfo_width(), container.winfo_height()
+        if container_w < 50 or container_h < 50: container_w, container_h = 800, 500
+        self.preview.set_size((container_w, container_h))
+        self.preview.set_source(ctx.image_folder, lambda i: os.path.join(ctx.image_folder, ctx.subtitles[i]['image_file']), len(ctx.subtitles))
         try:
-            img_path = os.path.join(self.app_context.image_folder, sub['image_file'])
-            pil_img = Image.open(img_path)
-            container = self.image_label.master
-            container_w, container_h = container.winfo_width(), container.winfo_height()
-            if container_w < 50 or container_h < 50: container_w, container_h = 800, 500
-            scale = min(container_w / pil_img.width, container_h / pil_img.height)
-            new_size = (int(pil_img.width * scale), int(pil_img.height * scale))
-            pil_img = pil_img.resize(new_size, Image.LANCZOS)
+            pil_img, final = self.preview.get(index, fast)
             tk_img = ImageTk.PhotoImage(pil_img)
             self.image_label.config(image=tk_img, text="")
             self.image_label.image = tk_img
         except Exception as e:
-            self.image_label.config(text=f"Error loading image:\n{sub['image_file']}", image='')
-        self.text_editor.delete('1.0', tk.END)
-        self.text_editor.insert(tk.END, sub.get('text', ''))
-        self.nav_label.config(text=f"Sub {index + 1} / {len(self.app_context.subtitles)}")
-        self.time_label.config(text=f"{sub['start_srt']} --> {sub['end_srt']}")
+            final = True
+            self.image_label.config(text=f"Error loading image:\n{ctx.subtitles[index]['image_file']}", image='')
+        if self._preview_settle_job: self.after_cancel(self._preview_settle_job)
+        self._preview_settle_job = None
+        if not final:
+            # Khi ngừng cuộn nhanh, vẽ lại ảnh hiện tại bằng LANCZOS
+            self._preview_settle_job = self.after(int(FAST_NAVIGATION_SECONDS * 2000), lambda: self._settle_preview(index))
+
+    def _settle_preview(self, index):
+        self._preview_settle_job = None
+        if index == self.app_context.current_index: self.show_preview_image(index)
+
+    def on_preview_resize(self, event):
+        if self._preview_resize_job: self.after_cancel(self._preview_resize_job)
+        def redraw():
+            self._preview_resize_job = None
+            index = self.app_context.current_index
+            if self.app_context.subtitles and 0 <= index < len(self.app_context.subtitles): self.show_preview_image(index)
+        self._preview_resize_job = self.after(150, redraw)
+
+    def open_review_grid(self):
+        if not self.app_context.subtitles:
+            messagebox.showinfo("Info", "Load a session or source first.")
+            return
+        self.sync_text_from_widget()
+        ReviewGridWindow(self, self.app_context.subtitles, self.app_context.image_folder, self.app_context.failed_indices,
+                         self.ui_events, on_open=self.navigate_to, on_edit=self._on_grid_edit)
+
+    def _on_grid_edit(self, index):
+        if index == self.app_context.current_index:
+            self.text_editor.delete('1.0', tk.END)
+            self.text_editor.insert(tk.END, self.app_context.subtitles[index].get('text', ''))
 
     def sync_text_from_widget(self):
         if self.app_context.subtitles and 0 <= self.app_context.current_index < len(self.app_context.subtitles):
@@ -338,34 +401,38 @@ class SubtitlePreviewer(tk.Tk):
         self.sync_text_from_widget()
         if self.app_context.current_index < len(self.app_context.subtitles) - 1: self.navigate_to(self.app_context.current_index + 1)
 
-    def save_srt(self):
+    def save_subtitles(self):
         self.sync_text_from_widget()
-        srt_path = filedialog.asksaveasfilename(defaultextension=".srt", filetypes=[("Timing Files", "*.srt")], title="Save to .SRT file")
-        if not srt_path: return
-        try:
-            with open(srt_path, 'w', encoding='utf-8') as f:
-                for i, sub in enumerate(self.app_context.subtitles):
-                    f.write(f"{i + 1}\n{sub['start_srt']} --> {sub['end_srt']}\n{sub.get('text', '').strip()}\n\n")
-            messagebox.showinfo("Complete", f"SRT file saved successfully to:\n{srt_path}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not save SRT file: {e}")
+        path = filedialog.asksaveasfilename(defaultextension=".srt", title="Save subtitles",
+                                            filetypes=[("SubRip", "*.srt"), ("Advanced SubStation Alpha", "*.ass"), ("WebVTT", "*.vtt")])
+        if not path: return
+        count, error = self.app_context.export_subtitles(path)
+        if error:
+            messagebox.showerror("Error", error)
+            return
+        messagebox.showinfo("Complete", f"{count} subtitles saved successfully to:\n{path}")
 
     def auto_load_models_on_startup(self):
-        if self.api_key_var.get(): self.load_models()
+        if self.api_key_var.get(): self.load_models(force_refresh=False)
         
-    def load_models(self):
+    def load_models(self, force_refresh=True):
         api_key = self.api_key_var.get().strip()
         if not api_key:
             messagebox.showerror("API Key Error", "Please enter an API Key.")
             return
-        self.status_label.config(text="Loading model...")
-        self.update_idletasks()
-        threading.Thread(target=self._load_models_worker, args=(api_key,), daemon=True).start()
-        
-    def _load_models_worker(self, api_key):
         self.app_context.update_settings("api_key", api_key)
-        models, error = self.app_context.get_available_models()
+        # Hiện ngay danh sách đã lưu; chỉ gọi API khi danh sách đã cũ hoặc người dùng bấm cập nhật
+        models, fresh = self.app_context.get_cached_models()
+        if models: self._finish_load_models(models, None)
+        if fresh and not force_refresh: return
+        if not models: self.status_label.config(text="Loading model...")
+        self.app_context.model_catalog.refresh_async(api_key, lambda new_models, error: self.ui_events.call(self._finish_load_models, new_models, error, bool(models)))
+
+    def _finish_load_models(self, models, error, cached_shown=False):
         if error:
+            if cached_shown:
+                logging.warning(f"Could not refresh the model list, keeping the cached one: {error}")
+                return
             messagebox.showerror("Error", error)
             self.status_label.config(text="Error!")
             return
@@ -448,9 +515,11 @@ class SubtitlePreviewer(tk.Tk):
         threading.Thread(target=self.handle_hardsub_video, args=(source_path, options), daemon=True).start()
     
     def handle_hardsub_video(self, video_path, options):
-        self.status_label.config(text="Analyzing video for hardsubs...")
-        self.progress_bar.config(mode='determinate', value=0)
+        self.ui_events.post_progress("Analyzing video for hardsubs...", 0)
         subtitles, error = self.app_context.process_hardsub_video(video_path, options, self.update_ocr_progress, self.cancellation_event)
+        self.ui_events.call(self._finish_hardsub_video, subtitles, error)
+
+    def _finish_hardsub_video(self, subtitles, error):
         self.progress_bar['value'] = 0
         if error:
             messagebox.showerror("Hardsub Error", error)
@@ -463,8 +532,11 @@ class SubtitlePreviewer(tk.Tk):
         self._set_controls_state(tk.NORMAL)
 
     def handle_video_file(self, video_path):
-        self.status_label.config(text=f"Scanning: {os.path.basename(video_path)}...")
+        self.ui_events.post_progress(f"Scanning: {os.path.basename(video_path)}...", 0)
         streams, error = self.app_context.inspect_video_subtitles(video_path)
+        self.ui_events.call(self._choose_video_stream, video_path, streams, error)
+
+    def _choose_video_stream(self, video_path, streams, error):
         if error or not streams:
             messagebox.showerror("Error", error or "No image subtitle streams (PGS, VobSub) found in this video.")
             self.status_label.config(text="Video scan failed.")
@@ -476,21 +548,31 @@ class SubtitlePreviewer(tk.Tk):
             stream_index = streams[dialog.selected_stream_index]['index']
             self.status_label.config(text="Extracting subtitles...")
             self.progress_bar.config(mode='determinate', value=0)
-            _, _, error = self.app_context.extract_subtitles_from_video(video_path, stream_index, self.update_extraction_progress, self.cancellation_event)
-            self.progress_bar['value'] = 0
-            if error:
-                if error != "Extraction cancelled by user.": messagebox.showerror("Error", error)
-                self.status_label.config(text="Subtitle extraction failed.")
-            else:
-                self.status_label.config(text=f"Extraction complete! {len(self.app_context.subtitles)} subtitles. Ready for OCR.")
-                if self.app_context.subtitles: self.navigate_to(0)
+            threading.Thread(target=self._extract_video_stream, args=(video_path, stream_index), daemon=True).start()
+            return
+        self.status_label.config(text="Subtitle stream selection cancelled.")
+        self._set_controls_state(tk.NORMAL)
+
+    def _extract_video_stream(self, video_path, stream_index):
+        _, _, error = self.app_context.extract_subtitles_from_video(video_path, stream_index, self.update_extraction_progress, self.cancellation_event)
+        self.ui_events.call(self._finish_extraction, error)
+
+    def _finish_extraction(self, error):
+        self.progress_bar['value'] = 0
+        if error:
+            if error != "Extraction cancelled by user.": messagebox.showerror("Error", error)
+            self.status_label.config(text="Subtitle extraction failed.")
         else:
-            self.status_label.config(text="Subtitle stream selection cancelled.")
+            self.status_label.config(text=f"Extraction complete! {len(self.app_context.subtitles)} subtitles. Ready for OCR.")
+            if self.app_context.subtitles: self.navigate_to(0)
         self._set_controls_state(tk.NORMAL)
             
     def handle_timing_file(self, timing_path):
-        self.status_label.config(text="Processing timing file and images...")
+        self.ui_events.post_progress("Processing timing file and images...", 0)
         subtitles, error = self.app_context.load_timing_file(timing_path)
+        self.ui_events.call(self._finish_timing_file, subtitles, error)
+
+    def _finish_timing_file(self, subtitles, error):
         if error:
             messagebox.showerror("Error", error)
             self.status_label.config(text="Timing file processing failed.")
@@ -500,8 +582,7 @@ class SubtitlePreviewer(tk.Tk):
         self._set_controls_state(tk.NORMAL)
         
     def update_extraction_progress(self, percentage):
-        self.progress_bar['value'] = percentage
-        self.update_idletasks()
+        self.ui_events.post_progress(None, percentage)
         
     def _set_controls_state(self, state, ocr_running=False, extraction_running=False):
         is_disabled = state == tk.DISABLED or ocr_running or extraction_running
@@ -515,7 +596,7 @@ class SubtitlePreviewer(tk.Tk):
         self.btn_cancel_ocr.config(state=tk.NORMAL if ocr_running or extraction_running else tk.DISABLED)
         subtitles_loaded = bool(self.app_context.subtitles) and not is_disabled
         self.btn_start_ocr.config(state=tk.NORMAL if subtitles_loaded else tk.DISABLED)
-        has_failed_batches = bool(self.app_context.settings.get('last_failed_batches'))
+        has_failed_batches = bool(self.app_context.failed_indices)
         self.btn_retry_failed.config(state=tk.NORMAL if subtitles_loaded and has_failed_batches else tk.DISABLED)
         nav_state = tk.NORMAL if subtitles_loaded else tk.DISABLED
         for widget in [self.btn_prev, self.btn_next]: widget.config(state=nav_state)
@@ -2,10 +2,71 @@
 import cv2
 import numpy as np
 import os
+import time
 import logging
+import threading
+from contextlib import contextmanager
 from datetime import timedelta
 
+from src.probe_cache import get_video_timing
+from src.tracing import span, profiled
+
 EAST_MODEL_PATH = os.path.join("assets", "tools", "frozen_east_text_detection.pb")
+MAX_IDLE_EAST_NETS = 4
+
+class EastNetPool:
+    """
+    Loaded EAST networks kept between runs, so only the first analysis pays for readNet.
+    A cv2.dnn.Net is not safe to share between threads, so each run leases its own net and
+    returns it afterwards; at most `max_idle` nets per device stay loaded.
+    """
+
+    def __init__(self, model_path: str = EAST_MODEL_PATH, max_idle: int = MAX_IDLE_EAST_NETS):
+        self.model_path = model_path
+        self.max_idle = max_idle
+        self._idle = {True: [], False: []}
+        self._lock = threading.Lock()
+
+    def _load(self, use_gpu: bool):
+        with span("load_east", "hardsub", gpu=use_gpu):
+            net = cv2.dnn.readNet(self.model_path)
+        if use_gpu:
+            # Giả định rằng GUI đã kiểm tra và xác nhận CUDA có sẵn
+            net.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
+            net.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA)
+            logging.info("EAST model is set to run on GPU (CUDA).")
+        else:
+            logging.info("EAST model is set to run on CPU.")
+        return net
+
+    @contextmanager
+    def lease(self, use_gpu: bool):
+        with self._lock:
+            net = self._idle[use_gpu].pop() if self._idle[use_gpu] else None
+        if net is None:
+            logging.info("Loading EAST text detection model...")
+            net = self._load(use_gpu)
+        try:
+            yield net
+        finally:
+            with self._lock:
+                if len(self._idle[use_gpu]) < self.max_idle:
+                    self._idle[use_gpu].append(net)
+
+    def idle_count(self) -> int:
+        with self._lock:
+            return sum(len(nets) for nets in self._idle.values())
+
+_east_pool = None
+_east_pool_lock = threading.Lock()
+
+def get_east_pool() -> EastNetPool:
+    """Process-wide pool of loaded EAST nets."""
+    global _east_pool
+    with _east_pool_lock:
+        if _east_pool is None:
+            _east_pool = EastNetPool()
+        return _east_pool
 
 def seconds_to_srt_time(seconds):
     """Chuyển đổi giây sang định dạng thời gian SRT."""
@@ -83,14 +144,21 @@ def process_subtitle_channel(has_text, current_event, frame_time_sec, all_events
         current_event["end_frame"] = None
 
 def run_hardsub_pipeline(video_path, output_image_folder, options, progress_callback=None, cancellation_event=None):
+    """
+    Scans the video for burned-in text and extracts one image per detected event. The options
+    'start_frame' / 'end_frame' limit the scan to a segment (used by distributed workers) and
+    'image_prefix' keeps image names of different segments apart.
+    """
     if not os.path.exists(video_path): return None, "Video file not found."
     if not os.path.exists(EAST_MODEL_PATH): return None, "EAST text detection model not found."
 
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened(): return None, "Could not open video file."
 
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
+    # Ưu tiên fps/số frame từ probe cache; CAP_PROP_FRAME_COUNT chậm và sai trên một số container
+    fps, total_frames = get_video_timing(video_path)
+    if not fps: fps = cap.get(cv2.CAP_PROP_FPS)
+    if not total_frames: total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     if fps == 0: return None, "Could not determine video FPS."
 
     # Lấy các tùy chọn
@@ -98,17 +166,10 @@ def run_hardsub_pipeline(video_path, output_image_folder, options, progress_call
     confidence = options.get("confidence", 0.5)
     quality = options.get("quality", 320)
     scan_area_height_percent = options.get("scan_area_height", 30) / 100.0
+    start_frame = int(options.get("start_frame", 0))
+    end_frame = int(options["end_frame"]) if options.get("end_frame") else None # None: quét đến hết video
+    image_prefix = options.get("image_prefix", "hardsub_")
 
-    logging.info("Loading EAST text detection model...")
-    net = cv2.dnn.readNet(EAST_MODEL_PATH)
-    
-    if use_gpu:
-        # Giả định rằng GUI đã kiểm tra và xác nhận CUDA có sẵn
-        net.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
-        net.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA)
-        logging.info("EAST model is set to run on GPU (CUDA).")
-    else:
-        logging.info("EAST model is set to run on CPU.")
 
     subtitles = []
     sub_count = 0
@@ -119,40 +180,52 @@ def run_hardsub_pipeline(video_path, output_image_folder, options, progress_call
     all_top_events = []
     all_bottom_events = []
 
-    frame_idx = 0
+    frame_idx = start_frame
+    if start_frame: cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    segment_frames = (end_frame if end_frame is not None else total_frames) - start_frame
     logging.info("Starting hardsub pipeline (EAST detection)...")
 
-    while cap.isOpened():
-        if cancellation_event and cancellation_event.is_set():
-            logging.info("Hardsub pipeline cancelled by user.")
-            break
-            
-        ret, frame = cap.read()
-        if not ret: break
-
-        frame_time_sec = frame_idx / fps
-        
-        if progress_callback and frame_idx % int(fps) == 0:
-            percentage = (frame_idx / total_frames) * 100
-            progress_callback(f"Scanning video: {seconds_to_srt_time(frame_time_sec)}", percentage)
-
-        height, _, _ = frame.shape
-        scan_area_height = int(height * scan_area_height_percent)
-
-        scan_top = options.get("scan_top", True)
-        scan_bottom = options.get("scan_bottom", True)
-
-        if scan_bottom:
-            bottom_area = frame[height - scan_area_height:height, :]
-            has_bottom_text = detect_text_with_east(bottom_area, net, confidence, quality)
-            process_subtitle_channel(has_bottom_text, bottom_event, frame_time_sec, all_bottom_events, frame_idx)
-
-        if scan_top:
-            top_area = frame[0:scan_area_height, :]
-            has_top_text = detect_text_with_east(top_area, net, confidence, quality)
-            process_subtitle_channel(has_top_text, top_event, frame_time_sec, all_top_events, frame_idx)
-        
-        frame_idx += 1
+    # Thời gian giải mã frame và chạy EAST được cộng dồn vào span thay vì tạo một span cho mỗi frame
+    decode_seconds = east_seconds = 0.0
+    # Net được mượn từ pool và trả lại ngay sau khi quét xong, kể cả khi bị huỷ hoặc lỗi
+    with get_east_pool().lease(bool(use_gpu)) as net, span("scan_frames", "hardsub") as scan_args, profiled("hardsub_scan"):
+        while cap.isOpened():
+            if cancellation_event and cancellation_event.is_set():
+                logging.info("Hardsub pipeline cancelled by user.")
+                break
+            if end_frame is not None and frame_idx >= end_frame: break
+
+            started = time.perf_counter()
+            ret, frame = cap.read()
+            decode_seconds += time.perf_counter() - started
+            if not ret: break
+
+            frame_time_sec = frame_idx / fps
+
+            if progress_callback and frame_idx % int(fps) == 0:
+                percentage = min(((frame_idx - start_frame) / segment_frames) * 100, 100) if segment_frames > 0 else 0
+                progress_callback(f"Scanning video: {seconds_to_srt_time(frame_time_sec)}", percentage)
+
+            height, _, _ = frame.shape
+            scan_area_height = int(height * scan_area_height_percent)
+
+            scan_top = options.get("scan_top", True)
+            scan_bottom = options.get("scan_bottom", True)
+
+            started = time.perf_counter()
+            if scan_bottom:
+                bottom_area = frame[height - scan_area_height:height, :]
+                has_bottom_text = detect_text_with_east(bottom_area, net, confidence, quality)
+                process_subtitle_channel(has_bottom_text, bottom_event, frame_time_sec, all_bottom_events, frame_idx)
+
+            if scan_top:
+                top_area = frame[0:scan_area_height, :]
+                has_top_text = detect_text_with_east(top_area, net, confidence, quality)
+                process_subtitle_channel(has_top_text, top_event, frame_time_sec, all_top_events, frame_idx)
+            east_seconds += time.perf_counter() - started
+
+            frame_idx += 1
+        scan_args.update(frames=frame_idx, decode_s=round(decode_seconds, 3), east_s=round(east_seconds, 3))
 
     # Xử lý các sự kiện cuối cùng nếu video kết thúc mà chúng chưa được đóng
     if top_event["start_time"] is not None: all_top_events.append(top_event)
@@ -168,30 +241,36 @@ def run_hardsub_pipeline(video_path, output_image_folder, options, progress_call
     
     cap = cv2.VideoCapture(video_path) # Mở lại video để đọc frame
 
-    for channel, event in all_events:
-        middle_frame_idx = (event["start_frame"] + event["end_frame"]) // 2
-        cap.set(cv2.CAP_PROP_POS_FRAMES, middle_frame_idx)
-        ret, frame = cap.read()
-        
-        if ret:
-            height, _, _ = frame.shape
-            scan_area_height = int(height * scan_area_height_percent)
-            
-            if channel == "top":
-                crop_img = frame[0:scan_area_height, :]
-            else: # bottom
-                crop_img = frame[height - scan_area_height:height, :]
-
-            sub_count += 1
-            image_filename = f"hardsub_{sub_count:05d}.png"
-            cv2.imwrite(os.path.join(output_image_folder, image_filename), crop_img)
-            
-            subtitles.append({
-                "start_srt": seconds_to_srt_time(event["start_time"]),
-                "end_srt": seconds_to_srt_time(event["end_time"]),
-                "image_file": image_filename,
-                "channel": channel # Thêm thông tin kênh
-            })
+    with span("extract_images", "hardsub", events=len(all_events)):
+        for channel, event in all_events:
+            middle_frame_idx = (event["start_frame"] + event["end_frame"]) // 2
+            cap.set(cv2.CAP_PROP_POS_FRAMES, middle_frame_idx)
+            ret, frame = cap.read()
+
+            if ret:
+                height, _, _ = frame.shape
+                scan_area_height = int(height * scan_area_height_percent)
+
+                if channel == "top":
+                    crop_img = frame[0:scan_area_height, :]
+                else: # bottom
+                    crop_img = frame[height - scan_area_height:height, :]
+
+                sub_count += 1
+                image_filename = f"{image_prefix}{sub_count:05d}.png"
+                cv2.imwrite(os.path.join(output_image_folder, image_filename), crop_img)
+
+                subtitles.append({
+                    "start_srt": seconds_to_srt_time(event["start_time"]),
+                    "end_srt": seconds_to_srt_time(event["end_time"]),
+                    "start_ms": int(round(event["start_time"] * 1000)),
+                    "end_ms": int(round(event["end_time"] * 1000)),
+                    "image_file": image_filename,
+                    "channel": channel, # Thêm thông tin kênh
+                    # Frame đầu/cuối để ghép các sự kiện bị cắt ở ranh giới đoạn khi quét phân tán
+                    "start_frame": event["start_frame"],
+                    "end_frame": event["end_frame"],
+                })
 
     cap.release()
     logging.info(f"Hardsub pipeline finished. Extracted {len(subtitles)} potential subtitles.")
@@ -0,0 +1,120 @@
+# src/hedging.py
+
+import time
+import queue
+import logging
+import threading
+from collections import deque
+
+from src.tracing import carry_trace
+
+HEDGE_PERCENTILE = 95
+# Cần đủ mẫu trước khi tin vào p95; trước đó không gửi request dự phòng
+MIN_LATENCY_SAMPLES = 5
+LATENCY_WINDOW = 50
+MIN_HEDGE_DELAY = 5.0
+# Tỉ lệ batch tối đa được gửi request dự phòng, giới hạn chi phí khi mạng chậm đều
+MAX_HEDGE_FRACTION = 0.1
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a non-empty sequence."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+def pick_hedge_model(available_models: list, primary_model: str) -> str | None:
+    """Picks a faster sibling of the primary model for hedged requests (flash-lite first, then flash)."""
+    candidates = [m for m in available_models if m != primary_model and "exp" not in m and "preview" not in m]
+    for marker in ("flash-lite", "flash"):
+        matches = sorted(m for m in candidates if marker in m)
+        if matches:
+            return matches[-1] # tên mới nhất theo thứ tự chữ cái, vd. gemini-2.5-flash-lite
+    return None
+
+class LatencyTracker:
+    """Rolling window of per-image latencies; the hedge deadline is their p95 scaled to the batch size."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, images: int):
+        with self._lock:
+            self._samples.append(seconds / max(1, images))
+
+    def deadline(self, images: int) -> float | None:
+        with self._lock:
+            if len(self._samples) < MIN_LATENCY_SAMPLES: return None
+            return max(MIN_HEDGE_DELAY, percentile(self._samples, HEDGE_PERCENTILE) * max(1, images))
+
+class Hedger:
+    """
+    Runs a batch request and, if it outlives the p95 deadline, a duplicate (optionally on a
+    fallback model). The first successful response wins; the other request is told to stop
+    through its cancel event and its result is discarded.
+    Hedges are capped at MAX_HEDGE_FRACTION of all batches so the extra cost stays bounded.
+    """
+
+    def __init__(self, enabled: bool = True, max_fraction: float = MAX_HEDGE_FRACTION):
+        self.enabled = enabled
+        self.max_fraction = max_fraction
+        self.latency = LatencyTracker()
+        self.batches = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.wasted = 0
+        self._lock = threading.Lock()
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self.hedges >= max(1, int(self.max_fraction * self.batches)): return False
+            self.hedges += 1
+            return True
+
+    def run(self, call, images: int):
+        """
+        call(cancel_event, hedge) -> (results, error, meta). Returns the winning outcome.
+        A failed first response does not win while the other request is still running.
+        """
+        with self._lock:
+            self.batches += 1
+        deadline = self.latency.deadline(images) if self.enabled else None
+        outcomes = queue.Queue()
+        cancels = {}
+
+        def launch(hedge):
+            cancels[hedge] = threading.Event()
+            started = time.monotonic()
+            def target():
+                outcome = call(cancels[hedge], hedge)
+                outcomes.put((hedge, time.monotonic() - started, outcome))
+            threading.Thread(target=carry_trace(target), daemon=True).start()
+
+        launch(False)
+        try:
+            first = outcomes.get(timeout=deadline)
+        except queue.Empty:
+            if not self._take_budget():
+                first = outcomes.get()
+            else:
+                logging.info(f"Batch of {images} images exceeded its p95 deadline ({deadline:.1f}s); sending a hedged request.")
+                launch(True)
+                first = outcomes.get()
+
+        hedge, elapsed, outcome = first
+        if outcome[0] is None and len(cancels) > 1:
+            hedge, elapsed, outcome = outcomes.get() # đợi request còn lại thay vì nhận lỗi
+        for other, cancel in cancels.items():
+            if other != hedge:
+                cancel.set()
+        if len(cancels) > 1:
+            with self._lock:
+                self.wasted += 1
+                if hedge: self.hedge_wins += 1
+        if outcome[0] is not None:
+            self.latency.record(elapsed, images)
+        return outcome
+
+    def summary(self) -> str:
+        rate = self.hedges / self.batches * 100 if self.batches else 0
+        return f"Hedging: {self.hedges}/{self.batches} batches hedged ({rate:.1f}%), hedge won {self.hedge_wins}, {self.wasted} wasted requests."
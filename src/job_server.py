@@ -0,0 +1,444 @@
+# src/job_server.py
+"""
+Local job server: one long-running process that owns the worker capacity and the warm state
+(loaded EAST nets, Gemini clients, payload and probe caches), shared by any number of GUI or
+CLI clients over HTTP on the loopback interface.
+
+    python -m src.job_server serve [--port 8765] [--workers 2]
+    python -m src.job_server submit ocr session=app_temp/<session>
+    python -m src.job_server submit hardsub video_path=movie.mkv
+    python -m src.job_server list | status <id> | cancel <id>
+
+API (JSON bodies; POST needs Content-Type: application/json and requests with an Origin header,
+i.e. from web pages, are refused):
+    POST   /jobs               {"kind": "extract"|"timing"|"hardsub"|"ocr", ...params} -> 202 {"id": ...}
+    GET    /jobs               all jobs
+    GET    /jobs/<id>          one job
+    GET    /jobs/<id>/events   progress events as JSON lines, streamed until the job ends
+    DELETE /jobs/<id>          cancel
+"""
+
+import os
+import sys
+import json
+import uuid
+import time
+import logging
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from src.probe_cache import get_probe_cache
+from src.settings import load_settings
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+MAX_JOB_EVENTS = 2000
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+class Job:
+    """One queued or running job and its event log. Progress events past MAX_JOB_EVENTS drop the oldest ones."""
+
+    def __init__(self, kind: str, params: dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.state = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.cancellation_event = threading.Event()
+        self._events = []
+        self._dropped = 0 # số sự kiện cũ đã bị bỏ, để chỉ số của client vẫn đúng
+        self._changed = threading.Condition()
+
+    def emit(self, event: dict):
+        event = {"time": round(time.time(), 3), **event}
+        with self._changed:
+            self._events.append(event)
+            if len(self._events) > MAX_JOB_EVENTS:
+                del self._events[0]
+                self._dropped += 1
+            self._changed.notify_all()
+
+    def set_state(self, state: str, **fields):
+        self.state = state
+        self.emit({"type": "state", "state": state, **fields})
+
+    def events_since(self, position: int, timeout: float) -> tuple[list, int, bool]:
+        """(new events, next position, finished) after waiting up to `timeout` for something new."""
+        with self._changed:
+            if position - self._dropped >= len(self._events) and self.state not in FINISHED_STATES:
+                self._changed.wait(timeout)
+            start = max(0, position - self._dropped)
+            events = self._events[start:]
+            return events, self._dropped + len(self._events), self.state in FINISHED_STATES
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "kind": self.kind, "params": self.params, "state": self.state,
+                "result": self.result, "error": self.error, "created_at": self.created_at}
+
+class JobManager:
+    """
+    Runs jobs on a fixed pool of worker threads. Every job gets its own AppContext, while the
+    process-wide pools (EAST nets, Gemini clients, payload and probe caches) stay warm between
+    jobs and are shared by all of them.
+
+    The per-job contexts do not clean up app_temp themselves (each would only protect its own,
+    still empty, session); the manager runs the cleanup instead, at start-up and after every job,
+    protecting the sessions of all queued and running jobs. When more jobs are queued than there
+    are workers, the videos of the waiting jobs are probed ahead in one process pool.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, context_factory=None):
+        self.workers = workers
+        self.context_factory = context_factory or _new_context
+        self.jobs = {}
+        self._contexts = {} # job id -> AppContext của job đang chạy
+        self._lock = threading.Lock()
+        self._gc_lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+        self._probed = set() # video đã được probe trước, không đưa lại vào pool
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+
+    def submit(self, kind: str, params: dict) -> Job:
+        if kind not in JOB_RUNNERS:
+            raise ValueError(f"Unknown job kind '{kind}'. Expected one of: {', '.join(JOB_RUNNERS)}.")
+        job = Job(kind, params)
+        with self._lock:
+            self.jobs[job.id] = job
+        job.set_state("queued")
+        self._executor.submit(self._run, job)
+        logging.info(f"Job {job.id} ({kind}) queued.")
+        if sum(1 for j in self.list() if j.state not in FINISHED_STATES) > self.workers:
+            threading.Thread(target=self.prefetch_probes, daemon=True).start()
+        return job
+
+    def prefetch_probes(self):
+        """
+        Warms the probe cache for the videos of queued jobs (e.g. a library submitted as a batch)
+        with ProbeCache.probe_many, so each job starts without waiting for ffprobe.
+        """
+        if not self._probe_lock.acquire(blocking=False): return
+        try:
+            while True:
+                with self._lock:
+                    paths = {job.params.get("video_path") for job in self.jobs.values() if job.state == "queued"}
+                paths = sorted(p for p in paths if isinstance(p, str) and p not in self._probed)
+                if not paths: return
+                self._probed.update(paths)
+                get_probe_cache().probe_many(paths)
+        except Exception as e:
+            logging.warning(f"Probing queued videos failed: {e}")
+        finally:
+            self._probe_lock.release()
+
+    def protected_sessions(self) -> set[str]:
+        """Session names of every unfinished job: the one its context has open and the one it was asked to load."""
+        with self._lock:
+            contexts = list(self._contexts.values())
+            requested = [job.params.get("session") for job in self.jobs.values() if job.state not in FINISHED_STATES]
+        names = {context.current_session_name for context in contexts}
+        names.update(os.path.basename(os.path.normpath(str(path))) for path in requested if path)
+        names.discard(None)
+        return names
+
+    def collect_garbage(self) -> tuple[list[str], int]:
+        """Applies the app_temp quota while jobs keep running; a cleanup already in progress makes this a no-op."""
+        if not self._gc_lock.acquire(blocking=False): return [], 0
+        try:
+            return self.context_factory().collect_session_garbage(self.protected_sessions)
+        except Exception as e:
+            logging.error(f"Session cleanup failed: {e}")
+            return [], 0
+        finally:
+            self._gc_lock.release()
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self) -> list[Job]:
+        with self._lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None: return False
+        job.cancellation_event.set()
+        if job.state == "queued": job.set_state("cancelled")
+        return True
+
+    def _run(self, job: Job):
+        if job.cancellation_event.is_set(): return
+        job.set_state("running")
+        progress = lambda message, percentage: job.emit({"type": "progress", "message": message, "percent": round(percentage or 0, 1)})
+        try:
+            context = self.context_factory()
+            with self._lock:
+                self._contexts[job.id] = context
+            job.result, job.error = JOB_RUNNERS[job.kind](context, job.params, progress, job.cancellation_event)
+        except Exception as e:
+            logging.exception(f"Job {job.id} crashed: {e}")
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            with self._lock:
+                context = self._contexts.pop(job.id, None)
+            if context is not None: context.release_session_lock()
+        if job.cancellation_event.is_set():
+            job.set_state("cancelled", error=job.error)
+        elif job.error:
+            job.set_state("failed", error=job.error)
+        else:
+            job.set_state("done", result=job.result)
+        logging.info(f"Job {job.id} ({job.kind}) {job.state}.")
+        threading.Thread(target=self.collect_garbage, daemon=True).start()
+
+    def shutdown(self):
+        for job in self.list():
+            job.cancellation_event.set()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+def _new_context():
+    from src.app_context import AppContext
+    return AppContext(collect_garbage=False)
+
+def _run_extract(context, params, progress, cancellation_event):
+    image_folder, _, error = context.extract_subtitles_from_video(params["video_path"], int(params["stream_index"]), progress, cancellation_event)
+    if error: return None, error
+    return {"session": os.path.abspath(context.current_session_dir), "image_folder": image_folder, "events": len(context.subtitles)}, None
+
+def _run_timing(context, params, progress, cancellation_event):
+    subtitles, error = context.load_timing_file(params["timing_path"])
+    if error: return None, error
+    return {"session": os.path.abspath(context.current_session_dir), "events": len(subtitles)}, None
+
+def _run_hardsub(context, params, progress, cancellation_event):
+    subtitles, error = context.process_hardsub_video(params["video_path"], params.get("options", {}), progress, cancellation_event)
+    if error: return None, error
+    return {"session": os.path.abspath(context.current_session_dir), "events": len(subtitles)}, None
+
+def _run_ocr(context, params, progress, cancellation_event):
+    _, error = context.load_session_from_folder(params["session"])
+    if context.current_session_dir is None: return None, error
+    for key in ("model_name", "ocr_backend", "batch_size"):
+        if key in params: setattr(context, key, params[key])
+    subtitles, message = context.run_ocr_pipeline(cancellation_event, progress, params.get("indices"))
+    if subtitles is None: return None, message
+    return {"session": os.path.abspath(context.current_session_dir), "message": message, "failed": sorted(context.failed_indices),
+            "report": context.last_ocr_report}, None
+
+# Loại job -> hàm chạy(context, params, progress_callback, cancellation_event) trả về (result, error)
+JOB_RUNNERS = {"extract": _run_extract, "timing": _run_timing, "hardsub": _run_hardsub, "ocr": _run_ocr}
+
+class _Handler(BaseHTTPRequestHandler):
+    manager: JobManager = None
+    poll_seconds = 15.0
+
+    def log_message(self, format, *args):
+        logging.debug("job server: " + format % args)
+
+    def _send_json(self, status: int, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _job_or_404(self, job_id: str) -> Job | None:
+        job = self.manager.get(job_id)
+        if job is None: self._send_json(404, {"error": f"No job '{job_id}'."})
+        return job
+
+    def do_GET(self):
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+        if parts == ["jobs"]:
+            return self._send_json(200, [job.to_dict() for job in self.manager.list()])
+        if len(parts) == 2 and parts[0] == "jobs":
+            job = self._job_or_404(parts[1])
+            if job: self._send_json(200, job.to_dict())
+            return
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+            job = self._job_or_404(parts[1])
+            if job: self._stream_events(job)
+            return
+        self._send_json(404, {"error": "Not found."})
+
+    def _stream_events(self, job: Job):
+        # Không có Content-Length: luồng kết thúc khi đóng kết nối, mỗi dòng là một sự kiện JSON
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        position, finished = 0, False
+        try:
+            while not finished:
+                events, position, finished = job.events_since(position, self.poll_seconds)
+                for event in events:
+                    self.wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass # client ngắt kết nối; job vẫn chạy tiếp
+        self.close_connection = True
+
+    def _reject_browser_request(self) -> bool:
+        """
+        Refuses requests a web page could make: browsers always send Origin on cross-site POST/DELETE,
+        and without a JSON content type (which needs a CORS preflight we never answer) a page could
+        submit jobs with a plain form. Returns True when a response was sent.
+        """
+        if self.headers.get("Origin") is not None:
+            self._send_json(403, {"error": "Requests from browsers are not accepted."})
+            return True
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if self.command == "POST" and content_type != "application/json":
+            self._send_json(415, {"error": "Content-Type must be application/json."})
+            return True
+        return False
+
+    def do_POST(self):
+        if self._reject_browser_request(): return
+        if self.path.rstrip("/") != "/jobs":
+            return self._send_json(404, {"error": "Not found."})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body, dict): raise ValueError("Request body must be a JSON object.")
+            params = {k: v for k, v in body.items() if k != "kind"}
+            job = self.manager.submit(body.get("kind", ""), params)
+        except ValueError as e:
+            return self._send_json(400, {"error": str(e)})
+        self._send_json(202, job.to_dict())
+
+    def do_DELETE(self):
+        if self._reject_browser_request(): return
+        parts = [p for p in self.path.split("/") if p]
+        if len(parts) == 2 and parts[0] == "jobs" and self.manager.cancel(parts[1]):
+            return self._send_json(200, {"id": parts[1], "cancelled": True})
+        self._send_json(404, {"error": "Not found."})
+
+def make_server(manager: JobManager, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """HTTP server bound to `host` (loopback by default: there is no authentication)."""
+    handler = type("JobHandler", (_Handler,), {"manager": manager})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+class JobClient:
+    """Small client for the job server API; errors come back as (None, message) tuples like the rest of the app."""
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = 10):
+        self.base_url = f"http://{host}:{port}"
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, body: dict | None = None) -> tuple[dict | list | None, str | None]:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read()), None
+        except urllib.error.HTTPError as e:
+            try:
+                return None, json.loads(e.read()).get("error", str(e))
+            except ValueError:
+                return None, str(e)
+        except (urllib.error.URLError, OSError) as e:
+            return None, f"Job server not reachable at {self.base_url}: {e}"
+
+    def submit(self, kind: str, **params) -> tuple[dict | None, str | None]:
+        return self._request("POST", "/jobs", {"kind": kind, **params})
+
+    def status(self, job_id: str) -> tuple[dict | None, str | None]:
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def jobs(self) -> tuple[list | None, str | None]:
+        return self._request("GET", "/jobs")
+
+    def cancel(self, job_id: str) -> tuple[dict | None, str | None]:
+        return self._request("DELETE", f"/jobs/{job_id}")
+
+    def events(self, job_id: str):
+        """Yields the job's events as they happen, ending with its final state event."""
+        with urllib.request.urlopen(f"{self.base_url}/jobs/{job_id}/events") as response:
+            for line in response:
+                if line.strip(): yield json.loads(line)
+
+def _parse_params(pairs: list[str]) -> dict:
+    params = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value # chuỗi thường, vd. đường dẫn
+    return params
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve")
+    serve.add_argument("--workers", type=int)
+    submit = commands.add_parser("submit")
+    submit.add_argument("kind", choices=list(JOB_RUNNERS))
+    submit.add_argument("params", nargs="*", help="key=value; values are parsed as JSON when possible")
+    submit.add_argument("--detach", action="store_true", help="return after queueing instead of following progress")
+    commands.add_parser("list")
+    for name in ("status", "cancel"):
+        commands.add_parser(name).add_argument("job_id")
+    args = parser.parse_args(argv)
+    settings = load_settings()
+    port = args.port or settings.get("job_server_port", DEFAULT_PORT)
+
+    if args.command == "serve":
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        manager = JobManager(args.workers or settings.get("job_server_workers", DEFAULT_WORKERS))
+        server = make_server(manager, args.host, port)
+        logging.info(f"Job server listening on http://{args.host}:{port} with {manager.workers} workers.")
+        threading.Thread(target=manager.collect_garbage, daemon=True).start()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            manager.shutdown()
+        return 0
+
+    client = JobClient(args.host, port)
+    if args.command == "submit":
+        job, error = client.submit(args.kind, **_parse_params(args.params))
+        if error:
+            print(error, file=sys.stderr)
+            return 1
+        print(f"Job {job['id']} queued.")
+        if args.detach: return 0
+        final = None
+        for event in client.events(job["id"]):
+            if event["type"] == "progress":
+                print(f"[{event['percent']:5.1f}%] {event['message'] or ''}")
+            else:
+                final = event
+                print(f"{event['state']}" + (f": {event['error']}" if event.get("error") else ""))
+        if final and final.get("result"): print(json.dumps(final["result"], indent=2))
+        return 0 if final and final["state"] == "done" else 1
+    if args.command == "list":
+        result, error = client.jobs()
+    elif args.command == "status":
+        result, error = client.status(args.job_id)
+    else:
+        result, error = client.cancel(args.job_id)
+    if error:
+        print(error, file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
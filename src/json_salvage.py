@@ -0,0 +1,89 @@
+# src/json_salvage.py
+
+import json
+
+class IncrementalJsonObjectParser:
+    """
+    Recovers complete JSON objects from a (possibly broken) JSON array response.
+
+    Text can be fed in arbitrary chunks. Everything outside `{...}` — array brackets, commas,
+    markdown fences, stray prose — is ignored, braces inside strings are respected, and an
+    object is emitted as soon as its closing brace arrives. A cut-off trailing object is simply
+    never emitted; an object that is complete but not valid JSON is skipped and counted.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.skipped = 0
+
+    def feed(self, chunk: str) -> list[dict]:
+        objects = []
+        for ch in chunk:
+            if self._depth == 0:
+                if ch == '{':
+                    self._depth = 1
+                    self._buffer = [ch]
+                continue
+            self._buffer.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == '{':
+                self._depth += 1
+            elif ch == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    obj = self._decode(''.join(self._buffer))
+                    self._buffer = []
+                    if obj is not None:
+                        objects.append(obj)
+        return objects
+
+    def _decode(self, text: str) -> dict | None:
+        try:
+            obj = json.loads(text, strict=False) # strict=False chấp nhận ký tự xuống dòng thô trong chuỗi
+        except json.JSONDecodeError:
+            self.skipped += 1
+            return None
+        return obj if isinstance(obj, dict) else None
+
+    @property
+    def has_partial(self) -> bool:
+        """True when the text ended in the middle of an object (typical for truncated output)."""
+        return self._depth > 0
+
+def salvage_json_objects(text: str) -> list[dict]:
+    """Every complete JSON object that can be recovered from `text`, in order."""
+    return IncrementalJsonObjectParser().feed(text)
+
+def validate_results(items: list[dict], expected_count: int) -> tuple[dict[int, str], list[int], list[int]]:
+    """
+    Checks OCR result items against the number of images sent.
+    Returns (texts by relative index, missing indices, duplicated indices). An index answered twice
+    with different texts counts as duplicated and is left out of the texts, since there is no way
+    to tell which answer is right; identical repeats are harmless and kept.
+    """
+    texts, seen_twice = {}, set()
+    for item in items:
+        index = item.get('index')
+        if isinstance(index, str) and index.isdigit(): index = int(index)
+        if not isinstance(index, int) or isinstance(index, bool) or not 0 <= index < expected_count:
+            continue
+        text = item.get('text', '')
+        if not isinstance(text, str): text = '' if text is None else str(text)
+        if index in texts and texts[index] != text:
+            seen_twice.add(index)
+        texts.setdefault(index, text)
+    for index in seen_twice:
+        del texts[index]
+    missing = [i for i in range(expected_count) if i not in texts and i not in seen_twice]
+    return texts, missing, sorted(seen_twice)
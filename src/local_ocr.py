@@ -0,0 +1,146 @@
+# src/local_ocr.py
+
+import io
+import os
+import csv
+import logging
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.ocr_backends import OcrBackend
+from src.tool_path_manager import get_tool_path
+
+# Tên ngôn ngữ trong ô "OCR Language" -> mã traineddata của Tesseract
+TESSERACT_LANGUAGES = {
+    "auto": "eng", "english": "eng", "vietnamese": "vie", "japanese": "jpn", "chinese": "chi_sim",
+    "korean": "kor", "french": "fra", "german": "deu", "spanish": "spa", "italian": "ita",
+    "russian": "rus", "portuguese": "por", "dutch": "nld", "polish": "pol", "turkish": "tur",
+    "arabic": "ara", "hindi": "hin", "thai": "tha", "indonesian": "ind", "malay": "msa", "filipino": "fil",
+}
+# Tesseract đọc chữ cao ~30 px tốt nhất; ảnh phụ đề thấp hơn được phóng to trước khi nhận dạng
+MIN_TEXT_HEIGHT = 48
+TESSERACT_TIMEOUT_SECONDS = 30
+
+def tesseract_language(ocr_language: str | None) -> str:
+    """Maps the app's language name to a Tesseract code; codes such as 'eng+jpn' pass through."""
+    name = (ocr_language or "auto").strip().lower()
+    return TESSERACT_LANGUAGES.get(name, name or "eng")
+
+def prepare_subtitle_image(path: str) -> bytes:
+    """
+    Turns a subtitle bitmap (light text, dark outline, transparent background) into dark text
+    on white, upscaled if small, and returns it as PNG bytes for Tesseract's stdin.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as img:
+        img = img.convert("RGBA")
+        background = Image.new("RGBA", img.size, (0, 0, 0, 255))
+        gray = Image.alpha_composite(background, img).convert("L")
+        gray = ImageOps.invert(gray)
+        if gray.height < MIN_TEXT_HEIGHT:
+            scale = MIN_TEXT_HEIGHT / max(1, gray.height)
+            gray = gray.resize((max(1, int(gray.width * scale)), MIN_TEXT_HEIGHT), Image.LANCZOS)
+        gray = ImageOps.expand(gray, border=10, fill=255)
+        buffer = io.BytesIO()
+        gray.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+def parse_tesseract_tsv(tsv: str) -> tuple[str, float]:
+    """Joins recognised words into lines and returns (text, mean word confidence in [0, 1])."""
+    lines, weights, total = {}, 0, 0.0
+    for row in csv.DictReader(io.StringIO(tsv), delimiter="\t", quoting=csv.QUOTE_NONE):
+        if row.get("level") != "5": continue
+        word = (row.get("text") or "").strip()
+        try:
+            conf = float(row.get("conf", -1))
+        except ValueError:
+            continue
+        if not word or conf < 0: continue
+        key = (int(row["block_num"]), int(row["par_num"]), int(row["line_num"]))
+        lines.setdefault(key, []).append(word)
+        weights += len(word)
+        total += conf * len(word)
+    text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+    return text, (total / weights / 100) if weights else 0.0
+
+def recognize_image(image_path: str, language: str, tesseract_path: str) -> tuple[str, float, str | None]:
+    """Top-level so it can run in a ProcessPoolExecutor. Returns (text, confidence, error)."""
+    try:
+        data = prepare_subtitle_image(image_path)
+        creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        result = subprocess.run(
+            [tesseract_path, "stdin", "stdout", "-l", language, "--psm", "6", "tsv"],
+            input=data, capture_output=True, check=True, timeout=TESSERACT_TIMEOUT_SECONDS, creationflags=creationflags,
+        )
+        text, confidence = parse_tesseract_tsv(result.stdout.decode("utf-8", errors="replace"))
+        return text, confidence, None
+    except subprocess.CalledProcessError as e:
+        return "", 0.0, f"Tesseract failed: {e.stderr.decode('utf-8', errors='replace').strip()}"
+    except Exception as e:
+        return "", 0.0, str(e)
+
+class TesseractBackend(OcrBackend):
+    """
+    Local CPU OCR: one `tesseract` subprocess per image, run from a process pool sized to the
+    core count (image preparation with Pillow happens in the workers too). Works offline and
+    reports a per-image confidence from Tesseract's word scores.
+    """
+
+    name = "tesseract"
+    reports_confidence = True
+
+    def __init__(self, ocr_language: str = "Auto", max_workers: int | None = None, tesseract_path: str | None = None):
+        self.language = tesseract_language(ocr_language)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.tesseract_path = tesseract_path or get_tool_path("tesseract")
+        self._pool = None
+        self.images = 0
+        self.errors = 0
+
+    def check_available(self) -> str | None:
+        try:
+            subprocess.run([self.tesseract_path, "--version"], capture_output=True, check=True, timeout=10,
+                           creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
+        except (OSError, subprocess.SubprocessError):
+            return "Tesseract not found. Install it or place it in assets/tools/tesseract."
+        return None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def recognize(self, subtitles, indices, image_folder, cancellation_event, on_result, on_failed):
+        error = self.check_available()
+        if error: return error
+        logging.info(f"Local OCR: {len(indices)} images with Tesseract ({self.language}) on {self.max_workers} processes.")
+        pool = self._get_pool()
+        futures = {
+            pool.submit(recognize_image, os.path.join(image_folder, subtitles[i]['image_file']), self.language, self.tesseract_path): i
+            for i in indices
+        }
+        try:
+            for future in as_completed(futures):
+                if cancellation_event.is_set(): break
+                index = futures[future]
+                text, confidence, error = future.result()
+                self.images += 1
+                if error:
+                    self.errors += 1
+                    logging.warning(f"Local OCR failed for subtitle {index + 1}: {error}")
+                    on_failed([index])
+                else:
+                    on_result(index, text, confidence)
+        finally:
+            for future in futures:
+                future.cancel()
+        return None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def summary(self) -> str | None:
+        return f"Local OCR: {self.images} images, {self.errors} errors." if self.images else None
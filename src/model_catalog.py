@@ -0,0 +1,91 @@
+# src/model_catalog.py
+
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+
+from src.settings import APP_DATA_DIR_NAME
+
+MODEL_CATALOG_FILE = "model_catalog.json"
+MODEL_CATALOG_TTL_SECONDS = 24 * 3600
+
+def key_hash(api_key: str) -> str:
+    """Stable identifier for an API key that does not reveal it."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+class ModelCatalog:
+    """
+    The Gemini model list per API key, cached in app_data/model_catalog.json (keyed by a hash
+    of the key, never the key itself). Entries younger than `ttl_seconds` are fresh: callers
+    use them without a network call. Older entries are still returned for display while
+    refresh_async() fetches a new list on a background thread.
+    `fetcher(api_key)` returns (models, error) like src.ocr.get_available_models.
+    """
+
+    def __init__(self, fetcher, cache_dir: str = APP_DATA_DIR_NAME, ttl_seconds: float = MODEL_CATALOG_TTL_SECONDS):
+        self.fetcher = fetcher
+        self.path = os.path.join(cache_dir, MODEL_CATALOG_FILE)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _store(self, api_key: str, models: list):
+        with self._lock:
+            catalog = self._load()
+            catalog[key_hash(api_key)] = {"models": models, "fetched_at": time.time()}
+            directory = os.path.dirname(os.path.abspath(self.path))
+            try:
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(prefix=".models-", suffix=".tmp", dir=directory)
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(catalog, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logging.warning(f"Could not save model catalog: {e}")
+
+    def cached(self, api_key: str) -> tuple[list | None, bool]:
+        """(models, fresh) from the cache without any network call; (None, False) if unknown."""
+        if not api_key: return None, False
+        with self._lock:
+            entry = self._load().get(key_hash(api_key))
+        if not entry: return None, False
+        return entry["models"], time.time() - entry.get("fetched_at", 0) < self.ttl_seconds
+
+    def refresh(self, api_key: str) -> tuple[list, str | None]:
+        """Fetches the list from the API and caches it on success."""
+        models, error = self.fetcher(api_key)
+        if not error: self._store(api_key, models)
+        return models, error
+
+    def refresh_async(self, api_key: str, on_done=None):
+        """Refreshes on a daemon thread; on_done(models, error) is called from that thread."""
+        with self._lock:
+            if api_key in self._refreshing: return
+            self._refreshing.add(api_key)
+
+        def run():
+            try:
+                result = self.refresh(api_key)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(api_key)
+            if on_done: on_done(*result)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def validate(self, api_key: str, model_name: str) -> bool | None:
+        """True/False from a fresh cache, None when only the API can tell."""
+        models, fresh = self.cached(api_key)
+        if not fresh: return None
+        return model_name in models
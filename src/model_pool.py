@@ -0,0 +1,259 @@
+# src/model_pool.py
+
+import re
+import time
+import logging
+import datetime
+import threading
+from collections import deque, OrderedDict
+
+# genai.configure là cấu hình toàn cục; khoá lại để mỗi model được gắn đúng API key của nó
+_configure_lock = threading.Lock()
+# Model đã tạo, dùng lại giữa các lần chạy: (key, model, system prompt, tên context cache) -> GenerativeModel
+_models = OrderedDict()
+MODEL_CACHE_SIZE = 32
+
+AUTH_BENCH_SECONDS = 900
+QUOTA_BENCH_SECONDS = 60
+MAX_BENCH_SECONDS = 900
+ERROR_BENCH_SECONDS = 30
+ERRORS_BEFORE_BENCH = 3
+RATE_WINDOW_SECONDS = 60
+
+_AUTH_MARKERS = ("api key not valid", "api_key_invalid", "permission denied", "unauthenticated")
+_QUOTA_MARKERS = ("quota", "resource_exhausted", "resource has been exhausted", "rate limit")
+# google.api_core ghi mã HTTP ở đầu thông báo lỗi, vd. "429 Resource has been exhausted"
+_STATUS_PREFIX = re.compile(r"^\s*(\d{3})\b")
+
+def classify_error(message: str | None) -> str | None:
+    """'auth', 'quota', 'error', or None for success."""
+    if message is None: return None
+    text = message.lower()
+    status = _STATUS_PREFIX.match(text)
+    if status and status.group(1) in ("401", "403"): return "auth"
+    if status and status.group(1) == "429": return "quota"
+    if any(marker in text for marker in _AUTH_MARKERS): return "auth"
+    if any(marker in text for marker in _QUOTA_MARKERS): return "quota"
+    return "error"
+
+def _genai():
+    # google.generativeai kéo theo grpc/protobuf, mất cả giây để nạp; chỉ nạp khi thực sự gọi API
+    import google.generativeai as genai
+    return genai
+
+_unbound_warned = False
+
+def _bind_client(model):
+    """
+    Gives `model` its client now, while genai.configure() holds this model's key.
+
+    google-generativeai has no public way to give one GenerativeModel its own API key: the model
+    creates its client lazily from the global configuration on its first request, by which time
+    another thread may have configured a different key. Filling in the model's `_client` slot
+    (read by generate_content in google-generativeai 0.7 and 0.8, the range pinned in
+    requirements.txt) is the only way to pin the key. If a future SDK drops that slot the model
+    keeps the lazy client, which is correct with a single key; a warning is logged once, since
+    an api_pool with several keys could then send requests with the wrong key.
+    """
+    global _unbound_warned
+    if getattr(model, "_client", False) is None:
+        from google.generativeai import client as genai_client
+        model._client = genai_client.get_default_generative_client()
+    elif not hasattr(model, "_client") and not _unbound_warned:
+        _unbound_warned = True
+        logging.warning("This google-generativeai version does not let models keep their own client; "
+                        "with several API keys requests may use the wrong key. Install a version from requirements.txt.")
+
+def make_model(api_key: str, model_name: str, system_instruction: str | None = None, cached_content=None):
+    """
+    Creates a GenerativeModel bound to `api_key` even when other keys are configured later.
+    With `cached_content` the model reads its system prompt from that cache. Models are kept
+    in a small process-wide LRU, so later runs with the same key and prompt reuse the client.
+    """
+    cache_key = (api_key, model_name, system_instruction, getattr(cached_content, "name", None))
+    with _configure_lock:
+        model = _models.get(cache_key)
+        if model is not None:
+            _models.move_to_end(cache_key)
+            return model
+    genai = _genai()
+    with _configure_lock:
+        genai.configure(api_key=api_key)
+        if cached_content is not None:
+            model = genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+        else:
+            model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+        _bind_client(model)
+        _models[cache_key] = model
+        while len(_models) > MODEL_CACHE_SIZE:
+            _models.popitem(last=False)
+        return model
+
+def create_cached_content(api_key: str, model_name: str, system_instruction: str, ttl_seconds: float):
+    """Registers `system_instruction` as a Gemini context cache for this key/model. Raises if the API refuses."""
+    genai = _genai()
+    with _configure_lock:
+        genai.configure(api_key=api_key)
+        return genai.caching.CachedContent.create(
+            model=model_name if model_name.startswith("models/") else f"models/{model_name}",
+            system_instruction=system_instruction,
+            ttl=datetime.timedelta(seconds=ttl_seconds),
+        )
+
+def delete_cached_content(api_key: str, cached_content):
+    genai = _genai()
+    with _configure_lock:
+        genai.configure(api_key=api_key)
+        cached_content.delete()
+
+def list_models_for_key(api_key: str) -> list:
+    genai = _genai()
+    with _configure_lock:
+        genai.configure(api_key=api_key)
+        return list(genai.list_models())
+
+class PoolMember:
+    """One (API key, model) pair with its own request-rate limit, concurrency limit and health."""
+
+    def __init__(self, api_key: str, model_name: str, rpm: int | None = None, max_concurrent: int = 1, model_factory=make_model):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.rpm = rpm
+        self.max_concurrent = max(1, int(max_concurrent))
+        self._model_factory = model_factory
+        self._models = {}
+        self._recent = deque()
+        self.in_flight = 0
+        self.benched_until = 0.0
+        self.quota_strikes = 0
+        self.consecutive_errors = 0
+        self.auth_failed = False
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def label(self) -> str:
+        return f"...{self.api_key[-4:]}/{self.model_name}" if self.api_key else self.model_name
+
+    def model_for(self, model_name: str | None = None):
+        """GenerativeModel for this member's key; model_name overrides the member's model (used for hedges)."""
+        name = model_name or self.model_name
+        if name not in self._models:
+            self._models[name] = self._model_factory(self.api_key, name)
+        return self._models[name]
+
+    def capacity(self, now: float) -> float:
+        """Share of this member's limits still free right now (0 when benched or saturated)."""
+        if now < self.benched_until: return 0.0
+        while self._recent and now - self._recent[0] >= RATE_WINDOW_SECONDS:
+            self._recent.popleft()
+        slots = (self.max_concurrent - self.in_flight) / self.max_concurrent
+        if self.rpm:
+            slots = min(slots, (self.rpm - len(self._recent)) / self.rpm)
+        return max(0.0, slots)
+
+    def next_free_at(self, now: float) -> float:
+        """Earliest time a request could be sent again, ignoring in-flight slots."""
+        ready = self.benched_until
+        if self.rpm and len(self._recent) >= self.rpm:
+            ready = max(ready, self._recent[0] + RATE_WINDOW_SECONDS)
+        return max(now, ready)
+
+class ModelPool:
+    """
+    Spreads OCR batches over several API keys and/or models.
+    acquire() hands out the member with the most free capacity and blocks while every member
+    is saturated, rate limited or benched. release() records the outcome: auth errors bench a
+    member for AUTH_BENCH_SECONDS, quota errors for an exponentially growing period, and
+    repeated other errors for ERROR_BENCH_SECONDS.
+    """
+
+    def __init__(self, members: list[PoolMember]):
+        if not members:
+            raise ValueError("Model pool needs at least one member.")
+        self.members = members
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_config(cls, api_pool: list | None, api_key: str, model_name: str, model_factory=make_model) -> "ModelPool":
+        """
+        Builds the pool from the `api_pool` setting: a list of {"api_key", "model", "rpm", "max_concurrent"}.
+        Missing keys/models fall back to the main api_key / selected model; an empty list is a
+        single member, which behaves like the old one-key pipeline.
+        """
+        members = []
+        for entry in api_pool or []:
+            key = entry.get("api_key") or api_key
+            model = entry.get("model") or model_name
+            if not key or not model: continue
+            members.append(PoolMember(key, model, entry.get("rpm"), entry.get("max_concurrent", 1), model_factory))
+        if not members:
+            members.append(PoolMember(api_key, model_name, model_factory=model_factory))
+        return cls(members)
+
+    @property
+    def max_concurrency(self) -> int:
+        return sum(m.max_concurrent for m in self.members)
+
+    def acquire(self, cancellation_event: threading.Event | None = None) -> PoolMember | None:
+        """Blocks until a member has capacity. Returns None if cancelled."""
+        with self._cond:
+            while True:
+                if cancellation_event is not None and cancellation_event.is_set(): return None
+                now = time.monotonic()
+                best = max(self.members, key=lambda m: m.capacity(now))
+                if best.capacity(now) > 0:
+                    self._take(best, now)
+                    return best
+                wake = min(m.next_free_at(now) for m in self.members)
+                self._cond.wait(timeout=min(max(wake - now, 0.05), 1.0))
+
+    def try_acquire(self) -> PoolMember | None:
+        """Non-blocking acquire, used for hedged duplicates. None when no member has capacity."""
+        with self._cond:
+            now = time.monotonic()
+            best = max(self.members, key=lambda m: m.capacity(now))
+            if best.capacity(now) <= 0: return None
+            self._take(best, now)
+            return best
+
+    def _take(self, member: PoolMember, now: float):
+        member.in_flight += 1
+        member.requests += 1
+        member._recent.append(now)
+
+    def release(self, member: PoolMember, error: str | None = None):
+        kind = classify_error(error)
+        with self._cond:
+            member.in_flight -= 1
+            now = time.monotonic()
+            if kind is None:
+                member.quota_strikes = 0
+                member.consecutive_errors = 0
+                member.auth_failed = False
+            else:
+                member.failures += 1
+                bench = 0
+                if kind == "auth":
+                    member.auth_failed = True
+                    bench = AUTH_BENCH_SECONDS
+                elif kind == "quota":
+                    member.quota_strikes += 1
+                    bench = min(MAX_BENCH_SECONDS, QUOTA_BENCH_SECONDS * 2 ** (member.quota_strikes - 1))
+                else:
+                    member.consecutive_errors += 1
+                    if member.consecutive_errors >= ERRORS_BEFORE_BENCH:
+                        member.consecutive_errors = 0
+                        bench = ERROR_BENCH_SECONDS
+                if bench:
+                    member.benched_until = max(member.benched_until, now + bench)
+                    logging.warning(f"Model pool: {member.label} out of rotation for {bench}s after {kind} error: {error}")
+            self._cond.notify_all()
+
+    def all_auth_failed(self) -> bool:
+        """True when every member is benched for an auth error, i.e. waiting would not help."""
+        with self._cond:
+            return all(m.auth_failed for m in self.members)
+
+    def summary(self) -> str:
+        return "Model pool: " + ", ".join(f"{m.label} {m.requests - m.failures}/{m.requests} ok" for m in self.members)
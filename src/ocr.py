@@ -1,23 +1,35 @@
 # src/ocr.py
 
 import os
-import base64
 import json
-import google.generativeai as genai
-from tqdm import tqdm
 import time
 import re
+import queue
 import logging
 import threading
-from itertools import compress
+import uuid
+from collections import deque
+from itertools import chain, islice
 
-from src.settings import save_settings, load_settings
+from src.batch_planner import BatchPlanner, image_sizes_for
+from src.hedging import Hedger, pick_hedge_model
+from src.json_salvage import IncrementalJsonObjectParser, salvage_json_objects, validate_results
+from src.cascade_ocr import CascadeBackend, DEFAULT_ACCEPT_CONFIDENCE
+from src.local_ocr import TesseractBackend
+from src.model_pool import ModelPool, classify_error, create_cached_content, delete_cached_content, list_models_for_key, make_model
+from src.ocr_backends import OcrBackend
+from src.payload_cache import get_payload_cache
+from src.prompt_cache import PromptCache
+from src.telemetry import BatchTelemetry
+from src.tracing import carry_trace, profiled, span
+
+# Thời gian chờ tối đa giữa hai chunk liên tiếp (kể cả chunk đầu tiên) trước khi coi luồng là bị treo
+DEFAULT_STALL_TIMEOUT = 90
 
 def get_available_models(api_key: str) -> tuple[list, str | None]:
     try:
         logging.info("Getting available Gemini models...")
-        genai.configure(api_key=api_key)
-        models = [m.name.replace("models/", "") for m in genai.list_models() if 'generateContent' in m.supported_generation_methods and "models/gemini" in m.name]
+        models = [m.name.replace("models/", "") for m in list_models_for_key(api_key) if 'generateContent' in m.supported_generation_methods and "models/gemini" in m.name]
         if not models:
             logging.warning("No Gemini models found.")
             return [], "No Gemini models found. Please check API key and permissions."
@@ -27,106 +39,469 @@ def get_available_models(api_key: str) -> tuple[list, str | None]:
         logging.error(f"Error getting model list: {e}")
         return [], f"Invalid API Key or connection error: {e}"
 
-def process_batch_with_gemini(batch_of_events, image_folder, log_folder, model, batch_start_index, generation_config, safety_settings, ocr_prompt):
-    api_request_parts = [ocr_prompt]
-    for event in batch_of_events:
-        image_path = os.path.join(image_folder, event['image_file'])
-        try:
-            with open(image_path, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-                api_request_parts.append({"mime_type": "image/png", "data": encoded_string})
-        except FileNotFoundError:
-            logging.warning(f"File {image_path} not found. Skipping.")
-            continue
-    if len(api_request_parts) <= 1: return None, "No images to process."
+def _response_usage(response) -> tuple[int | None, int | None, int | None]:
+    """(input, output, cached input) token counts from response.usage_metadata."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None: return None, None, None
+    return getattr(usage, "prompt_token_count", None), getattr(usage, "candidates_token_count", None), getattr(usage, "cached_content_token_count", None)
 
+def _is_truncated(response) -> bool:
     try:
-        response = model.generate_content(
-            api_request_parts,
-            generation_config=generation_config,
-            safety_settings=safety_settings
-        )
-        
-        log_filename = f"batch_{batch_start_index:04d}.json"
-        log_filepath = os.path.join(log_folder, log_filename)
-        json_content = response.text
+        reason = response.candidates[0].finish_reason
+    except (AttributeError, IndexError, TypeError):
+        return False
+    return getattr(reason, "name", None) == "MAX_TOKENS" or reason == 2
+
+def _parse_json_response(text: str):
+    json_match = re.search(r"```json\s*([\s\S]*?)\s*```", text)
+    return json.loads(json_match.group(1) if json_match else text)
+
+def _request_meta(images: int = 0, input_bytes: int = 0) -> dict:
+    return {"images": images, "input_bytes": input_bytes, "input_tokens": None, "output_tokens": None, "cached_tokens": None, "truncated": False, "missing": [], "stalled": False}
+
+def _pool_error(outcome, cancel_event) -> str | None:
+    """The error a pool member is charged with: only real request failures, not truncation, cancels or empty batches."""
+    results, error_message, meta = outcome
+    if results is not None or not meta["images"] or meta["truncated"] or cancel_event.is_set(): return None
+    return error_message
+
+def _read_stream(model, api_request_parts, generation_config, safety_settings, stall_timeout, on_text, cancel_event=None):
+    """
+    Runs a streaming request and hands each text chunk to `on_text` as it arrives.
+    The request runs on a daemon thread so a silent connection can be abandoned after
+    `stall_timeout` seconds without a chunk. Setting `cancel_event` stops reading (the stream
+    is closed at the next chunk). Returns (text so far, last chunk, stalled, error).
+    """
+    chunks = queue.Queue()
+    cancel_event = cancel_event or threading.Event()
+
+    def pump():
         try:
-            json_match = re.search(r"```json\s*([\s\S]*?)\s*```", response.text)
-            if json_match: json_content = json_match.group(1)
-            parsed_json = json.loads(json_content)
-            with open(log_filepath, 'w', encoding='utf-8') as f:
-                json.dump(parsed_json, f, indent=4, ensure_ascii=False)
-        except Exception as log_e:
-            logging.error(f"Error parsing or saving log {log_filename}: {log_e}")
-            with open(log_filepath.replace('.json', '.txt'), 'w', encoding='utf-8') as f:
-                f.write(response.text)
-
-        json_match = re.search(r"```json\s*([\s\S]*?)\s*```", response.text)
-        if json_match:
-            return json.loads(json_match.group(1)), None
+            for chunk in model.generate_content(api_request_parts, generation_config=generation_config, safety_settings=safety_settings, stream=True):
+                if cancel_event.is_set(): break
+                chunks.put(("chunk", chunk))
+        except Exception as e:
+            chunks.put(("error", e))
         else:
-            return json.loads(response.text), None
-    except Exception as e:
-        return None, str(e)
+            chunks.put(("done", None))
+
+    threading.Thread(target=pump, daemon=True).start()
+    text_parts, last_chunk = [], None
+    last_arrival = time.monotonic()
+    while True:
+        if cancel_event.is_set():
+            return "".join(text_parts), last_chunk, False, RuntimeError("Request cancelled.")
+        try:
+            kind, value = chunks.get(timeout=min(stall_timeout, 0.5))
+        except queue.Empty:
+            if time.monotonic() - last_arrival >= stall_timeout:
+                return "".join(text_parts), last_chunk, True, None
+            continue
+        last_arrival = time.monotonic()
+        if kind == "done":
+            return "".join(text_parts), last_chunk, False, None
+        if kind == "error":
+            return "".join(text_parts), last_chunk, False, value
+        last_chunk = value
+        try:
+            text = value.text
+        except Exception:
+            continue # chunk cuối chỉ mang finish_reason/usage, không có phần văn bản
+        text_parts.append(text)
+        on_text(text)
+
+BATCH_LOG_PATTERN = re.compile(r"^batch_(\d+)(?:_[0-9a-f]+)?\.json$")
+
+def batch_log_name(first_index: int) -> str:
+    """Log file name for one request starting at `first_index`; unique per request."""
+    return f"batch_{first_index:04d}_{uuid.uuid4().hex[:8]}.json"
+
+def process_batch_with_gemini(batch_of_events, image_folder, log_folder, model, batch_indices, generation_config, safety_settings, ocr_prompt, stream=False, stall_timeout=DEFAULT_STALL_TIMEOUT, on_item=None, cancel_event=None):
+    """
+    Sends one batch and returns (results, error, meta).
+    Each result item gets an 'absolute_index' into the subtitle track; images that could not be
+    read are left out of the request and of the index mapping. A malformed or truncated response
+    is salvaged object by object; meta['missing'] lists the absolute indices that came back
+    missing or conflicting so the caller can re-send only those. meta also carries the payload
+    size, token usage and whether the response hit the output-token limit.
+
+    With stream=True the JSON array is parsed as chunks arrive and `on_item(absolute_index, text)`
+    is called for every entry immediately. If no chunk arrives for `stall_timeout` seconds the
+    stream is abandoned: what arrived so far is kept and the rest is reported in meta['missing'].
+    Once `cancel_event` is set (a hedged twin won) the result is dropped without writing a log.
+    """
+    api_request_parts = [ocr_prompt] if ocr_prompt else []
+    sent_indices = []
+    input_bytes = 0
+    with span("payload", "ocr", images=len(batch_indices)):
+        for absolute_index, event in zip(batch_indices, batch_of_events):
+            image_path = os.path.join(image_folder, event['image_file'])
+            try:
+                data, size = get_payload_cache().get(image_path)
+            except FileNotFoundError:
+                logging.warning(f"File {image_path} not found. Skipping.")
+                continue
+            api_request_parts.append({"mime_type": "image/png", "data": data})
+            sent_indices.append(absolute_index)
+            input_bytes += size
+    meta = _request_meta(len(sent_indices), input_bytes)
+    if not sent_indices: return None, "No images to process.", meta
+
+    # Mỗi yêu cầu một log riêng: mini-batch bổ sung và yêu cầu hedge cùng chỉ số đầu không ghi đè log của nhau
+    log_filename = batch_log_name(batch_indices[0])
+    log_filepath = os.path.join(log_folder, log_filename)
+    if stream:
+        parser, emitted = IncrementalJsonObjectParser(), set()
+
+        def on_text(text):
+            for item in parser.feed(text):
+                index = item.get('index')
+                if isinstance(index, int) and not isinstance(index, bool) and 0 <= index < len(sent_indices) and index not in emitted:
+                    emitted.add(index)
+                    if on_item: on_item(sent_indices[index], item.get('text') or '')
+
+        with span("request", "ocr", images=len(sent_indices), stream=True):
+            response_text, response, meta["stalled"], error = _read_stream(model, api_request_parts, generation_config, safety_settings, stall_timeout, on_text, cancel_event)
+        if meta["stalled"]:
+            logging.warning(f"Stream for {log_filename} stalled for {stall_timeout}s after {len(emitted)}/{len(sent_indices)} entries; re-dispatching the rest.")
+        elif error is not None:
+            if not emitted: return None, str(error), meta
+            logging.warning(f"Stream for {log_filename} failed after {len(emitted)}/{len(sent_indices)} entries: {error}")
+        if response is not None:
+            meta["input_tokens"], meta["output_tokens"], meta["cached_tokens"] = _response_usage(response)
+            meta["truncated"] = _is_truncated(response)
+        if not response_text:
+            return None, "Stream stalled before any output." if meta["stalled"] else "Empty response.", meta
+    else:
+        try:
+            with span("request", "ocr", images=len(sent_indices), stream=False):
+                response = model.generate_content(
+                    api_request_parts,
+                    generation_config=generation_config,
+                    safety_settings=safety_settings
+                )
+        except Exception as e:
+            return None, str(e), meta
+
+        meta["input_tokens"], meta["output_tokens"], meta["cached_tokens"] = _response_usage(response)
+        meta["truncated"] = _is_truncated(response)
+        try:
+            response_text = response.text
+        except Exception as e:
+            return None, f"Invalid response: {e}", meta
+    if cancel_event is not None and cancel_event.is_set():
+        return None, "Request cancelled.", meta
+
+    with span("parse", "ocr"):
+        try:
+            parsed_json = _parse_json_response(response_text)
+            if not isinstance(parsed_json, list):
+                raise ValueError("Response is not a JSON array.")
+            items = [item for item in parsed_json if isinstance(item, dict)]
+        except Exception as e:
+            items = salvage_json_objects(response_text)
+            logging.warning(f"Malformed response for {log_filename} ({e}); salvaged {len(items)} complete objects.")
+            try:
+                with open(log_filepath.replace('.json', '.txt'), 'w', encoding='utf-8') as f:
+                    f.write(response_text)
+            except OSError:
+                pass
+
+    texts, missing, duplicates = validate_results(items, len(sent_indices))
+    if missing or duplicates:
+        logging.warning(f"Batch {log_filename}: {len(texts)}/{len(sent_indices)} valid, {len(missing)} missing, {len(duplicates)} conflicting duplicates.")
+    meta["missing"] = [sent_indices[i] for i in sorted(missing + duplicates)]
+    if not texts:
+        return None, "Response contained no usable results.", meta
+
+    results = [{"index": i, "text": text, "absolute_index": sent_indices[i]} for i, text in sorted(texts.items())]
+    if cancel_event is not None and cancel_event.is_set():
+        return None, "Request cancelled.", meta
+    with open(log_filepath, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=4, ensure_ascii=False)
+    return results, None, meta
+
+class GeminiBackend(OcrBackend):
+    """
+    Batched OCR through the Gemini API. Batches are built by BatchPlanner against payload bytes
+    and an output-token budget; batch_size is the upper bound on images per request.
+    With stream=True results are reported entry by entry, and a stalled stream re-dispatches its
+    remaining images right away. With hedge=True a batch still running past its p95 latency is
+    duplicated, on hedge_model_name if given ("auto" picks a flash model from
+    get_available_models), and the first answer wins. api_pool (see ModelPool.from_config)
+    spreads batches over several keys/models; one worker thread runs per concurrent slot in the
+    pool. The prompt is registered once per key/model through PromptCache (prompt_mode 'auto',
+    'system', 'compact' or 'off'). model_factory / cache_factory build the model and
+    context-cache objects and can point the backend at a stand-in API. Raises on a configuration
+    error.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str, generation_config: dict, safety_settings: list, batch_size: int, max_retries: int, ocr_prompt: str, log_folder: str, stream: bool = False, stall_timeout: float = DEFAULT_STALL_TIMEOUT, hedge: bool = False, hedge_model_name: str = "", api_pool: list | None = None, model_factory=make_model, prompt_mode: str = "auto", cache_factory=create_cached_content, cache_deleter=delete_cached_content):
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self.safety_settings = safety_settings
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.log_folder = log_folder
+        self.stream = stream
+        self.stall_timeout = stall_timeout
+        self.prompt_cache = PromptCache(ocr_prompt, prompt_mode, model_factory, cache_factory, cache_deleter)
+        self.ocr_prompt = self.prompt_cache.request_prompt
+        self.pool = ModelPool.from_config(api_pool, api_key, model_name, self.prompt_cache.model_factory)
+        try:
+            for member in self.pool.members:
+                member.model_for()
+        except Exception:
+            self.prompt_cache.close()
+            raise
+        if hedge and hedge_model_name == "auto":
+            available, _ = get_available_models(api_key)
+            hedge_model_name = pick_hedge_model(available, model_name) or ""
+        if hedge and hedge_model_name and hedge_model_name != model_name:
+            logging.info(f"Hedged requests will use fallback model {hedge_model_name}.")
+        self.hedge_model_name = hedge_model_name
+        self.hedger = Hedger(enabled=hedge)
+
+    def recognize(self, subtitles, indices, image_folder, cancellation_event, on_result, on_failed):
+        pool, hedger, max_retries = self.pool, self.hedger, self.max_retries
+        planner = BatchPlanner(self.model_name, self.batch_size, self.generation_config.get("max_output_tokens"))
+        image_sizes = image_sizes_for(subtitles, indices, image_folder)
+        pending = deque(indices)
+        # Ảnh bị thiếu/trùng trong phản hồi được gửi lại riêng trong các mini-batch, ưu tiên trước batch mới
+        followups = deque()
+        resend_counts = {}
+        # Trạng thái chung của các worker, chỉ đọc/ghi khi giữ `state`
+        state = threading.Condition()
+        in_flight = [0]
+        abort_message = []
+        worker_count = min(pool.max_concurrency, max(1, len(indices)))
+        payloads = get_payload_cache()
+
+        def prefetch_upcoming():
+            # Mã hóa trước các ảnh sẽ được gửi tiếp theo (mỗi worker một batch) trong lúc batch hiện tại đang chờ API
+            upcoming = islice(chain(followups, pending), self.batch_size * worker_count)
+            payloads.prefetch(os.path.join(image_folder, subtitles[idx]['image_file']) for idx in upcoming)
+
+        def next_batch():
+            with state:
+                while True:
+                    if cancellation_event.is_set() or abort_message: return None, False
+                    if followups or pending:
+                        is_followup = bool(followups)
+                        batch_indices = planner.take_batch(followups if is_followup else pending, image_sizes)
+                        in_flight[0] += 1
+                        prefetch_upcoming()
+                        return batch_indices, is_followup
+                    if in_flight[0] == 0: return None, False
+                    state.wait(0.5) # batch đang chạy có thể còn đẩy ảnh thiếu vào followups
+
+        def run_batch(batch_indices, is_followup):
+            if is_followup:
+                logging.info(f"Re-sending {len(batch_indices)} missing images from earlier batches.")
+            batch_to_process = [subtitles[idx] for idx in batch_indices]
+
+            def on_item(absolute_index, text):
+                # Chưa qua validate_results: có thể bị loại (trùng lặp mâu thuẫn) và gửi lại sau
+                on_result(absolute_index, text, None, provisional=True)
+
+            # Số liệu của batch qua mọi lần thử: token và byte được cộng dồn vì mỗi lần thử đều bị tính phí
+            stats = {"attempts": 0, "queue_wait": 0.0, "latency": None, "bytes_sent": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "model": None}
+
+            def record(error_class, missing=0):
+                if self.telemetry is not None and stats["attempts"]:
+                    self.telemetry.record(first_index=batch_indices[0], images=len(batch_indices), followup=is_followup, error_class=error_class, missing=missing, **stats)
+
+            results, error_message, requeued = None, "", False
+            for attempt in range(max_retries):
+                if cancellation_event.is_set(): return record("cancelled")
+                if pool.all_auth_failed():
+                    with state:
+                        abort_message.append(f"All API keys were rejected: {error_message}")
+                    return record("auth")
+                waited = time.perf_counter()
+                member = pool.acquire(cancellation_event)
+                stats["queue_wait"] = round(stats["queue_wait"] + time.perf_counter() - waited, 3)
+                if member is None: return record("cancelled")
+
+                def call(cancel, is_hedge):
+                    # Bản dự phòng đi qua key khác nếu pool còn chỗ, nếu không thì dùng chung key của request chính
+                    hedge_member = pool.try_acquire() if is_hedge else None
+                    target = hedge_member or member
+                    try:
+                        model = target.model_for(self.hedge_model_name if is_hedge else None)
+                        # Chỉ request chính đẩy kết quả từng dòng; bản dự phòng chỉ được gộp nếu thắng
+                        outcome = process_batch_with_gemini(batch_to_process, image_folder, self.log_folder, model, batch_indices, self.generation_config, self.safety_settings, self.ocr_prompt, self.stream, self.stall_timeout, None if is_hedge else on_item, cancel)
+                    except Exception as e:
+                        outcome = None, str(e), _request_meta()
+                    outcome[2]["model"] = (self.hedge_model_name if is_hedge else None) or target.model_name
+                    if hedge_member is not None or not is_hedge:
+                        pool.release(target, _pool_error(outcome, cancel))
+                    return outcome
+
+                started = time.perf_counter()
+                results, error_message, meta = hedger.run(call, len(batch_indices))
+                stats["latency"] = round(time.perf_counter() - started, 3)
+                stats["attempts"] += 1
+                stats["bytes_sent"] += meta["input_bytes"]
+                for key in ("input_tokens", "output_tokens", "cached_tokens"):
+                    stats[key] += meta[key] or 0
+                stats["model"] = meta.get("model")
+                planner.observe(meta["images"], meta["input_bytes"], meta["output_tokens"], meta["truncated"], batch_indices[0])
+                if results is not None:
+                    break
+                if meta["truncated"] and len(batch_indices) > 1:
+                    # Phản hồi bị cắt mà không cứu được gì: chia nhỏ lại thay vì gửi lại nguyên batch quá lớn
+                    with state:
+                        (followups if is_followup else pending).extendleft(reversed(batch_indices))
+                    requeued = True
+                    break
+                logging.warning(f"Batch {batch_indices[0]} attempt {attempt + 1}/{max_retries} failed: {error_message}")
+                # Lỗi quota/xác thực đã khiến pool tạm loại key; chỉ chờ lùi dần với các lỗi khác
+                if attempt < max_retries - 1 and not meta["stalled"] and classify_error(error_message) == "error":
+                    time.sleep(2 ** attempt)
+            if requeued: return record("truncated")
+            if cancellation_event.is_set(): return record("cancelled")
+
+            if results is None:
+                record("stalled" if meta["stalled"] else classify_error(error_message))
+                on_failed(batch_indices)
+                return
+            record(None, len(meta["missing"]))
+            for res in results:
+                on_result(res['absolute_index'], res['text'], None)
+            resend, exhausted = [], []
+            with state:
+                for idx in meta["missing"]:
+                    resend_counts[idx] = resend_counts.get(idx, 0) + 1
+                    (resend if resend_counts[idx] <= max_retries else exhausted).append(idx)
+                followups.extend(resend)
+            if exhausted: on_failed(exhausted)
+
+        def worker():
+            with profiled("ocr_worker"):
+                work()
+
+        def work():
+            while True:
+                batch_indices, is_followup = next_batch()
+                if batch_indices is None: return
+                try:
+                    with span("batch", "ocr", first=batch_indices[0], images=len(batch_indices), followup=is_followup):
+                        run_batch(batch_indices, is_followup)
+                except Exception as e:
+                    logging.exception(f"Unexpected error in OCR batch {batch_indices[0]}: {e}")
+                    on_failed(batch_indices)
+                finally:
+                    with state:
+                        in_flight[0] -= 1
+                        state.notify_all()
 
-def run_ocr_pipeline(subtitles: list, image_folder: str, log_folder: str, api_key: str, model_name: str, generation_config: dict, safety_settings: list, batch_size: int, max_retries: int, ocr_prompt: str, cancellation_event: threading.Event, progress_callback=None, indices_to_process=None) -> tuple[list | None, str]:
+        with state:
+            prefetch_upcoming()
+        workers = [threading.Thread(target=carry_trace(worker), daemon=True) for _ in range(worker_count)]
+        try:
+            for thread in workers: thread.start()
+            for thread in workers: thread.join()
+        finally:
+            planner.save()
+            logging.info(payloads.stats())
+        return abort_message[0] if abort_message else None
+
+    def close(self):
+        self.prompt_cache.close()
+
+    def summary(self) -> str | None:
+        lines = []
+        if self.hedger.hedges: lines.append(self.hedger.summary())
+        if len(self.pool.members) > 1: lines.append(self.pool.summary())
+        return " ".join(lines) or None
+
+def create_backend(backend: str, log_folder: str, api_key: str = "", model_name: str = "", generation_config: dict | None = None, safety_settings: list | None = None, batch_size: int = 100, max_retries: int = 5, ocr_prompt: str = "", ocr_language: str = "Auto", stream: bool = False, stall_timeout: float = DEFAULT_STALL_TIMEOUT, hedge: bool = False, hedge_model_name: str = "", api_pool: list | None = None, model_factory=make_model, cascade_confidence: float = DEFAULT_ACCEPT_CONFIDENCE, prompt_mode: str = "auto") -> OcrBackend:
+    """Builds the OCR backend named in the `ocr_backend` setting ('gemini', 'tesseract' or 'cascade')."""
+    if backend == "tesseract":
+        return TesseractBackend(ocr_language)
+    if backend not in ("gemini", "cascade"):
+        raise ValueError(f"Unknown OCR backend '{backend}'.")
+    gemini = GeminiBackend(api_key, model_name, generation_config or {}, safety_settings or [], batch_size, max_retries, ocr_prompt, log_folder, stream, stall_timeout, hedge, hedge_model_name, api_pool, model_factory, prompt_mode)
+    if backend == "cascade":
+        return CascadeBackend(TesseractBackend(ocr_language), gemini, ocr_language, cascade_confidence)
+    return gemini
+
+def run_ocr_pipeline(subtitles: list, image_folder: str, log_folder: str, api_key: str, model_name: str, generation_config: dict, safety_settings: list, batch_size: int, max_retries: int, ocr_prompt: str, cancellation_event: threading.Event, progress_callback=None, indices_to_process=None, failed_indices: set | None = None, stream: bool = False, stall_timeout: float = DEFAULT_STALL_TIMEOUT, hedge: bool = False, hedge_model_name: str = "", api_pool: list | None = None, model_factory=make_model, backend: str | OcrBackend = "gemini", ocr_language: str = "Auto", cascade_confidence: float = DEFAULT_ACCEPT_CONFIDENCE, prompt_mode: str = "auto", telemetry: BatchTelemetry | None = None, result_listener=None) -> tuple[list | None, str]:
+    """
+    OCRs the selected subtitles with the chosen backend ('gemini', 'tesseract', 'cascade' or an
+    OcrBackend instance, which is left open for reuse). In cascade mode, local results with at
+    least `cascade_confidence` (or passing the language checks) are kept and only the rest go
+    to Gemini. Results are merged into `subtitles` as they arrive,
+    engine confidences go to subtitles.confidence when the track has that column, and
+    progress_callback(message, percent) follows every finished image. See GeminiBackend for
+    the Gemini-specific options. Per-batch request statistics go to `telemetry` when given,
+    and its report is logged at the end of the run. result_listener(indices), if given, is called
+    with the subtitle indices whose final result (or failure) has just been merged, e.g. to stream
+    them into a LiveExport; provisional streamed results are shown in `subtitles` but not reported
+    until validated, and a failed index gets its previous text back.
+    """
     logging.info("Starting OCR process...")
+    if not subtitles: return None, "Error reading timing file. File might be corrupt or empty."
+    owns_backend = not isinstance(backend, OcrBackend)
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(model_name)
+        if owns_backend:
+            backend = create_backend(backend, log_folder, api_key, model_name, generation_config, safety_settings, batch_size, max_retries, ocr_prompt, ocr_language, stream, stall_timeout, hedge, hedge_model_name, api_pool, model_factory, cascade_confidence, prompt_mode)
     except Exception as e:
         return None, f"API or model configuration error: {e}"
 
-    if not subtitles: return None, "Error reading timing file. File might be corrupt or empty."
+    if indices_to_process is not None: indices_to_process = set(indices_to_process)
+    indices = [i for i in range(len(subtitles)) if indices_to_process is None or i in indices_to_process]
+    # Chỉ số phụ đề (không phải chỉ số batch) thuộc các batch lỗi; được cập nhật tại chỗ cho AppContext lưu theo phiên
+    all_failed_indices = failed_indices if failed_indices is not None else set()
+    total_subs_to_process = len(indices)
+    confidence = getattr(subtitles, "confidence", None)
+    done = set()
+    provisional_texts = {} # chỉ số -> văn bản trước kết quả tạm (streaming) chưa được xác nhận
+    lock = threading.Lock()
 
-    process_mask = [True] * len(subtitles) if indices_to_process is None else [i in indices_to_process for i in range(len(subtitles))]
-    all_failed_indices = set(load_settings().get('last_failed_batches', []))
-    total_subs_to_process = sum(process_mask)
-    processed_count = 0
-
-    for i in range(0, len(subtitles), batch_size):
-        if cancellation_event.is_set(): return None, "Operation cancelled by user."
-        
-        batch_mask = process_mask[i:i + batch_size]
-        if not any(batch_mask): continue
-
-        batch_to_process = list(compress(subtitles[i:i + batch_size], batch_mask))
-        original_indices_in_batch = [idx for idx, process in enumerate(batch_mask) if process]
-
-        results, error_message = None, ""
-        for attempt in range(max_retries):
-            if cancellation_event.is_set(): return None, "Operation cancelled by user."
-            results, error_message = process_batch_with_gemini(batch_to_process, image_folder, log_folder, model, i, generation_config, safety_settings, ocr_prompt)
-            if results is not None:
-                all_failed_indices.discard(i)
-                break
-            else:
-                time.sleep(2 ** attempt)
-        
-        if results is not None:
-            if isinstance(results, list):
-                for res in results:
-                    try:
-                        relative_index = res['index']
-                        text = res.get('text', '')
-                        original_relative_index = original_indices_in_batch[relative_index]
-                        absolute_index = i + original_relative_index
-                        if 0 <= absolute_index < len(subtitles):
-                            subtitles[absolute_index]['text'] = text
-                    except (TypeError, KeyError, IndexError) as e:
-                        logging.error(f"Error processing result item in batch {i}: {e}. Result: {res}")
+    def report_progress():
+        if progress_callback:
+            progress_percentage = (len(done) / total_subs_to_process) * 100 if total_subs_to_process > 0 else 0
+            progress_callback(f"OCR: {len(done)}/{total_subs_to_process}", progress_percentage)
+
+    def on_result(index, text, score, provisional=False):
+        with lock:
+            if provisional:
+                provisional_texts.setdefault(index, subtitles[index]['text'])
             else:
-                 all_failed_indices.add(i)
-        else:
-            all_failed_indices.add(i)
+                provisional_texts.pop(index, None)
+            subtitles[index]['text'] = text
+            if confidence is not None: confidence[index] = float('nan') if score is None else score
+            all_failed_indices.discard(index)
+            done.add(index)
+            if result_listener and not provisional: result_listener((index,))
+            report_progress()
 
-        processed_count += len(batch_to_process)
-        if progress_callback:
-            progress_percentage = (processed_count / total_subs_to_process) * 100 if total_subs_to_process > 0 else 0
-            progress_callback(f"OCR: {processed_count}/{total_subs_to_process}", progress_percentage)
+    def on_failed(batch_indices):
+        with lock:
+            for index in batch_indices:
+                if index in provisional_texts: subtitles[index]['text'] = provisional_texts.pop(index)
+            all_failed_indices.update(batch_indices)
+            done.update(batch_indices)
+            if result_listener: result_listener(batch_indices)
+            report_progress()
+
+    if telemetry is not None:
+        telemetry.subtitles = total_subs_to_process
+    backend.telemetry = telemetry
+    try:
+        with span("recognize", "ocr", backend=backend.name, images=len(indices)):
+            error = backend.recognize(subtitles, indices, image_folder, cancellation_event, on_result, on_failed)
+    finally:
+        summary = backend.summary()
+        if summary: logging.info(summary)
+        report = telemetry.report() if telemetry is not None else None
+        if report: logging.info(report)
+        if owns_backend: backend.close()
 
-    settings = load_settings()
-    settings['last_failed_batches'] = sorted(list(all_failed_indices))
-    save_settings(settings)
-    
+    if cancellation_event.is_set(): return None, "Operation cancelled by user."
+    if error: return None, error
     return subtitles, "OCR process completed."
@@ -0,0 +1,32 @@
+# src/ocr_backends.py
+
+import threading
+
+class OcrBackend:
+    """
+    An OCR engine that run_ocr_pipeline dispatches to.
+
+    recognize() reports through two callbacks, which the pipeline makes thread-safe:
+        on_result(index, text, confidence)   confidence in [0, 1], or None if the engine has none
+        on_failed(indices)                   images the engine gave up on
+    It may call on_result more than once for the same index (the last call wins) and returns
+    an error message only when the whole run has to stop, otherwise None. A streaming engine can
+    show a result before it is validated with on_result(index, text, confidence, provisional=True);
+    it becomes final with a later plain on_result, or is rolled back if the index fails.
+    """
+
+    name = "base"
+    # True when results carry a meaningful confidence (used by cascade mode)
+    reports_confidence = False
+    # BatchTelemetry of the current run (set by run_ocr_pipeline); engines that send requests record into it
+    telemetry = None
+
+    def recognize(self, subtitles, indices: list[int], image_folder: str, cancellation_event: threading.Event, on_result, on_failed) -> str | None:
+        raise NotImplementedError
+
+    def close(self):
+        """Releases worker processes/clients. The backend may not be used afterwards."""
+
+    def summary(self) -> str | None:
+        """One-line statistics for the log at the end of a run."""
+        return None
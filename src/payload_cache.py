@@ -0,0 +1,117 @@
+# src/payload_cache.py
+
+import os
+import base64
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PAYLOAD_CACHE_MB = 256
+PREFETCH_WORKERS = 2
+
+def encode_image(path: str) -> tuple[str, int]:
+    """Reads a PNG and returns (base64 text, raw byte count)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    return base64.b64encode(data).decode("utf-8"), len(data)
+
+class PayloadCache:
+    """
+    Base64-encoded image parts, shared by every OCR run in the process.
+
+    prefetch() encodes upcoming images on background threads while the current batch is in
+    flight; get() returns the ready part, waits for an in-progress encode, or encodes on the
+    spot. Entries are kept in an LRU bounded by the total size of the encoded text, so
+    retries, hedged duplicates, follow-up mini-batches and "Retry Failed Batches" reuse them
+    without touching the disk. Session images never change once written, so entries are keyed
+    by absolute path and dropped with discard_folder() when a session is closed or deleted.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_PAYLOAD_CACHE_MB * 1024 * 1024, workers: int = PREFETCH_WORKERS):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="payload")
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+
+    def _store(self, path: str, entry: tuple[str, int]):
+        with self._lock:
+            self._pending.pop(path, None)
+            if path in self._entries: return
+            size = len(entry[0])
+            if size > self.max_bytes: return
+            self._entries[path] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (old, _) = self._entries.popitem(last=False)
+                self._bytes -= len(old)
+
+    def _encode(self, path: str) -> tuple[str, int]:
+        entry = encode_image(path)
+        self._store(path, entry)
+        return entry
+
+    def _encode_quietly(self, path: str):
+        try:
+            return self._encode(path)
+        except OSError:
+            with self._lock:
+                self._pending.pop(path, None)
+            return None
+
+    def prefetch(self, paths):
+        """Queues images for background encoding; cached or already queued paths are skipped."""
+        with self._lock:
+            for path in paths:
+                path = os.path.abspath(path)
+                if path in self._entries or path in self._pending: continue
+                self._pending[path] = self._executor.submit(self._encode_quietly, path)
+                self.prefetched += 1
+
+    def get(self, path: str) -> tuple[str, int]:
+        """(base64 text, raw byte count) for `path`. Raises FileNotFoundError like open()."""
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+            future = self._pending.get(path)
+            self.misses += future is None
+        if future is not None:
+            entry = future.result()
+            if entry is not None:
+                with self._lock:
+                    self.hits += 1
+                return entry
+        return self._encode(path)
+
+    def discard_folder(self, folder: str):
+        prefix = os.path.join(os.path.abspath(folder), "")
+        with self._lock:
+            for path in [p for p in self._entries if p.startswith(prefix)]:
+                self._bytes -= len(self._entries.pop(path)[0])
+
+    def stats(self) -> str:
+        with self._lock:
+            return f"Payload cache: {self.hits} hits, {self.misses} misses, {len(self._entries)} images ({self._bytes / 1e6:.1f} MB)."
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_payload_cache(max_mb: int | None = None) -> PayloadCache:
+    """Process-wide cache; max_mb (the payload_cache_mb setting) resizes it when given."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PayloadCache()
+        if max_mb is not None and max_mb * 1024 * 1024 != _cache.max_bytes:
+            _cache.max_bytes = max(0, int(max_mb)) * 1024 * 1024
+            logging.info(f"Payload cache limit set to {max_mb} MB.")
+        return _cache
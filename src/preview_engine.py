@@ -0,0 +1,130 @@
+# src/preview_engine.py
+
+import time
+import queue
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+PREFETCH_RADIUS = 5
+PREVIEW_CACHE_SIZE = 64
+# Hai lần chuyển ảnh cách nhau ít hơn mức này được coi là đang cuộn nhanh (giữ phím mũi tên)
+FAST_NAVIGATION_SECONDS = 0.15
+FAST_FILTER = Image.BILINEAR
+FINAL_FILTER = Image.LANCZOS
+
+def fit_size(image_size: tuple[int, int], container: tuple[int, int]) -> tuple[int, int]:
+    scale = min(container[0] / image_size[0], container[1] / image_size[1])
+    return max(1, int(image_size[0] * scale)), max(1, int(image_size[1] * scale))
+
+def render(path: str, container: tuple[int, int], resample) -> Image.Image:
+    """Decodes `path` and scales it to fit `container`."""
+    with Image.open(path) as img:
+        return img.resize(fit_size(img.size, container), resample)
+
+class PreviewEngine:
+    """
+    Ready-to-display preview images for the subtitle viewer.
+
+    Scaled PIL images live in an LRU keyed by (index, container size); the Tk thread only
+    turns them into a PhotoImage. After every get() the ±`radius` neighbours are decoded
+    and scaled with LANCZOS on a background thread, nearest first in the direction of travel.
+    A cache miss is rendered on the spot with the cheaper FAST_FILTER if the caller is scrolling
+    fast, and the caller asks again with LANCZOS once navigation settles. Changing the
+    container size or the image source drops everything cached and queued.
+    """
+
+    def __init__(self, radius: int = PREFETCH_RADIUS, max_entries: int = PREVIEW_CACHE_SIZE):
+        self.radius = radius
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._jobs = queue.Queue()
+        self._generation = 0
+        self._source = None
+        self._path_for = None
+        self._count = 0
+        self._size = None
+        self._last_index = None
+        self._last_time = 0.0
+        self._direction = 1
+        self._focus = 0
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def set_source(self, source_key, path_for, count: int):
+        """`path_for(index)` gives the image path; a different `source_key` (session folder) invalidates the cache."""
+        with self._lock:
+            self._path_for, self._count = path_for, count
+            if source_key != self._source:
+                self._source = source_key
+                self._invalidate()
+
+    def set_size(self, size: tuple[int, int]):
+        with self._lock:
+            if size != self._size:
+                self._size = size
+                self._invalidate()
+
+    def _invalidate(self):
+        self._entries.clear()
+        self._generation += 1 # job cũ trong hàng đợi bị bỏ qua
+
+    def _put(self, key, image, final: bool):
+        self._entries[key] = (image, final)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def is_fast(self, index: int) -> bool:
+        """True when this navigation follows the previous one closely (arrow key held down)."""
+        now = time.monotonic()
+        fast = self._last_index is not None and index != self._last_index and now - self._last_time < FAST_NAVIGATION_SECONDS
+        if self._last_index is not None and index != self._last_index:
+            self._direction = 1 if index > self._last_index else -1
+        self._last_index, self._last_time = index, now
+        return fast
+
+    def get(self, index: int, fast: bool = False) -> tuple[Image.Image, bool]:
+        """
+        Returns (scaled image, final) for `index`; final is False when a fast-filter image was
+        returned and a LANCZOS render should follow. Raises OSError if the image cannot be read.
+        """
+        with self._lock:
+            self._focus = index
+            size, generation, path_for = self._size, self._generation, self._path_for
+            key = (index, size)
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+        if cached is None or (not cached[1] and not fast):
+            image = render(path_for(index), size, FAST_FILTER if fast else FINAL_FILTER)
+            cached = (image, not fast)
+            with self._lock:
+                if generation == self._generation: self._put(key, *cached)
+        self._prefetch(index, generation)
+        return cached
+
+    def _prefetch(self, index: int, generation: int):
+        order = []
+        for step in range(1, self.radius + 1):
+            order += [index + self._direction * step, index - self._direction * step]
+        for neighbour in order:
+            if 0 <= neighbour < self._count:
+                self._jobs.put((generation, neighbour))
+
+    def _worker(self):
+        while True:
+            generation, index = self._jobs.get()
+            with self._lock:
+                # Bỏ qua job cũ: sau khi đổi kích thước/phiên, hoặc đã cuộn xa khỏi vùng lân cận
+                if generation != self._generation or abs(index - self._focus) > self.radius: continue
+                cached = self._entries.get((index, self._size))
+                if cached is not None and cached[1]: continue
+                size, path_for = self._size, self._path_for
+            try:
+                image = render(path_for(index), size, FINAL_FILTER)
+            except Exception:
+                continue # ảnh lỗi sẽ được báo khi người dùng thực sự chuyển tới
+            with self._lock:
+                if generation == self._generation: self._put((index, size), image, True)
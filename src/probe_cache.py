@@ -0,0 +1,204 @@
+# src/probe_cache.py
+
+import os
+import json
+import time
+import logging
+import subprocess
+import threading
+from fractions import Fraction
+from concurrent.futures import ProcessPoolExecutor
+
+from src import db
+from src.settings import APP_DATA_DIR_NAME
+from src.tool_path_manager import get_tool_path
+
+PROBE_CACHE_DB = "probe_cache.db"
+PROBE_CACHE_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    probed_at REAL NOT NULL
+);
+"""
+
+def _parse_rate(rate: str | None) -> float | None:
+    """Parses ffprobe rates such as '24000/1001'. Returns None for '0/0' or missing values."""
+    try:
+        value = Fraction(rate)
+        return float(value) if value > 0 else None
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+
+def _parse_duration(value) -> float | None:
+    """Accepts ffprobe seconds ('1420.045') or Matroska tag durations ('00:23:40.045000000')."""
+    if value in (None, "", "N/A"): return None
+    try:
+        if isinstance(value, str) and ":" in value:
+            h, m, s = value.split(":")
+            return int(h) * 3600 + int(m) * 60 + float(s)
+        return float(value)
+    except ValueError:
+        return None
+
+def _tag(tags: dict, name: str):
+    """Matroska statistics tags are sometimes suffixed with a language, e.g. NUMBER_OF_FRAMES-eng."""
+    for key, value in tags.items():
+        if key.upper() == name or key.upper().startswith(name + "-"):
+            return value
+    return None
+
+def summarize_probe(data: dict) -> dict:
+    """Reduces raw `ffprobe -show_streams -show_format` JSON to what the app needs."""
+    streams = []
+    for stream in data.get("streams", []):
+        tags = stream.get("tags", {})
+        nb_frames = stream.get("nb_frames") or _tag(tags, "NUMBER_OF_FRAMES")
+        streams.append({
+            "index": stream.get("index"),
+            "codec_type": stream.get("codec_type"),
+            "codec_name": stream.get("codec_name"),
+            "language": tags.get("language", "und"),
+            "title": tags.get("title", ""),
+            "width": stream.get("width"),
+            "height": stream.get("height"),
+            "fps": _parse_rate(stream.get("avg_frame_rate")) or _parse_rate(stream.get("r_frame_rate")),
+            "nb_frames": int(nb_frames) if str(nb_frames or "").isdigit() else None,
+            "duration": _parse_duration(stream.get("duration")) or _parse_duration(_tag(tags, "DURATION")),
+        })
+    fmt = data.get("format", {})
+    return {
+        "streams": streams,
+        "duration": _parse_duration(fmt.get("duration")),
+        "format_name": fmt.get("format_name"),
+    }
+
+def run_ffprobe(video_path: str) -> dict:
+    """Runs ffprobe once for all streams and the container. Raises FileNotFoundError / CalledProcessError."""
+    command = [
+        get_tool_path('ffprobe'), '-v', 'quiet', '-print_format', 'json',
+        '-show_streams', '-show_format', video_path
+    ]
+    creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+    result = subprocess.run(
+        command, capture_output=True, text=True, check=True,
+        encoding='utf-8', creationflags=creationflags
+    )
+    return summarize_probe(json.loads(result.stdout))
+
+def _probe_worker(video_path: str) -> tuple[str, dict | None, str | None]:
+    """Top-level so it can run in a ProcessPoolExecutor."""
+    try:
+        return video_path, run_ffprobe(video_path), None
+    except FileNotFoundError:
+        return video_path, None, "Error: `ffprobe` not found. Please check assets/tools."
+    except subprocess.CalledProcessError as e:
+        return video_path, None, f"Error scanning video: {e.stderr}"
+    except Exception as e:
+        return video_path, None, f"Unknown error: {e}"
+
+class ProbeCache:
+    """
+    Persistent ffprobe results keyed on (absolute path, size, mtime).
+    An unchanged file is never probed twice; a changed file is re-probed on next access.
+    """
+
+    def __init__(self, cache_dir: str = APP_DATA_DIR_NAME):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db_path = os.path.join(cache_dir, PROBE_CACHE_DB)
+        with db.connect(self.db_path) as conn:
+            conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def _file_key(video_path: str) -> tuple[str, int, int]:
+        st = os.stat(video_path)
+        return os.path.abspath(video_path), st.st_size, st.st_mtime_ns
+
+    def get(self, video_path: str) -> dict | None:
+        try:
+            path, size, mtime_ns = self._file_key(video_path)
+        except OSError:
+            return None
+        with db.connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT data FROM probes WHERE path = ? AND size = ? AND mtime_ns = ? AND version = ?",
+                (path, size, mtime_ns, PROBE_CACHE_VERSION),
+            ).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def put(self, video_path: str, summary: dict):
+        path, size, mtime_ns = self._file_key(video_path)
+        with db.connect(self.db_path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO probes (path, size, mtime_ns, version, data, probed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, PROBE_CACHE_VERSION, json.dumps(summary), time.time()),
+            )
+
+    def probe(self, video_path: str) -> tuple[dict | None, str | None]:
+        cached = self.get(video_path)
+        if cached is not None:
+            logging.info(f"Using cached probe for {os.path.basename(video_path)}.")
+            return cached, None
+        _, summary, error = _probe_worker(video_path)
+        if summary is not None:
+            self.put(video_path, summary)
+        return summary, error
+
+    def probe_many(self, video_paths: list[str], max_workers: int | None = None) -> dict[str, tuple[dict | None, str | None]]:
+        """
+        Probes a queue of files. Cache hits are answered immediately; misses run in a process pool
+        (one ffprobe per worker) when there is more than one of them.
+        """
+        results, misses = {}, []
+        for path in video_paths:
+            cached = self.get(path)
+            if cached is not None:
+                results[path] = (cached, None)
+            else:
+                misses.append(path)
+        if len(misses) == 1:
+            results[misses[0]] = self.probe(misses[0])
+        elif misses:
+            workers = max_workers or min(len(misses), os.cpu_count() or 1)
+            logging.info(f"Probing {len(misses)} files with {workers} worker processes ({len(results)} cached).")
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for path, summary, error in pool.map(_probe_worker, misses):
+                    if summary is not None:
+                        self.put(path, summary)
+                    results[path] = (summary, error)
+        return results
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_probe_cache() -> ProbeCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ProbeCache()
+        return _cache
+
+def get_video_timing(video_path: str) -> tuple[float | None, int | None]:
+    """
+    Returns (fps, frame_count) of the first video stream from the probe cache.
+    frame_count comes from the container's frame count when present, otherwise duration * fps.
+    Either value is None when ffprobe cannot tell.
+    """
+    summary, error = get_probe_cache().probe(video_path)
+    if summary is None:
+        logging.warning(f"Could not probe video timing: {error}")
+        return None, None
+    video = next((s for s in summary["streams"] if s["codec_type"] == "video"), None)
+    if video is None:
+        return None, None
+    fps = video["fps"]
+    frame_count = video["nb_frames"]
+    if frame_count is None and fps:
+        duration = video["duration"] or summary["duration"]
+        frame_count = int(round(duration * fps)) if duration else None
+    return fps, frame_count
@@ -0,0 +1,108 @@
+# src/prompt_cache.py
+
+import re
+import time
+import logging
+import threading
+
+from src.model_pool import create_cached_content, delete_cached_content, make_model
+
+PROMPT_MODES = ("auto", "system", "compact", "off")
+CACHE_TTL_SECONDS = 3600
+# API đã từ chối tạo cache cho (key, model) này thì không thử lại trong khoảng thời gian này
+CACHE_REFUSAL_SECONDS = 6 * 3600
+
+_refusals = {} # (api_key, model_name) -> thời điểm bị từ chối (time.monotonic)
+_refusals_lock = threading.Lock()
+
+def _cache_refused(api_key: str, model_name: str) -> bool:
+    with _refusals_lock:
+        refused_at = _refusals.get((api_key, model_name))
+        if refused_at is not None and time.monotonic() - refused_at >= CACHE_REFUSAL_SECONDS:
+            del _refusals[(api_key, model_name)]
+            refused_at = None
+    return refused_at is not None
+
+def _remember_refusal(api_key: str, model_name: str):
+    with _refusals_lock:
+        _refusals[(api_key, model_name)] = time.monotonic()
+
+_FENCED_EXAMPLE = re.compile(r"Example response[^\n]*:\s*```(?:json)?[\s\S]*?(?:```|(?=\n\s*\n\S))", re.IGNORECASE)
+
+def compact_prompt(prompt: str) -> str:
+    """
+    The prompt as a short system instruction: the worked JSON example is dropped (the format
+    rules stay, plus a one-line note if the example showed escaped line breaks) and runs of
+    blank lines and indentation are collapsed.
+    """
+    example = _FENCED_EXAMPLE.search(prompt)
+    text = _FENCED_EXAMPLE.sub("", prompt)
+    lines = [line.strip() for line in text.splitlines()]
+    if example and "\\n" in example.group(0):
+        lines.append('Write line breaks inside "text" as \\n.')
+    compact = "\n".join(line for line in lines if line)
+    return compact or prompt.strip()
+
+class PromptCache:
+    """
+    Sends the OCR prompt once per (API key, model) instead of in every batch.
+
+    mode 'auto' registers the prompt as a Gemini context cache (genai.caching.CachedContent)
+    and builds models from it; if the API refuses (e.g. the prompt is below the model's
+    minimum cacheable size) the prompt, unchanged, becomes the model's system_instruction, and
+    the refusal is remembered process-wide for CACHE_REFUSAL_SECONDS so later runs skip the attempt.
+    'system' always uses the system instruction; 'compact' does too, with compact_prompt()
+    (no worked example, fewer tokens); 'off' keeps the prompt inline in each request.
+    Caches created here are deleted by close().
+    """
+
+    def __init__(self, prompt: str, mode: str = "auto", model_factory=make_model, cache_factory=create_cached_content,
+                 cache_deleter=delete_cached_content, ttl_seconds: float = CACHE_TTL_SECONDS):
+        if mode not in PROMPT_MODES:
+            raise ValueError(f"Unknown prompt cache mode '{mode}'.")
+        self.prompt = prompt
+        self.mode = mode
+        self.ttl_seconds = ttl_seconds
+        self._model_factory = model_factory
+        self._cache_factory = cache_factory
+        self._cache_deleter = cache_deleter
+        self._lock = threading.Lock()
+        self._caches = {}
+        self.fallbacks = 0
+
+    @property
+    def request_prompt(self) -> str:
+        """Text to put in front of every request's images ('' when the prompt lives in the model)."""
+        return self.prompt if self.mode == "off" else ""
+
+    def model_factory(self, api_key: str, model_name: str):
+        """Drop-in for make_model: builds a model that already carries the prompt."""
+        if self.mode == "off":
+            return self._model_factory(api_key, model_name)
+        if self.mode == "auto":
+            with self._lock:
+                cache = self._caches.get((api_key, model_name))
+                if cache is None and _cache_refused(api_key, model_name):
+                    self.fallbacks += 1
+                elif cache is None:
+                    try:
+                        cache = self._cache_factory(api_key, model_name, self.prompt, self.ttl_seconds)
+                        self._caches[(api_key, model_name)] = cache
+                        logging.info(f"Prompt registered as context cache for {model_name}.")
+                    except Exception as e:
+                        _remember_refusal(api_key, model_name)
+                        self.fallbacks += 1
+                        logging.info(f"Context cache unavailable for {model_name} ({e}); using the prompt as system instruction.")
+            if cache is not None:
+                return self._model_factory(api_key, model_name, cached_content=cache)
+        instruction = compact_prompt(self.prompt) if self.mode == "compact" else self.prompt
+        return self._model_factory(api_key, model_name, system_instruction=instruction)
+
+    def close(self):
+        with self._lock:
+            caches, self._caches = self._caches, {}
+        for (api_key, _), cache in caches.items():
+            try:
+                self._cache_deleter(api_key, cache)
+            except Exception as e:
+                logging.warning(f"Could not delete context cache: {e}")
@@ -0,0 +1,250 @@
+# src/review_grid.py
+
+import os
+import math
+import logging
+import threading
+import tkinter as tk
+from tkinter import ttk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import ImageTk
+
+from src.preview_engine import render, FAST_FILTER
+
+ROW_HEIGHT = 56
+THUMBNAIL_SIZE = (360, ROW_HEIGHT - 8)
+THUMBNAIL_CACHE_SIZE = 512
+THUMBNAIL_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_LOW_CONFIDENCE = 0.85
+# Bộ lọc -> nhãn hiển thị
+REVIEW_FILTERS = {"all": "All lines", "empty": "Empty text", "failed": "Failed batches", "low_confidence": "Low confidence"}
+
+def filter_indices(subtitles, failed_indices: set, mode: str, threshold: float = DEFAULT_LOW_CONFIDENCE) -> list[int]:
+    """Subtitle indices matching a review filter ('all', 'empty', 'failed' or 'low_confidence')."""
+    if mode == "all": return list(range(len(subtitles)))
+    if mode == "empty": return [i for i, text in enumerate(subtitles.texts) if not (text or "").strip()]
+    if mode == "failed": return sorted(i for i in failed_indices if 0 <= i < len(subtitles))
+    if mode == "low_confidence":
+        # NaN (engine không trả về độ tin cậy, vd. Gemini) không bị coi là thấp
+        return [i for i, score in enumerate(subtitles.confidence) if not math.isnan(score) and score < threshold]
+    raise ValueError(f"Unknown review filter '{mode}'.")
+
+class ThumbnailCache:
+    """
+    Downscaled subtitle images rendered by a small thread pool into an LRU of PIL images.
+    request() returns a cached thumbnail or queues it; `on_ready(index)` is called from a
+    worker thread when it lands. Jobs for rows that are no longer `wanted` are skipped.
+    """
+
+    def __init__(self, path_for, on_ready, wanted=lambda index: True, max_entries: int = THUMBNAIL_CACHE_SIZE, workers: int = THUMBNAIL_WORKERS):
+        self.path_for = path_for
+        self.on_ready = on_ready
+        self.wanted = wanted
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+
+    def request(self, index: int):
+        with self._lock:
+            image = self._entries.get(index)
+            if image is not None:
+                self._entries.move_to_end(index)
+                return image
+            if index not in self._queued:
+                self._queued.add(index)
+                self._executor.submit(self._render, index)
+        return None
+
+    def _render(self, index: int):
+        try:
+            if not self.wanted(index): return
+            image = render(self.path_for(index), THUMBNAIL_SIZE, FAST_FILTER)
+        except Exception as e:
+            logging.debug(f"Thumbnail {index} failed: {e}")
+            return
+        finally:
+            with self._lock:
+                self._queued.discard(index)
+        with self._lock:
+            self._entries[index] = image
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self.on_ready(index)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+class _Row:
+    """One recycled row slot: thumbnail, time range and editable text."""
+
+    def __init__(self, grid: "ReviewGridWindow", slot: int):
+        self.grid = grid
+        self.index = None
+        self.frame = ttk.Frame(grid.canvas, padding=(4, 2))
+        self.frame.columnconfigure(0, minsize=THUMBNAIL_SIZE[0])
+        self.frame.columnconfigure(2, weight=1)
+        self.thumb = ttk.Label(self.frame, anchor="w")
+        self.thumb.grid(row=0, column=0, rowspan=2, sticky="w")
+        self.number = ttk.Label(self.frame, width=6, anchor="e")
+        self.number.grid(row=0, column=1, sticky="ne", padx=(6, 6))
+        self.time = ttk.Label(self.frame, foreground="gray")
+        self.time.grid(row=1, column=1, columnspan=2, sticky="w", padx=(6, 0))
+        self.text_var = tk.StringVar()
+        self.text_var.trace_add("write", self._on_edit)
+        self.entry = ttk.Entry(self.frame, textvariable=self.text_var)
+        self.entry.grid(row=0, column=2, sticky="ew")
+        for widget in (self.frame, self.thumb, self.number, self.time):
+            widget.bind("<Double-Button-1>", lambda e: grid.open_index(self.index))
+        self.window = grid.canvas.create_window(0, slot * ROW_HEIGHT, window=self.frame, anchor="nw", height=ROW_HEIGHT)
+        self._loading = False
+
+    def show(self, index: int | None):
+        self.index = index
+        self._loading = True
+        try:
+            if index is None:
+                self.grid.canvas.itemconfigure(self.window, state="hidden")
+                return
+            self.grid.canvas.itemconfigure(self.window, state="normal")
+            sub = self.grid.subtitles[index]
+            self.number.config(text=str(index + 1))
+            label = f"{sub['start_srt']} --> {sub['end_srt']}"
+            score = self.grid.subtitles.confidence[index]
+            if not math.isnan(score): label += f"   confidence {score:.2f}"
+            if index in self.grid.failed_indices: label += "   failed"
+            self.time.config(text=label)
+            self.text_var.set(sub.get('text', ''))
+            self.show_thumbnail()
+        finally:
+            self._loading = False
+
+    def show_thumbnail(self):
+        image = self.grid.thumbnails.request(self.index)
+        if image is None:
+            self.thumb.config(image="", text="…")
+            self.thumb.image = None
+            return
+        tk_img = ImageTk.PhotoImage(image)
+        self.thumb.config(image=tk_img, text="")
+        self.thumb.image = tk_img
+
+    def _on_edit(self, *args):
+        if self._loading or self.index is None: return
+        self.grid.subtitles[self.index]['text'] = self.text_var.get()
+        self.grid.on_edit(self.index)
+
+class ReviewGridWindow(tk.Toplevel):
+    """
+    Scrolling review of the whole track. Only the rows that fit in the window exist as widgets;
+    scrolling re-binds those slots to other subtitles, so the cost does not grow with track
+    length. Thumbnails come from a ThumbnailCache filled in the background. Edits are written
+    to the track as they are typed; double-clicking a row opens it in the main previewer.
+    """
+
+    def __init__(self, parent, subtitles, image_folder: str, failed_indices: set, ui_events, on_open, on_edit):
+        super().__init__(parent)
+        self.title("Review Subtitles")
+        self.geometry("1000x700")
+        self.subtitles = subtitles
+        self.failed_indices = failed_indices
+        self.on_open = on_open
+        self.on_edit = on_edit
+        self.ui_events = ui_events
+        self.rows_shown = []
+        self.first = 0
+        self.slots = []
+
+        toolbar = ttk.Frame(self, padding=5)
+        toolbar.pack(fill=tk.X)
+        ttk.Label(toolbar, text="Show:").pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar(value=REVIEW_FILTERS["all"])
+        filter_box = ttk.Combobox(toolbar, textvariable=self.filter_var, values=list(REVIEW_FILTERS.values()), state="readonly", width=18)
+        filter_box.pack(side=tk.LEFT, padx=5)
+        filter_box.bind("<<ComboboxSelected>>", lambda e: self.apply_filter())
+        ttk.Label(toolbar, text="Confidence below:").pack(side=tk.LEFT, padx=(10, 0))
+        self.threshold_var = tk.DoubleVar(value=DEFAULT_LOW_CONFIDENCE)
+        ttk.Spinbox(toolbar, from_=0.0, to=1.0, increment=0.05, textvariable=self.threshold_var, width=6, command=self.apply_filter).pack(side=tk.LEFT, padx=5)
+        self.count_label = ttk.Label(toolbar)
+        self.count_label.pack(side=tk.RIGHT)
+
+        body = ttk.Frame(self)
+        body.pack(fill=tk.BOTH, expand=True)
+        self.canvas = tk.Canvas(body, highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(body, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.canvas.bind("<Configure>", self.on_resize)
+        # Gắn vào cửa sổ để bánh xe chuột hoạt động trên mọi widget con của các hàng
+        self.bind("<MouseWheel>", lambda e: self.scroll_rows(-1 if e.delta > 0 else 1))
+        self.bind("<Button-4>", lambda e: self.scroll_rows(-1))
+        self.bind("<Button-5>", lambda e: self.scroll_rows(1))
+
+        self.thumbnails = ThumbnailCache(
+            lambda i: os.path.join(image_folder, subtitles[i]['image_file']),
+            lambda i: ui_events.call(self._thumbnail_ready, i),
+            self._is_visible,
+        )
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.apply_filter()
+
+    def _is_visible(self, index: int) -> bool:
+        return any(slot.index == index for slot in self.slots)
+
+    def _thumbnail_ready(self, index: int):
+        if not self.winfo_exists(): return
+        for slot in self.slots:
+            if slot.index == index: slot.show_thumbnail()
+
+    def apply_filter(self):
+        mode = next((key for key, label in REVIEW_FILTERS.items() if label == self.filter_var.get()), "all")
+        try:
+            threshold = self.threshold_var.get()
+        except tk.TclError:
+            threshold = DEFAULT_LOW_CONFIDENCE
+        self.rows_shown = filter_indices(self.subtitles, self.failed_indices, mode, threshold)
+        self.count_label.config(text=f"{len(self.rows_shown)} / {len(self.subtitles)} lines")
+        self.first = 0
+        self.refresh()
+
+    def visible_count(self) -> int:
+        return max(1, self.canvas.winfo_height() // ROW_HEIGHT)
+
+    def on_resize(self, event):
+        needed = event.height // ROW_HEIGHT + 1
+        while len(self.slots) < needed:
+            self.slots.append(_Row(self, len(self.slots)))
+        for slot in self.slots:
+            self.canvas.itemconfigure(slot.window, width=event.width)
+        self.refresh()
+
+    def refresh(self):
+        self.first = max(0, min(self.first, len(self.rows_shown) - self.visible_count()))
+        for n, slot in enumerate(self.slots):
+            position = self.first + n
+            index = self.rows_shown[position] if position < len(self.rows_shown) else None
+            if index != slot.index or index is None: slot.show(index)
+        total = max(1, len(self.rows_shown))
+        self.scrollbar.set(self.first / total, min(1.0, (self.first + self.visible_count()) / total))
+
+    def scroll_rows(self, delta: int):
+        self.first += delta
+        self.refresh()
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.first = int(float(amount) * len(self.rows_shown))
+        elif action == "scroll":
+            step = self.visible_count() if unit == "pages" else 1
+            self.first += int(amount) * step
+        self.refresh()
+
+    def open_index(self, index: int | None):
+        if index is not None: self.on_open(index)
+
+    def close(self):
+        self.thumbnails.close()
+        self.destroy()
@@ -0,0 +1,228 @@
+# src/session_catalog.py
+
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+
+from src import db
+
+SESSION_DB_NAME = "sessions.db"
+# Tệp đánh dấu phiên đang mở (kể cả ở tiến trình khác); dọn dẹp bỏ qua thư mục có tệp này
+SESSION_LOCK_FILE = ".in_use"
+# Khoá cũ hơn mức này coi như còn sót lại sau khi ứng dụng bị tắt đột ngột
+STALE_LOCK_SECONDS = 7 * 86400
+# Phiên vừa được tạo/dùng trong khoảng này không bị dọn, kể cả khi vượt hạn mức
+GC_GRACE_SECONDS = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    name TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    kind TEXT NOT NULL DEFAULT 'softsub',
+    source_path TEXT,
+    stream_index INTEGER,
+    timing_file TEXT,
+    track_file TEXT,
+    event_count INTEGER NOT NULL DEFAULT 0,
+    ocr_done_count INTEGER NOT NULL DEFAULT 0,
+    ocr_completed INTEGER NOT NULL DEFAULT 0,
+    disk_bytes INTEGER NOT NULL DEFAULT 0,
+    failed_indices TEXT NOT NULL DEFAULT '[]',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions(created_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions(updated_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_source ON sessions(source_path, stream_index);
+"""
+
+_UPDATABLE_FIELDS = {
+    "kind", "source_path", "stream_index", "timing_file", "track_file",
+    "event_count", "ocr_done_count", "ocr_completed", "disk_bytes", "failed_indices",
+}
+
+# Cột được thêm sau phiên bản đầu tiên của catalog: (tên, định nghĩa) dùng cho ALTER TABLE
+_ADDED_COLUMNS = (
+    ("failed_indices", "TEXT NOT NULL DEFAULT '[]'"),
+)
+
+def directory_size(path: str) -> int:
+    """Total size in bytes of all files below `path`."""
+    total = 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        total += directory_size(entry.path)
+                    else:
+                        total += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return total
+
+def lock_session_dir(path: str):
+    """Marks a session folder as open so no cleanup (in this or another process) removes it."""
+    try:
+        with open(os.path.join(path, SESSION_LOCK_FILE), "w", encoding="utf-8") as f:
+            f.write(str(os.getpid()))
+    except OSError as e:
+        logging.warning(f"Could not mark session as in use: {e}")
+
+def unlock_session_dir(path: str):
+    try:
+        os.remove(os.path.join(path, SESSION_LOCK_FILE))
+    except OSError:
+        pass
+
+def session_in_use(path: str, now: float | None = None) -> bool:
+    """True while the folder holds a lock file that is not older than STALE_LOCK_SECONDS."""
+    try:
+        locked_at = os.path.getmtime(os.path.join(path, SESSION_LOCK_FILE))
+    except OSError:
+        return False
+    return (now or time.time()) - locked_at < STALE_LOCK_SECONDS
+
+class SessionCatalog:
+    """
+    SQLite catalog of the session directories inside app_temp.
+    Each call opens its own short-lived connection, so the catalog can be used from worker threads.
+    """
+
+    def __init__(self, temp_dir: str, db_name: str = SESSION_DB_NAME):
+        self.temp_dir = temp_dir
+        self.db_path = os.path.join(temp_dir, db_name)
+        self._gc_lock = threading.Lock()
+        os.makedirs(temp_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(sessions)")}
+            for column, definition in _ADDED_COLUMNS:
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE sessions ADD COLUMN {column} {definition}")
+
+    def _connect(self):
+        return db.connect(self.db_path)
+
+    def register(self, name: str, path: str, kind: str = "softsub", source_path: str | None = None, stream_index: int | None = None):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO sessions (name, path, kind, source_path, stream_index, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, path, kind, source_path, stream_index, now, now),
+            )
+
+    def update(self, name: str, **fields):
+        unknown = set(fields) - _UPDATABLE_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown session catalog fields: {', '.join(sorted(unknown))}")
+        if not fields: return
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE sessions SET {assignments}, updated_at = ? WHERE name = ?", (*fields.values(), time.time(), name))
+
+    def touch(self, name: str):
+        with self._connect() as conn:
+            conn.execute("UPDATE sessions SET updated_at = ? WHERE name = ?", (time.time(), name))
+
+    def get_failed_indices(self, name: str) -> set[int]:
+        record = self.get(name)
+        return set(json.loads(record["failed_indices"])) if record else set()
+
+    def set_failed_indices(self, name: str, indices):
+        self.update(name, failed_indices=json.dumps(sorted(int(i) for i in indices)))
+
+    def get(self, name: str) -> dict | None:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM sessions WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def list_sessions(self) -> list[dict]:
+        """All known sessions, most recently used first."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM sessions ORDER BY updated_at DESC").fetchall()
+        return [dict(row) for row in rows]
+
+    def find_by_source(self, source_path: str, stream_index: int | None = None) -> list[dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM sessions WHERE source_path = ? AND (? IS NULL OR stream_index = ?) ORDER BY updated_at DESC",
+                (source_path, stream_index, stream_index),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def sync_with_disk(self):
+        """
+        Registers session folders created before the catalog existed and drops records whose folder is gone.
+        Only the top level of app_temp is listed, so this stays cheap.
+        """
+        on_disk = {d for d in os.listdir(self.temp_dir) if os.path.isdir(os.path.join(self.temp_dir, d))}
+        with self._connect() as conn:
+            known = {row["name"] for row in conn.execute("SELECT name FROM sessions")}
+            for name in known - on_disk:
+                conn.execute("DELETE FROM sessions WHERE name = ?", (name,))
+            for name in on_disk - known:
+                path = os.path.join(self.temp_dir, name)
+                mtime = os.path.getmtime(path)
+                conn.execute(
+                    # Một tiến trình khác (hoặc register() của phiên vừa tạo) có thể đã ghi bản ghi này
+                    "INSERT OR IGNORE INTO sessions (name, path, kind, disk_bytes, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (name, path, "hardsub" if name.startswith("HARDSUB_") else "softsub", directory_size(path), mtime, mtime),
+                )
+        return on_disk - known
+
+    def refresh_size(self, name: str) -> int:
+        record = self.get(name)
+        if not record: return 0
+        size = directory_size(record["path"])
+        self.update(name, disk_bytes=size)
+        return size
+
+    def total_size(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COALESCE(SUM(disk_bytes), 0) FROM sessions").fetchone()[0]
+
+    def collect_garbage(self, max_bytes: int | None, max_age_days: float | None, protect=None,
+                        grace_seconds: float = GC_GRACE_SECONDS) -> tuple[list[str], int]:
+        """
+        Deletes session folders older than `max_age_days`, then the least recently used ones until
+        the recorded total is within `max_bytes`. Sessions in `protect` are never removed; it may be
+        a set or a callable returning one, which is asked again right before every removal so a
+        session opened while the cleanup runs is still spared. Sessions used within `grace_seconds`
+        and folders locked by an open session (lock_session_dir, any process) are skipped too.
+        Returns (removed session names, bytes freed).
+        """
+        protected = protect if callable(protect) else (lambda: protect or set())
+        removed, freed = [], 0
+        with self._gc_lock:
+            self.sync_with_disk()
+            sessions = [s for s in reversed(self.list_sessions()) if s["name"] not in protected()] # oldest first
+            total = self.total_size()
+            now = time.time()
+            cutoff = now - max_age_days * 86400 if max_age_days else None
+            for session in sessions:
+                too_old = cutoff is not None and session["updated_at"] < cutoff
+                over_quota = max_bytes is not None and total > max_bytes
+                if not (too_old or over_quota): continue
+                if session["updated_at"] > now - grace_seconds or session_in_use(session["path"], now): continue
+                if session["name"] in protected(): continue
+                try:
+                    shutil.rmtree(session["path"])
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logging.error(f"Could not remove session '{session['name']}': {e}")
+                    continue
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM sessions WHERE name = ?", (session["name"],))
+                removed.append(session["name"])
+                freed += session["disk_bytes"]
+                total -= session["disk_bytes"]
+        if removed:
+            logging.info(f"Session cleanup removed {len(removed)} sessions, freed {freed / 1e6:.1f} MB.")
+        return removed, freed
@@ -1,10 +1,15 @@
 # src/settings.py
 import json
 import os
+import copy
+import atexit
 import logging
+import tempfile
+import threading
 
 SETTINGS_FILE = "settings.json"
 TEMP_DIR_NAME = "app_temp"
+APP_DATA_DIR_NAME = "app_data"
 
 DEFAULT_SETTINGS = {
     "api_key": "",
@@ -12,52 +17,156 @@ DEFAULT_SETTINGS = {
     "batch_size": 100,
     "max_retries": 5,
     "ocr_language": "Auto",
+    "ocr_backend": "gemini",
+    "cascade_confidence": 0.85,
+    "stream_ocr": False,
+    "stream_stall_timeout": 90,
+    "hedge_requests": False,
+    "hedge_model": "",
+    "api_pool": [],
+    "prompt_cache": "auto",
+    "payload_cache_mb": 256,
+    "trace_jobs": False,
+    "profile_hot_loops": False,
+    "job_server_port": 8765,
+    "job_server_workers": 2,
+    "work_queue_path": "",
+    "live_export_format": "srt",
     "generation_config": {
         "temperature": 0.3,
         "top_p": 0.95,
         "top_k": 40
     },
     "bdsup2sub_path": "assets/BDSup2Sub.jar",
+    "temp_quota_mb": 5120,
+    "temp_max_age_days": 30,
     "safety_settings": [
         {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
         {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
         {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
         {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
-    ],
-    "last_failed_batches": []
+    ]
 }
 
-def load_settings() -> dict:
-    if not os.path.exists(SETTINGS_FILE):
-        save_settings(DEFAULT_SETTINGS)
-        return DEFAULT_SETTINGS.copy()
-
-    try:
-        with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
-            user_settings = json.load(f)
-        
-        settings = DEFAULT_SETTINGS.copy()
-        settings.update(user_settings)
-        
-        for key, value in DEFAULT_SETTINGS.items():
-            if isinstance(value, dict):
-                if key not in settings or not isinstance(settings[key], dict):
-                    settings[key] = value.copy()
-                else:
-                    nested_dict = value.copy()
-                    nested_dict.update(settings[key])
-                    settings[key] = nested_dict
+# Trạng thái theo từng phiên (vd. batch lỗi) nay nằm trong session catalog, không còn ở file toàn cục
+RUNTIME_KEYS = ("last_failed_batches",)
+SAVE_DEBOUNCE_SECONDS = 1.0
+
+def merge_with_defaults(user_settings: dict) -> dict:
+    settings = copy.deepcopy(DEFAULT_SETTINGS)
+    settings.update(user_settings)
+
+    for key, value in DEFAULT_SETTINGS.items():
+        if isinstance(value, dict):
+            if key not in settings or not isinstance(settings[key], dict):
+                settings[key] = copy.deepcopy(value)
+            else:
+                nested_dict = copy.deepcopy(value)
+                nested_dict.update(settings[key])
+                settings[key] = nested_dict
+    for key in RUNTIME_KEYS:
+        settings.pop(key, None)
+    return settings
+
+class SettingsStore:
+    """
+    Thread-safe, in-memory copy of the merged settings.
+    settings.json is read once; writes are coalesced on a debounce timer and flushed
+    atomically (temp file + os.replace), plus a final flush at interpreter exit.
+    """
 
+    def __init__(self, path: str = SETTINGS_FILE, debounce_seconds: float = SAVE_DEBOUNCE_SECONDS):
+        self.path = path
+        self.debounce_seconds = debounce_seconds
+        self._lock = threading.RLock()
+        self._timer = None
+        self._dirty = False
+        self._data = self._read()
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            self._dirty = True
+            self._schedule_flush()
+            return copy.deepcopy(DEFAULT_SETTINGS)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                user_settings = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logging.error(f"Error reading {self.path}: {e}. Using default settings.")
+            return copy.deepcopy(DEFAULT_SETTINGS)
+        settings = merge_with_defaults(user_settings)
         if settings != user_settings:
-            save_settings(settings)
-            
+            self._dirty = True
+            self._schedule_flush()
         return settings
-    except (json.JSONDecodeError, IOError):
-        return DEFAULT_SETTINGS.copy()
+
+    def get_all(self) -> dict:
+        with self._lock:
+            return copy.deepcopy(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return copy.deepcopy(self._data.get(key, default))
+
+    def set(self, key, value):
+        with self._lock:
+            if self._data.get(key) == value: return
+            self._data[key] = copy.deepcopy(value)
+            self._dirty = True
+            self._schedule_flush()
+
+    def replace(self, settings_data: dict):
+        with self._lock:
+            data = {k: copy.deepcopy(v) for k, v in settings_data.items() if k not in RUNTIME_KEYS}
+            if data == self._data: return
+            self._data = data
+            self._dirty = True
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce_seconds, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty: return
+            data = copy.deepcopy(self._data)
+            self._dirty = False
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".settings-", suffix=".tmp", dir=directory)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except (IOError, OSError) as e:
+            logging.error(f"Error saving settings to {self.path}: {e}")
+            with self._lock:
+                self._dirty = True
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_settings_store() -> SettingsStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SettingsStore()
+            atexit.register(_store.flush)
+        return _store
+
+def load_settings() -> dict:
+    """Returns a copy of the in-memory settings; the file is only read on first use."""
+    return get_settings_store().get_all()
 
 def save_settings(settings_data: dict):
-    try:
-        with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(settings_data, f, indent=4, ensure_ascii=False)
-    except IOError as e:
-        logging.error(f"Error saving settings to {SETTINGS_FILE}: {e}")
\ No newline at end of file
+    """Replaces the in-memory settings; the file write is debounced and atomic."""
+    get_settings_store().replace(settings_data)
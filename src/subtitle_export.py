@@ -0,0 +1,175 @@
+# src/subtitle_export.py
+
+import os
+import logging
+import threading
+
+import numpy as np
+
+from src.subtitle_track import SubtitleTrack, CHANNEL_TOP
+from src.utils import ms_to_srt_time
+
+TOP_TAG = "{\\an8}"
+ASS_PLAY_RES = (1920, 1080)
+EXPORT_CHUNK = 8192
+
+def _plain_text(text) -> tuple[str, bool]:
+    """(text, forced_top): strips surrounding blanks and the legacy {\\an8} prefix older sessions stored in the text."""
+    text = (text or "").strip()
+    if text.startswith(TOP_TAG):
+        return text[len(TOP_TAG):].lstrip(), True
+    return text, False
+
+def _vtt_time(ms: int) -> str:
+    return ms_to_srt_time(ms).replace(",", ".")
+
+def _ass_time(ms: int) -> str:
+    cs = max(0, int(ms)) // 10
+    s, cs = divmod(cs, 100)
+    m, s = divmod(s, 60)
+    h, m = divmod(m, 60)
+    return f"{h:d}:{m:02d}:{s:02d}.{cs:02d}"
+
+class SubtitleWriter:
+    """
+    Writes cues one at a time to an open text file, so memory does not grow with the track.
+    Subclasses give the header and the text of one cue; top-channel (hardsub) cues are
+    positioned by the format itself instead of by tags stored in the subtitle text.
+    """
+
+    extension = ""
+
+    def __init__(self, f):
+        self.f = f
+        self.count = 0
+
+    def header(self) -> str:
+        return ""
+
+    def cue(self, number: int, start_ms: int, end_ms: int, text: str, top: bool) -> str:
+        raise NotImplementedError
+
+    def begin(self):
+        self.f.write(self.header())
+
+    def write(self, start_ms: int, end_ms: int, text, top: bool = False) -> bool:
+        """Writes one cue; blank text is skipped (nothing to show). Returns whether a cue was written."""
+        text, forced_top = _plain_text(text)
+        if not text: return False
+        self.count += 1
+        self.f.write(self.cue(self.count, int(start_ms), int(end_ms), text, top or forced_top))
+        return True
+
+class SrtWriter(SubtitleWriter):
+    extension = ".srt"
+
+    def cue(self, number, start_ms, end_ms, text, top):
+        # SRT không có kiểu định vị; {\an8} là thẻ ASS mà hầu hết trình phát SRT hiểu
+        if top: text = TOP_TAG + text
+        return f"{number}\n{ms_to_srt_time(start_ms)} --> {ms_to_srt_time(end_ms)}\n{text}\n\n"
+
+class WebVttWriter(SubtitleWriter):
+    extension = ".vtt"
+
+    def header(self):
+        return "WEBVTT\n\n"
+
+    def cue(self, number, start_ms, end_ms, text, top):
+        text = text.replace("&", "&amp;").replace("<", "&lt;").replace("-->", "→")
+        settings = " line:0" if top else ""
+        return f"{number}\n{_vtt_time(start_ms)} --> {_vtt_time(end_ms)}{settings}\n{text}\n\n"
+
+class AssWriter(SubtitleWriter):
+    extension = ".ass"
+    # Hai kiểu: Default ở dưới (Alignment 2) và Top ở trên (Alignment 8) cho kênh trên của hardsub
+    STYLE_FORMAT = ("Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, "
+                    "StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding")
+    STYLE_BODY = "Arial,64,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,0,0,0,0,100,100,0,0,1,3,1,{alignment},60,60,50,1"
+
+    def header(self):
+        width, height = ASS_PLAY_RES
+        return (
+            "[Script Info]\nScriptType: v4.00+\nWrapStyle: 0\nScaledBorderAndShadow: yes\n"
+            f"PlayResX: {width}\nPlayResY: {height}\n\n"
+            f"[V4+ Styles]\nFormat: {self.STYLE_FORMAT}\n"
+            f"Style: Default,{self.STYLE_BODY.format(alignment=2)}\n"
+            f"Style: Top,{self.STYLE_BODY.format(alignment=8)}\n\n"
+            "[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+        )
+
+    def cue(self, number, start_ms, end_ms, text, top):
+        text = text.replace("\r", "").replace("\n", "\\N")
+        return f"Dialogue: 0,{_ass_time(start_ms)},{_ass_time(end_ms)},{'Top' if top else 'Default'},,0,0,0,,{text}\n"
+
+SUBTITLE_FORMATS = {"srt": SrtWriter, "ass": AssWriter, "vtt": WebVttWriter}
+
+def format_for_path(path: str, default: str = "srt") -> str:
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    return ext if ext in SUBTITLE_FORMATS else default
+
+def export_track(track: SubtitleTrack, path: str, fmt: str | None = None) -> int:
+    """
+    Writes the whole track in display order (SRT, ASS or WebVTT, from `fmt` or the file
+    extension) through a temporary file, so an existing file is only replaced by a complete one.
+    Returns the number of cues written.
+    """
+    writer_class = SUBTITLE_FORMATS[fmt or format_for_path(path)]
+    tmp_path = path + ".part"
+    with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+        writer = writer_class(f)
+        writer.begin()
+        order = np.argsort(track.start_ms, kind="stable")
+        # Đổi từng khối sang list Python: nhanh hơn truy cập từng phần tử numpy mà bộ nhớ vẫn giới hạn theo EXPORT_CHUNK
+        for first in range(0, len(order), EXPORT_CHUNK):
+            chunk = order[first:first + EXPORT_CHUNK]
+            for start, end, text, top in zip(track.start_ms[chunk].tolist(), track.end_ms[chunk].tolist(),
+                                             track.texts[chunk].tolist(), (track.channel[chunk] == CHANNEL_TOP).tolist()):
+                writer.write(start, end, text, top)
+    os.replace(tmp_path, path)
+    return writer.count
+
+class LiveExport:
+    """
+    A subtitle file that grows while OCR runs. Results arrive out of order, so cues are
+    appended in display order up to the first subtitle that is still pending, and the file is
+    flushed whenever cues were added; a reader (e.g. a muxer following the file) always sees
+    a valid file whose cues are final. Only a done-flag per subtitle is kept in memory.
+    Call mark_done() with finished (or failed) indices and close() at the end.
+    """
+
+    def __init__(self, track: SubtitleTrack, path: str, fmt: str | None = None):
+        self.track = track
+        self.path = path
+        self._order = np.argsort(track.start_ms, kind="stable")
+        self._done = np.zeros(len(track), dtype=bool)
+        self._next = 0 # vị trí (theo thứ tự hiển thị) của phụ đề đầu tiên chưa ghi
+        self._lock = threading.Lock()
+        self._file = open(path, "w", encoding="utf-8", newline="\n")
+        self.writer = SUBTITLE_FORMATS[fmt or format_for_path(path)](self._file)
+        self.writer.begin()
+        self._file.flush()
+
+    @property
+    def written(self) -> int:
+        return self.writer.count
+
+    def mark_done(self, indices):
+        with self._lock:
+            if self._file.closed: return
+            self._done[np.asarray(list(indices), dtype=np.int64)] = True
+            start = self._next
+            track, order = self.track, self._order
+            while self._next < len(order) and self._done[order[self._next]]:
+                i = order[self._next]
+                self.writer.write(track.start_ms[i], track.end_ms[i], track.texts[i], track.channel[i] == CHANNEL_TOP)
+                self._next += 1
+            if self._next != start: self._file.flush()
+
+    def close(self) -> bool:
+        """Closes the file; True when every subtitle made it into it."""
+        with self._lock:
+            if not self._file.closed: self._file.close()
+            complete = self._next == len(self._order)
+        if not complete:
+            logging.info(f"Live export {os.path.basename(self.path)} stopped at {self._next}/{len(self._order)} subtitles.")
+        return complete
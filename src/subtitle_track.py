@@ -0,0 +1,217 @@
+# src/subtitle_track.py
+
+import json
+import numpy as np
+from collections.abc import MutableMapping
+
+from src.utils import ms_to_srt_time, srt_time_to_ms
+
+CHANNEL_NONE = 0
+CHANNEL_BOTTOM = 1
+CHANNEL_TOP = 2
+CHANNEL_CODES = {"bottom": CHANNEL_BOTTOM, "top": CHANNEL_TOP}
+CHANNEL_NAMES = {code: name for name, code in CHANNEL_CODES.items()}
+
+TRACK_FORMAT_VERSION = 2
+
+class SubtitleEvent(MutableMapping):
+    """
+    Dict-like view of one row of a SubtitleTrack.
+    Reads and writes go straight to the track's arrays, so `sub['text'] = ...` keeps working in the GUI.
+    The 'channel' key only exists for hardsub events, like the old per-event dicts.
+    """
+    __slots__ = ("_track", "_index")
+
+    def __init__(self, track, index: int):
+        self._track = track
+        self._index = index
+
+    def _keys(self) -> tuple:
+        base = ("start_srt", "end_srt", "start_ms", "end_ms", "image_file", "text")
+        return base + ("channel",) if self._track.channel[self._index] != CHANNEL_NONE else base
+
+    def __getitem__(self, key):
+        t, i = self._track, self._index
+        if key == "start_srt": return ms_to_srt_time(t.start_ms[i])
+        if key == "end_srt": return ms_to_srt_time(t.end_ms[i])
+        if key == "start_ms": return int(t.start_ms[i])
+        if key == "end_ms": return int(t.end_ms[i])
+        if key == "image_file": return t.image_files[t.image_id[i]]
+        if key == "text": return t.texts[i]
+        if key == "channel" and t.channel[i] != CHANNEL_NONE: return CHANNEL_NAMES[int(t.channel[i])]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        t, i = self._track, self._index
+        if key == "text": t.texts[i] = value
+        elif key == "start_ms": t.start_ms[i] = value
+        elif key == "end_ms": t.end_ms[i] = value
+        elif key == "start_srt": t.start_ms[i] = srt_time_to_ms(value)
+        elif key == "end_srt": t.end_ms[i] = srt_time_to_ms(value)
+        elif key == "channel": t.channel[i] = CHANNEL_CODES.get(value, CHANNEL_NONE)
+        else: raise KeyError(f"SubtitleEvent field '{key}' is read-only.")
+
+    def __delitem__(self, key):
+        raise TypeError("SubtitleEvent fields cannot be deleted.")
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def __repr__(self):
+        return f"SubtitleEvent({dict(self)!r})"
+
+class SubtitleTrack:
+    """
+    Columnar store for subtitle events.
+
+    start_ms / end_ms are int64, channel is an int8 code (0 = none, 1 = bottom, 2 = top),
+    image_id indexes into the shared `image_files` list and text lives in a separate
+    object array. confidence is the OCR engine's float32 score in [0, 1] (NaN when the
+    engine gives none, e.g. Gemini). Slicing returns a view that shares the underlying buffers, so batches
+    cost no copies; fancy indexing (`take`) copies.
+    """
+
+    def __init__(self, start_ms=None, end_ms=None, channel=None, image_id=None, image_files=None, texts=None, confidence=None):
+        self.start_ms = np.asarray(start_ms if start_ms is not None else [], dtype=np.int64)
+        n = len(self.start_ms)
+        self.end_ms = np.asarray(end_ms if end_ms is not None else np.zeros(n), dtype=np.int64)
+        self.channel = np.asarray(channel if channel is not None else np.zeros(n), dtype=np.int8)
+        self.image_id = np.asarray(image_id if image_id is not None else np.arange(n), dtype=np.int32)
+        self.image_files = image_files if image_files is not None else []
+        if texts is None:
+            texts = [""] * n
+        if isinstance(texts, np.ndarray) and texts.dtype == object:
+            self.texts = texts
+        else:
+            self.texts = np.empty(n, dtype=object)
+            self.texts[:] = list(texts)
+        self.confidence = np.asarray(confidence if confidence is not None else np.full(n, np.nan), dtype=np.float32)
+
+    @classmethod
+    def from_events(cls, events) -> "SubtitleTrack":
+        """Builds a track from an iterable of event dicts (parser output or legacy session JSON)."""
+        starts, ends, channels, texts, image_files = [], [], [], [], []
+        for event in events:
+            starts.append(event["start_ms"] if "start_ms" in event else srt_time_to_ms(event["start_srt"]))
+            ends.append(event["end_ms"] if "end_ms" in event else srt_time_to_ms(event["end_srt"]))
+            channels.append(CHANNEL_CODES.get(event.get("channel"), CHANNEL_NONE))
+            texts.append(event.get("text", ""))
+            image_files.append(event["image_file"])
+        return cls(starts, ends, channels, np.arange(len(starts)), image_files, texts)
+
+    @classmethod
+    def concat(cls, tracks) -> "SubtitleTrack":
+        """Concatenates tracks into a new one; image ids are re-based onto a merged image list."""
+        tracks = [t for t in tracks if len(t)]
+        if not tracks: return cls()
+        image_files, image_ids, offset = [], [], 0
+        for t in tracks:
+            image_files.extend(t.image_files)
+            image_ids.append(t.image_id.astype(np.int32) + offset)
+            offset += len(t.image_files)
+        return cls(
+            np.concatenate([t.start_ms for t in tracks]),
+            np.concatenate([t.end_ms for t in tracks]),
+            np.concatenate([t.channel for t in tracks]),
+            np.concatenate(image_ids),
+            image_files,
+            np.concatenate([t.texts for t in tracks]),
+            np.concatenate([t.confidence for t in tracks]),
+        )
+
+    def __len__(self):
+        return len(self.start_ms)
+
+    def __bool__(self):
+        return len(self.start_ms) > 0
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return SubtitleTrack(self.start_ms[key], self.end_ms[key], self.channel[key], self.image_id[key], self.image_files, self.texts[key], self.confidence[key])
+        if isinstance(key, (int, np.integer)):
+            index = int(key)
+            if index < 0: index += len(self)
+            if not 0 <= index < len(self): raise IndexError("SubtitleTrack index out of range")
+            return SubtitleEvent(self, index)
+        return self.take(key)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield SubtitleEvent(self, i)
+
+    def __repr__(self):
+        return f"SubtitleTrack({len(self)} events)"
+
+    @property
+    def has_channels(self) -> bool:
+        return bool(len(self) and (self.channel != CHANNEL_NONE).any())
+
+    def take(self, indices) -> "SubtitleTrack":
+        """Returns a copy containing the rows at `indices` (array of ints or boolean mask)."""
+        indices = np.asarray(indices)
+        return SubtitleTrack(self.start_ms[indices], self.end_ms[indices], self.channel[indices], self.image_id[indices], self.image_files, self.texts[indices], self.confidence[indices])
+
+    def to_dicts(self) -> list[dict]:
+        return [dict(event) for event in self]
+
+    def sort_by_start(self) -> np.ndarray:
+        """Stable in-place sort by (start_ms, end_ms). Returns the permutation that was applied."""
+        order = np.lexsort((self.end_ms, self.start_ms))
+        self.start_ms, self.end_ms = self.start_ms[order], self.end_ms[order]
+        self.channel, self.image_id, self.texts = self.channel[order], self.image_id[order], self.texts[order]
+        self.confidence = self.confidence[order]
+        return order
+
+    def overlapping(self, start_ms: int, end_ms: int) -> np.ndarray:
+        """Indices of events that overlap the half-open window [start_ms, end_ms)."""
+        return np.nonzero((self.start_ms < end_ms) & (self.end_ms > start_ms))[0]
+
+    def find_overlaps(self, same_channel: bool = True) -> np.ndarray:
+        """
+        Pairs (i, j) of consecutive events (in start order) whose time ranges overlap.
+        With same_channel=True, top and bottom events may overlap freely and are only compared within their channel.
+        """
+        order = np.lexsort((self.end_ms, self.start_ms, self.channel if same_channel else np.zeros(len(self), dtype=np.int8)))
+        starts, ends = self.start_ms[order], self.end_ms[order]
+        mask = starts[1:] < ends[:-1]
+        if same_channel:
+            channels = self.channel[order]
+            mask &= channels[1:] == channels[:-1]
+        pos = np.nonzero(mask)[0]
+        return np.stack([order[pos], order[pos + 1]], axis=1) if len(pos) else np.empty((0, 2), dtype=np.int64)
+
+    def merge_adjacent(self, max_gap_ms: int = 0) -> "SubtitleTrack":
+        """
+        Returns a new sorted track where consecutive events of the same channel with identical
+        text and a gap of at most `max_gap_ms` are merged into one (first image kept).
+        """
+        if not len(self): return SubtitleTrack()
+        order = np.lexsort((self.start_ms, self.channel))
+        starts, ends, channels, texts = self.start_ms[order], self.end_ms[order], self.channel[order], self.texts[order]
+        continues = np.zeros(len(order), dtype=bool)
+        continues[1:] = (channels[1:] == channels[:-1]) & (starts[1:] - ends[:-1] <= max_gap_ms) & (texts[1:] == texts[:-1])
+        group = np.cumsum(~continues) - 1
+        firsts = np.nonzero(~continues)[0]
+        merged_ends = np.full(len(firsts), np.iinfo(np.int64).min, dtype=np.int64)
+        np.maximum.at(merged_ends, group, ends)
+        merged = SubtitleTrack(starts[firsts], merged_ends, channels[firsts], self.image_id[order][firsts], self.image_files, texts[firsts], self.confidence[order][firsts])
+        merged.sort_by_start()
+        return merged
+
+    def save(self, path: str):
+        """Writes the track as a compact binary .npz (no pickling; strings are stored as UTF-8 JSON)."""
+        strings = json.dumps({"image_files": self.image_files, "texts": list(self.texts)}, ensure_ascii=False).encode("utf-8")
+        with open(path, "wb") as f:
+            np.savez(f, version=np.array([TRACK_FORMAT_VERSION]), start_ms=self.start_ms, end_ms=self.end_ms,
+                     channel=self.channel, image_id=self.image_id, confidence=self.confidence, strings=np.frombuffer(strings, dtype=np.uint8))
+
+    @classmethod
+    def load(cls, path: str) -> "SubtitleTrack":
+        with np.load(path, allow_pickle=False) as data:
+            strings = json.loads(data["strings"].tobytes().decode("utf-8"))
+            # Track phiên bản 1 chưa có cột confidence
+            confidence = data["confidence"] if "confidence" in data.files else None
+            return cls(data["start_ms"], data["end_ms"], data["channel"], data["image_id"], strings["image_files"], strings["texts"], confidence)
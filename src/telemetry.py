@@ -0,0 +1,94 @@
+# src/telemetry.py
+
+import json
+import time
+import logging
+import threading
+
+from src.hedging import percentile
+
+TELEMETRY_FILE_NAME = "telemetry.jsonl"
+# Giá niêm yết ước tính (USD / 1 triệu token: đầu vào, đầu ra), khớp theo tiền tố dài nhất của tên model
+MODEL_PRICES = {
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-1.5-flash": (0.075, 0.30),
+}
+# Token đọc từ context cache được tính ~25% giá đầu vào thường
+CACHED_TOKEN_RATE = 0.25
+
+def model_price(model_name: str) -> tuple[float, float] | None:
+    matches = [prefix for prefix in MODEL_PRICES if (model_name or "").startswith(prefix)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+def estimate_cost(model_name: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> float | None:
+    """Estimated USD cost of a request, or None for models without a known price."""
+    price = model_price(model_name)
+    if price is None: return None
+    billable_input = input_tokens - cached_tokens * (1 - CACHED_TOKEN_RATE)
+    return (billable_input * price[0] + output_tokens * price[1]) / 1_000_000
+
+class BatchTelemetry:
+    """
+    One JSON line per OCR batch in the session directory (telemetry.jsonl), appended as batches
+    finish so a crashed or cancelled run still leaves its numbers behind. Each record has
+    the tokens billed across all attempts, the bytes sent, the time spent waiting for a free API
+    slot (queue_wait), the latency of the last request, the attempt count and the error class
+    (None on success). summary() and report() cover the records of this run only.
+    """
+
+    def __init__(self, path: str | None):
+        self.path = path
+        self.records = []
+        self.subtitles = 0
+        self._lock = threading.Lock()
+
+    def record(self, **fields):
+        fields["time"] = round(time.time(), 3)
+        with self._lock:
+            self.records.append(fields)
+            if not self.path: return
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(fields, ensure_ascii=False) + "\n")
+            except OSError as e:
+                logging.warning(f"Could not write telemetry: {e}")
+
+    def summary(self) -> dict:
+        with self._lock:
+            records = list(self.records)
+        latencies = [r["latency"] for r in records if r.get("latency") is not None]
+        input_tokens = sum(r.get("input_tokens") or 0 for r in records)
+        output_tokens = sum(r.get("output_tokens") or 0 for r in records)
+        costs = [estimate_cost(r.get("model"), r.get("input_tokens") or 0, r.get("output_tokens") or 0, r.get("cached_tokens") or 0) for r in records]
+        known = [c for c in costs if c is not None]
+        return {
+            "batches": len(records),
+            "failed_batches": sum(1 for r in records if r.get("error_class")),
+            "attempts": sum(r.get("attempts", 0) for r in records),
+            "bytes_sent": sum(r.get("bytes_sent", 0) for r in records),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "latency_p50": percentile(latencies, 50) if latencies else None,
+            "latency_p95": percentile(latencies, 95) if latencies else None,
+            "queue_wait_total": sum(r.get("queue_wait", 0) for r in records),
+            "tokens_per_subtitle": (input_tokens + output_tokens) / self.subtitles if self.subtitles else None,
+            "estimated_cost": sum(known) if known else None,
+        }
+
+    def report(self) -> str | None:
+        """One-line summary for the log and the status bar, or None if no request was made."""
+        s = self.summary()
+        if not s["batches"]: return None
+        parts = [f"{s['batches']} batches ({s['attempts']} requests)"]
+        if s["latency_p50"] is not None:
+            parts.append(f"latency p50 {s['latency_p50']:.1f}s / p95 {s['latency_p95']:.1f}s")
+        if s["tokens_per_subtitle"] is not None:
+            parts.append(f"{s['tokens_per_subtitle']:.0f} tokens/subtitle")
+        if s["estimated_cost"] is not None:
+            parts.append(f"~${s['estimated_cost']:.4f}")
+        return "OCR telemetry: " + ", ".join(parts) + "."
@@ -22,7 +22,8 @@ def get_tool_path(tool_name: str) -> str:
         "ffmpeg": "ffmpeg.exe",
         "ffprobe": "ffprobe.exe",
         "mkvextract": "mkvextract.exe",
-        "java": os.path.join("java", "bin", "java.exe") # Đường dẫn tương đối bên trong assets/tools
+        "java": os.path.join("java", "bin", "java.exe"), # Đường dẫn tương đối bên trong assets/tools
+        "tesseract": os.path.join("tesseract", "tesseract.exe")
     }
 
     executable_name = tool_map.get(tool_name.lower())
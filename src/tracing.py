@@ -0,0 +1,138 @@
+# src/tracing.py
+
+import os
+import json
+import time
+import cProfile
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+TRACE_DIR_NAME = "traces"
+PROFILE_DIR_NAME = "profiles"
+
+class Tracer:
+    """
+    Collects spans as Chrome trace 'complete' events (ph 'X'), one lane per thread, and
+    writes them as JSON that chrome://tracing and ui.perfetto.dev open directly. With
+    `profile` set, profiled() blocks also write cProfile .prof files next to the trace.
+    """
+
+    def __init__(self, path: str, profile: bool = False):
+        self.path = path
+        self.profile = profile
+        self.profile_dir = os.path.join(os.path.dirname(path), PROFILE_DIR_NAME)
+        self.events = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._profiles = 0
+
+    def _us(self, t: float) -> float:
+        return round((t - self._origin) * 1_000_000, 1)
+
+    def add(self, name: str, category: str, started: float, ended: float, args: dict):
+        event = {"name": name, "cat": category, "ph": "X", "ts": self._us(started), "dur": round((ended - started) * 1_000_000, 1),
+                 "pid": self._pid, "tid": threading.get_ident(), "args": args}
+        with self._lock:
+            self.events.append(event)
+
+    def next_profile_path(self, name: str) -> str:
+        with self._lock:
+            self._profiles += 1
+            n = self._profiles
+        os.makedirs(self.profile_dir, exist_ok=True)
+        return os.path.join(self.profile_dir, f"{os.path.splitext(os.path.basename(self.path))[0]}_{name}_{n}.prof")
+
+    def save(self):
+        with self._lock:
+            events = list(self.events)
+        # Metadata: tên luồng để Perfetto hiển thị nhãn thay vì số tid
+        names = {t.ident: t.name for t in threading.enumerate()}
+        meta = [{"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": names.get(tid, str(tid))}}
+                for tid in {e["tid"] for e in events}]
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, f)
+            logging.info(f"Trace written to {self.path} ({len(events)} spans).")
+        except OSError as e:
+            logging.warning(f"Could not write trace: {e}")
+
+# Trace của job đang chạy trong ngữ cảnh hiện tại: mỗi luồng (và mỗi job của job server) có trace riêng
+_active = contextvars.ContextVar("active_tracer", default=None)
+
+def trace_path(session_dir: str, job: str) -> str:
+    # Thư mục con riêng: file .json ở gốc phiên có thể bị nhận nhầm là log hardsub cũ
+    return os.path.join(session_dir, TRACE_DIR_NAME, f"trace_{job}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+
+@contextmanager
+def tracing(path: str | None, profile: bool = False):
+    """
+    Records spans into `path` for the duration of the block; path None disables tracing.
+    The trace belongs to the calling thread; threads it starts join it through carry_trace().
+    """
+    if path is None:
+        yield None
+        return
+    tracer = Tracer(path, profile)
+    token = _active.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _active.reset(token)
+        tracer.save()
+
+def carry_trace(func):
+    """
+    Wraps `func` to record into the caller's trace when it runs on another thread (new threads
+    and pool workers start without it). The wrapper may run on several threads at once.
+    """
+    tracer = _active.get()
+    if tracer is None: return func
+    def run(*args, **kwargs):
+        token = _active.set(tracer)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _active.reset(token)
+    return run
+
+@contextmanager
+def span(name: str, category: str = "app", **args):
+    """Times the block as a span of the active trace (no-op when tracing is off). args show up in the trace viewer."""
+    tracer = _active.get()
+    if tracer is None:
+        yield args
+        return
+    started = time.perf_counter()
+    try:
+        yield args # khối có thể bổ sung args, vd. số frame đã xử lý
+    finally:
+        tracer.add(name, category, started, time.perf_counter(), args)
+
+@contextmanager
+def profiled(name: str):
+    """cProfile of the block in the current thread when the active trace has profiling enabled."""
+    tracer = _active.get()
+    if tracer is None or not tracer.profile:
+        yield
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError: # Python 3.12+: chỉ một profiler được bật cùng lúc trong tiến trình
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path = tracer.next_profile_path(name)
+        try:
+            profiler.dump_stats(path)
+            logging.info(f"Profile written to {path}.")
+        except OSError as e:
+            logging.warning(f"Could not write profile: {e}")
@@ -3,6 +3,9 @@
 import tkinter as tk
 from tkinter import ttk
 
+# Giá trị của cài đặt ocr_backend -> nhãn hiển thị
+OCR_BACKEND_LABELS = {"gemini": "Gemini", "tesseract": "Tesseract (local)", "cascade": "Cascade (local, then Gemini)"}
+
 class SubtitleSelectionDialog(tk.Toplevel):
     def __init__(self, parent, streams):
         super().__init__(parent)
@@ -128,5 +131,12 @@ def create_advanced_settings(parent, gui_instance):
     ocr_lang_combobox.grid(row=2, column=1, columnspan=2, sticky="ew", padx=5, pady=(5,0))
     ocr_lang_combobox.bind("<<ComboboxSelected>>", gui_instance.save_advanced_settings)
     ocr_lang_combobox.bind("<FocusOut>", gui_instance.save_advanced_settings)
+
+    # OCR Engine
+    ttk.Label(adv_frame, text="OCR Engine:").grid(row=3, column=0, sticky="w", pady=(5,0))
+    backend_combobox = ttk.Combobox(adv_frame, textvariable=gui_instance.ocr_backend_var, state="readonly")
+    backend_combobox['values'] = list(OCR_BACKEND_LABELS.values())
+    backend_combobox.grid(row=3, column=1, columnspan=2, sticky="ew", padx=5, pady=(5,0))
+    backend_combobox.bind("<<ComboboxSelected>>", gui_instance.save_advanced_settings)
     
     return adv_frame
@@ -0,0 +1,78 @@
+# src/ui_events.py
+
+import logging
+import threading
+import tkinter as tk
+from collections import deque
+
+POLL_INTERVAL_MS = 50
+MAX_LOG_LINES = 2000
+
+class UiEventQueue:
+    """
+    The only way worker threads talk to Tk. Workers post progress, log lines and callables
+    from any thread; a single after() poller on the main thread drains them every
+    POLL_INTERVAL_MS. Progress is coalesced to the latest value and log lines are inserted in
+    one batch per tick, so a burst of updates costs one redraw instead of one event each.
+    The log widget keeps at most `max_log_lines` lines.
+    """
+
+    def __init__(self, root: tk.Misc, on_progress, log_widget=None, interval_ms: int = POLL_INTERVAL_MS, max_log_lines: int = MAX_LOG_LINES):
+        self.root = root
+        self.on_progress = on_progress
+        self.log_widget = log_widget
+        self.interval_ms = interval_ms
+        self.max_log_lines = max_log_lines
+        self._lock = threading.Lock()
+        self._progress = None
+        # Dòng cũ hơn giới hạn của widget sẽ bị xoá ngay nên không cần giữ trong hàng đợi
+        self._log_lines = deque(maxlen=max_log_lines)
+        self._calls = deque()
+
+    def start(self):
+        self.root.after(self.interval_ms, self._poll)
+
+    def post_progress(self, message: str | None, percentage: float):
+        """Latest progress wins; `message` None leaves the status text unchanged."""
+        with self._lock:
+            self._progress = (message, percentage)
+
+    def post_log(self, line: str):
+        with self._lock:
+            self._log_lines.append(line)
+
+    def call(self, func, *args, **kwargs):
+        """Runs func(*args, **kwargs) on the Tk thread, after any progress posted before it."""
+        with self._lock:
+            self._calls.append((func, args, kwargs))
+
+    def _poll(self):
+        # Lên lịch trước: callback có thể mở hộp thoại modal (wait_window) và chạy vòng lặp sự kiện lồng nhau
+        self.root.after(self.interval_ms, self._poll)
+        with self._lock:
+            progress, self._progress = self._progress, None
+            lines = list(self._log_lines)
+            self._log_lines.clear()
+            calls = list(self._calls)
+            self._calls.clear()
+        try:
+            if progress is not None: self.on_progress(*progress)
+            if lines: self._append_log(lines)
+        except tk.TclError:
+            pass # cửa sổ đang đóng
+        for func, args, kwargs in calls:
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                logging.exception(f"UI callback {getattr(func, '__name__', func)} failed: {e}")
+
+    def _append_log(self, lines: list[str]):
+        widget = self.log_widget
+        if widget is None: return
+        widget.configure(state='normal')
+        widget.insert(tk.END, "\n".join(lines) + "\n")
+        excess = int(widget.index('end-1c').split('.')[0]) - 1 - self.max_log_lines
+        if excess > 0:
+            widget.delete('1.0', f"{excess + 1}.0")
+        widget.configure(state='disabled')
+        widget.yview(tk.END)
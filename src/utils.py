@@ -1,14 +1,12 @@
 # src/utils.py
 
 import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
 import logging
 import shutil
-import subprocess
 import os
-from bs4 import BeautifulSoup
-import xml.etree.ElementTree as ET
 import re
+from fractions import Fraction
+from typing import Iterator
 
 def check_tools_availability():
     """
@@ -22,102 +20,163 @@ def check_tools_availability():
             missing_tools.append(tool)
     return missing_tools
 
+def ms_to_srt_time(ms: int) -> str:
+    """Converts integer milliseconds to SRT format HH:MM:SS,ms."""
+    ms = max(0, int(ms))
+    s, ms = divmod(ms, 1000)
+    m, s = divmod(s, 60)
+    h, m = divmod(m, 60)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+def srt_time_to_ms(srt_time: str) -> int:
+    """Converts SRT format HH:MM:SS,ms (or H:MM:SS.ms) to integer milliseconds."""
+    try:
+        hms, _, frac = srt_time.strip().replace('.', ',').partition(',')
+        h, m, s = [int(p) for p in hms.split(':')]
+        ms = int(frac.ljust(3, '0')[:3]) if frac else 0
+        return ((h * 60 + m) * 60 + s) * 1000 + ms
+    except (ValueError, AttributeError) as e:
+        logging.error(f"Invalid SRT time format: {srt_time}. Error: {e}")
+        return 0
+
+def timecode_to_ms(tc: str, frame_rate) -> int:
+    """
+    Converts timecode HH:MM:SS:FF to integer milliseconds.
+    The frame part is converted with exact rational arithmetic (23.976 is 23976/1000),
+    rounded to the nearest millisecond, so values like 999.9999 no longer truncate down.
+    """
+    h, m, s, f = [int(p) for p in tc.split(':')]
+    rate = frame_rate if isinstance(frame_rate, Fraction) else Fraction(str(frame_rate))
+    num, den = rate.numerator, rate.denominator
+    frame_ms = (2000 * f * den + num) // (2 * num) # round(f * 1000 / rate) bằng số nguyên
+    return ((h * 60 + m) * 60 + s) * 1000 + frame_ms
+
+def format_time_for_srt(tc: str, frame_rate) -> str:
+    """Converts timecode HH:MM:SS:FF to SRT format HH:MM:SS,ms."""
+    try:
+        return ms_to_srt_time(timecode_to_ms(tc, frame_rate))
+    except (ValueError, AttributeError, ZeroDivisionError) as e:
+        logging.error(f"Invalid timecode format: {tc}. Error: {e}")
+        return "00:00:00,000"
+
+def _make_event(start_ms: int, end_ms: int, image_file: str) -> dict:
+    return {
+        'start_srt': ms_to_srt_time(start_ms),
+        'end_srt': ms_to_srt_time(end_ms),
+        'start_ms': start_ms,
+        'end_ms': end_ms,
+        'image_file': image_file
+    }
+
+def iter_bdsup2sub_xml(xml_path: str) -> Iterator[dict]:
+    """
+    Streams events from a BDSup2Sub XML file with iterparse.
+    Each processed <Event> is cleared from the tree, so memory stays flat regardless of file size.
+    Raises ET.ParseError / OSError on broken files; callers decide how to report them.
+    """
+    frame_rate = Fraction('23.976')
+    stack = []
+    for event, elem in ET.iterparse(xml_path, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            continue
+        stack.pop()
+        parent = stack[-1] if stack else None
+        parent_tag = parent.tag if parent is not None else None
+        if elem.tag == 'Format' and parent_tag == 'Description':
+            frame_rate = Fraction(elem.get('FrameRate', '23.976'))
+        elif elem.tag == 'Event' and parent_tag == 'Events':
+            graphic_tag = elem.find('Graphic')
+            if graphic_tag is not None and graphic_tag.text:
+                try:
+                    start_ms = timecode_to_ms(elem.get('InTC'), frame_rate)
+                    end_ms = timecode_to_ms(elem.get('OutTC'), frame_rate)
+                except (ValueError, AttributeError) as e:
+                    logging.error(f"Invalid timecode in event {dict(elem.attrib)}. Error: {e}")
+                    start_ms = end_ms = 0
+                yield _make_event(start_ms, end_ms, graphic_tag.text.strip())
+            # Giải phóng event đã xử lý để bộ nhớ không tăng theo kích thước file
+            elem.clear()
+            parent.remove(elem)
+
 def parse_bdsup2sub_xml(xml_path: str) -> list | None:
     """Parses an XML file from BDSup2Sub to get timing and image file names."""
     try:
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
-        events = []
-        
-        format_tag = root.find('Description/Format')
-        frame_rate_str = format_tag.get('FrameRate', '23.976') if format_tag is not None else '23.976'
-        frame_rate = float(frame_rate_str)
-
-        for event in root.findall('Events/Event'):
-            start_tc = event.get('InTC')
-            end_tc = event.get('OutTC')
-            graphic_tag = event.find('Graphic')
-            
-            if graphic_tag is not None and graphic_tag.text:
-                events.append({
-                    'start_srt': format_time_for_srt(start_tc, frame_rate),
-                    'end_srt': format_time_for_srt(end_tc, frame_rate),
-                    'image_file': graphic_tag.text.strip()
-                })
-        return events
+        return list(iter_bdsup2sub_xml(xml_path))
     except Exception as e:
         logging.error(f"Error parsing XML file '{xml_path}': {e}")
         return None
 
-def format_time_for_srt(tc: str, frame_rate: float) -> str:
-    """Converts timecode HH:MM:SS:FF to SRT format HH:MM:SS,ms."""
-    try:
-        parts = tc.split(':')
-        h, m, s, f = [int(p) for p in parts]
-        ms = int((f / frame_rate) * 1000)
-        return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
-    except (ValueError, IndexError) as e:
-        logging.error(f"Invalid timecode format: {tc}. Error: {e}")
+def _normalize_html_time(t_str: str) -> str:
+    t_str = t_str.replace('.', ',')
+    parts = t_str.split(':')
+
+    if len(parts) == 3: # H:MM:SS,ms
+        h, m, s_ms = parts
+        s, ms = s_ms.split(',')
+        return f"{int(h):02d}:{int(m):02d}:{int(s):02d},{ms}"
+    elif len(parts) == 2: # M:SS,ms
+        m, s_ms = parts
+        s, ms = s_ms.split(',')
+        return f"00:{int(m):02d}:{int(s):02d},{ms}"
+    else:
+        logging.warning(f"Unknown time format: {t_str}")
         return "00:00:00,000"
 
+def _iter_html_table_rows(html_path: str) -> Iterator[dict]:
+    """Case 1: old table format. The first <tr> is the header and is skipped."""
+    from lxml import etree
+
+    seen_header = False
+    for _, row in etree.iterparse(html_path, events=('end',), tag='tr', html=True, recover=True, encoding='utf-8'):
+        if not seen_header:
+            seen_header = True
+        else:
+            cols = row.findall('.//td')
+            if len(cols) >= 5:
+                time_str = ''.join(cols[1].itertext()).strip()
+                start_srt, end_srt = [t.strip() for t in time_str.split('-->')]
+                image_tag = cols[4].find('.//img')
+                if image_tag is not None and image_tag.get('src') is not None:
+                    event = _make_event(srt_time_to_ms(start_srt), srt_time_to_ms(end_srt), image_tag.get('src'))
+                    event['start_srt'], event['end_srt'] = start_srt, end_srt
+                    yield event
+        row.clear()
+        while row.getprevious() is not None:
+            del row.getparent()[0]
+
+def _iter_html_body_text(html_path: str) -> Iterator[dict]:
+    """Case 2: new body-text format. Each entry sits on a single line, so the file is scanned line by line."""
+    pattern = re.compile(r"#\d+:([\d:.,]+)->([\d:.,]+).*?src='(.*?)'")
+    with open(html_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            for start_time, end_time, img_file in pattern.findall(line):
+                start_srt, end_srt = _normalize_html_time(start_time), _normalize_html_time(end_time)
+                event = _make_event(srt_time_to_ms(start_srt), srt_time_to_ms(end_srt), img_file)
+                event['start_srt'], event['end_srt'] = start_srt, end_srt
+                yield event
+
+def iter_subtitle_edit_html(html_path: str) -> Iterator[dict]:
+    """
+    Streams events from a Subtitle Edit HTML export.
+    Supports both table format and body-text format; the table format wins when it has data rows.
+    A table that yields no events (only a header, or rows without five columns) falls back to the
+    body-text format, where older versions returned an empty list.
+    """
+    found_rows = False
+    for event in _iter_html_table_rows(html_path):
+        found_rows = True
+        yield event
+    if not found_rows:
+        yield from _iter_html_body_text(html_path)
+
 def parse_subtitle_edit_html(html_path: str) -> list | None:
     """
     Parses an HTML file from Subtitle Edit to get timing and image file names.
     Supports both table format and body-text format.
     """
     try:
-        with open(html_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        soup = BeautifulSoup(content, 'lxml')
-        events = []
-
-        # Case 1: Check for old table format
-        rows = soup.find_all('tr')
-        if len(rows) > 1:
-            for row in rows[1:]: # Skip header row
-                cols = row.find_all('td')
-                if len(cols) < 5: continue
-                time_str = cols[1].text.strip()
-                start_srt, end_srt = [t.strip() for t in time_str.split('-->')]
-                image_tag = cols[4].find('img')
-                if image_tag and image_tag.has_attr('src'):
-                    events.append({
-                        'start_srt': start_srt,
-                        'end_srt': end_srt,
-                        'image_file': image_tag['src']
-                    })
-            return events
-
-        # Case 2: If no table, try parsing new body-text format using regex
-        pattern = re.compile(r"#\d+:([\d:.,]+)->([\d:.,]+).*?src='(.*?)'")
-        matches = pattern.findall(content)
-        
-        for start_time, end_time, img_file in matches:
-            def normalize_time(t_str: str) -> str:
-                t_str = t_str.replace('.', ',')
-                parts = t_str.split(':')
-                
-                if len(parts) == 3: # H:MM:SS,ms
-                    h, m, s_ms = parts
-                    s, ms = s_ms.split(',')
-                    return f"{int(h):02d}:{int(m):02d}:{int(s):02d},{ms}"
-                elif len(parts) == 2: # M:SS,ms
-                    m, s_ms = parts
-                    s, ms = s_ms.split(',')
-                    return f"00:{int(m):02d}:{int(s):02d},{ms}"
-                else:
-                    logging.warning(f"Unknown time format: {t_str}")
-                    return "00:00:00,000"
-
-            events.append({
-                'start_srt': normalize_time(start_time),
-                'end_srt': normalize_time(end_time),
-                'image_file': img_file
-            })
-        
-        return events
-
+        return list(iter_subtitle_edit_html(html_path))
     except Exception as e:
         logging.error(f"Error parsing HTML file '{html_path}': {e}")
         return None
@@ -1,43 +1,26 @@
 # src/video_processor.py
 
 import subprocess
-import json
 import os
 import logging
-import xml.etree.ElementTree as ET # <-- THÊM DÒNG NÀY
 from src.tool_path_manager import get_tool_path
+from src.probe_cache import get_probe_cache
+from src.tracing import span
 
 def inspect_video_subtitles(video_path: str) -> tuple[list, str | None]:
-    """Uses ffprobe to scan video files and find image subtitle streams."""
-    ffprobe_path = get_tool_path('ffprobe')
-    command = [
-        ffprobe_path, '-v', 'quiet', '-print_format', 'json', '-show_streams',
-        '-select_streams', 's', video_path
-    ]
-    try:
-        creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-        result = subprocess.run(
-            command, capture_output=True, text=True, check=True, 
-            encoding='utf-8', creationflags=creationflags
-        )
-        data = json.loads(result.stdout)
-        subtitle_streams = []
-        for stream in data.get('streams', []):
-            if stream.get('codec_name') in ['hdmv_pgs_subtitle', 'dvd_subtitle']:
-                lang = stream.get('tags', {}).get('language', 'und')
-                title = stream.get('tags', {}).get('title', '')
-                info = f"Stream #{stream['index']} - {lang.upper()} - {stream['codec_name']}"
-                if title: info += f" ({title})"
-                subtitle_streams.append({'index': stream['index'], 'info': info})
-        if not subtitle_streams:
-            return [], "No image subtitle streams (PGS, VobSub) found in this video."
-        return subtitle_streams, None
-    except FileNotFoundError:
-        return [], "Error: `ffprobe` not found. Please check assets/tools."
-    except subprocess.CalledProcessError as e:
-        return [], f"Error scanning video: {e.stderr}"
-    except Exception as e:
-        return [], f"Unknown error: {e}"
+    """Scans video files for image subtitle streams. ffprobe results come from the persistent probe cache."""
+    summary, error = get_probe_cache().probe(video_path)
+    if error:
+        return [], error
+    subtitle_streams = []
+    for stream in summary.get('streams', []):
+        if stream.get('codec_name') in ['hdmv_pgs_subtitle', 'dvd_subtitle']:
+            info = f"Stream #{stream['index']} - {stream['language'].upper()} - {stream['codec_name']}"
+            if stream['title']: info += f" ({stream['title']})"
+            subtitle_streams.append({'index': stream['index'], 'info': info})
+    if not subtitle_streams:
+        return [], "No image subtitle streams (PGS, VobSub) found in this video."
+    return subtitle_streams, None
 
 def extract_pgs_subtitles(video_path: str, stream_index: int, session_dir: str, bdsup2sub_path: str, progress_callback=None, cancellation_event=None) -> tuple[str | None, str | None, str | None]:
     """Uses mkvextract and BDSup2Sub to extract and convert subtitles."""
@@ -55,26 +38,27 @@ def extract_pgs_subtitles(video_path: str, stream_index: int, session_dir: str,
         logging.info("Stage 1/2: Extracting raw subtitle stream from video...")
         creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
 
-        process = subprocess.Popen(
-            mkvextract_command,
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
-            encoding='utf-8', errors='replace', creationflags=creationflags
-        )
-        
-        for line in iter(process.stdout.readline, ''):
-            if cancellation_event and cancellation_event.is_set():
-                logging.info("Cancellation requested, terminating mkvextract.")
-                process.terminate()
-                break
-            if line.strip().startswith("#GUI#progress"):
-                try:
-                    percent = int(line.strip().split(" ")[1].replace('%', ''))
-                    if progress_callback: progress_callback(percent)
-                except (IndexError, ValueError):
-                    pass
-        
-        _, stderr = process.communicate()
-        return_code = process.wait()
+        with span("mkvextract", "extract", stream=stream_index):
+            process = subprocess.Popen(
+                mkvextract_command,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                encoding='utf-8', errors='replace', creationflags=creationflags
+            )
+
+            for line in iter(process.stdout.readline, ''):
+                if cancellation_event and cancellation_event.is_set():
+                    logging.info("Cancellation requested, terminating mkvextract.")
+                    process.terminate()
+                    break
+                if line.strip().startswith("#GUI#progress"):
+                    try:
+                        percent = int(line.strip().split(" ")[1].replace('%', ''))
+                        if progress_callback: progress_callback(percent)
+                    except (IndexError, ValueError):
+                        pass
+
+            _, stderr = process.communicate()
+            return_code = process.wait()
 
         if cancellation_event and cancellation_event.is_set():
             return None, None, "Extraction cancelled by user."
@@ -99,25 +83,17 @@ def extract_pgs_subtitles(video_path: str, stream_index: int, session_dir: str,
         logging.info("Stage 2/2: Converting raw subtitles to images and timing file...")
         creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
         
-        subprocess.run(
-            java_command, capture_output=True, text=True, check=True,
-            encoding='utf-8', errors='replace', creationflags=creationflags
-        )
+        with span("bdsup2sub", "extract"):
+            subprocess.run(
+                java_command, capture_output=True, text=True, check=True,
+                encoding='utf-8', errors='replace', creationflags=creationflags
+            )
         
-        # --- LOGIC ĐẾM SỐ LƯỢNG BẮT ĐẦU TỪ ĐÂY ---
         if not os.path.exists(xml_file_path):
              return None, None, "Error: BDSup2Sub ran but did not create an XML file."
-        
-        try:
-            # Phân tích file XML để đếm số lượng phụ đề
-            tree = ET.parse(xml_file_path)
-            root = tree.getroot()
-            subtitle_count = len(root.findall('Events/Event'))
-            logging.info(f"BDSup2Sub completed successfully. Found {subtitle_count} subtitles.")
-        except ET.ParseError as e:
-            # Nếu không parse được XML, ghi log cảnh báo và dùng thông báo cũ
-            logging.warning(f"Could not parse XML to get subtitle count, but file was created. Error: {e}")
-            logging.info("BDSup2Sub completed successfully.")
+
+        # Số lượng phụ đề được ghi log khi file XML được parse (một lần duy nhất) ở AppContext
+        logging.info("BDSup2Sub completed successfully.")
 
         return images_output_dir, xml_file_path, None
         
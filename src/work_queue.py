@@ -0,0 +1,325 @@
+# src/work_queue.py
+"""
+Durable work queue for spreading a session's OCR batches and hardsub scan segments over
+worker processes on several hosts. The queue is one SQLite file; put it on a share every
+host can reach (the session folders must be reachable under the same path too).
+
+    python -m src.work_queue worker --queue /mnt/share/work_queue.db [--kinds ocr_batch hardsub_segment]
+    python -m src.work_queue status --queue /mnt/share/work_queue.db
+
+A worker claims a task with a lease and renews it by heartbeat while it works. A lease that
+is not renewed (the worker crashed or lost the share) expires and the next claim by any
+worker puts the task back in the queue, up to MAX_ATTEMPTS. Results are stored with the task;
+the owning AppContext merges them into the session (see AppContext.collect_distributed_ocr
+and collect_distributed_hardsub).
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+
+from src import db
+
+WORK_QUEUE_DB = "work_queue.db"
+DEFAULT_LEASE_SECONDS = 120
+MAX_ATTEMPTS = 3
+IDLE_POLL_SECONDS = 5
+HARDSUB_SEGMENT_SECONDS = 300
+TASK_KINDS = ("ocr_batch", "hardsub_segment")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_token TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_claim ON tasks(state, kind, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_session ON tasks(session, state);
+"""
+
+class WorkQueue:
+    """
+    Tasks in a SQLite file: pending -> leased -> done (-> merged) | failed. Claims are a single UPDATE, so
+    two workers can never lease the same task. Each call opens its own short-lived connection.
+    """
+
+    def __init__(self, path: str, max_attempts: int = MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        # Chờ lâu hơn mặc định: trên ổ mạng nhiều worker có thể giữ khoá ghi cùng lúc
+        return db.connect(self.path, timeout=30)
+
+    def enqueue(self, session: str, kind: str, payloads: list[dict]) -> int:
+        if kind not in TASK_KINDS:
+            raise ValueError(f"Unknown task kind '{kind}'.")
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO tasks (session, kind, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(session, kind, json.dumps(payload), now, now) for payload in payloads],
+            )
+        return len(payloads)
+
+    def reclaim_expired(self) -> int:
+        """Returns expired leases to the queue (or fails them after max_attempts); the number reclaimed."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = 'Lease expired.', lease_owner = NULL, lease_token = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE state = 'leased' AND lease_expires < ?",
+                (self.max_attempts, now, now),
+            )
+            count = cursor.rowcount
+        if count: logging.warning(f"Reclaimed {count} task(s) with expired leases.")
+        return count
+
+    def claim(self, worker: str, kinds=TASK_KINDS, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> dict | None:
+        """Leases the oldest pending task of one of `kinds`; None when there is nothing to do."""
+        self.reclaim_expired()
+        token = uuid.uuid4().hex
+        now = time.time()
+        marks = ", ".join("?" for _ in kinds)
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE tasks SET state = 'leased', attempts = attempts + 1, lease_owner = ?, lease_token = ?, "
+                "lease_expires = ?, updated_at = ? "
+                f"WHERE id = (SELECT id FROM tasks WHERE state = 'pending' AND kind IN ({marks}) ORDER BY id LIMIT 1)",
+                (worker, token, now + lease_seconds, now, *kinds),
+            )
+            row = conn.execute("SELECT * FROM tasks WHERE lease_token = ?", (token,)).fetchone()
+        return _task(row) if row else None
+
+    def heartbeat(self, task: dict, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """Extends the lease; False when it was lost (expired and reclaimed by another worker)."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_expires = ?, updated_at = ? WHERE id = ? AND lease_token = ? AND state = 'leased'",
+                (time.time() + lease_seconds, time.time(), task["id"], task["lease_token"]),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, task: dict, result: dict) -> bool:
+        return self._finish(task, "done", json.dumps(result), None)
+
+    def fail(self, task: dict, error: str) -> bool:
+        """Records the error; the task is retried until it has been attempted max_attempts times."""
+        state = "failed" if task["attempts"] >= self.max_attempts else "pending"
+        return self._finish(task, state, None, error)
+
+    def _finish(self, task: dict, state: str, result: str | None, error: str | None) -> bool:
+        # Chỉ người đang giữ lease mới được ghi kết quả; lease đã bị thu hồi thì kết quả bị bỏ
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET state = ?, result = ?, error = ?, lease_owner = NULL, lease_token = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE id = ? AND lease_token = ? AND state = 'leased'",
+                (state, result, error, time.time(), task["id"], task["lease_token"]),
+            )
+            return cursor.rowcount == 1
+
+    def tasks(self, session: str, kind: str | None = None) -> list[dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM tasks WHERE session = ? AND (? IS NULL OR kind = ?) ORDER BY id", (session, kind, kind)
+            ).fetchall()
+        return [_task(row) for row in rows]
+
+    def counts(self, session: str | None = None) -> dict:
+        """Number of tasks per state, for one session or the whole queue."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT state, COUNT(*) AS n FROM tasks WHERE ? IS NULL OR session = ? GROUP BY state", (session, session)
+            ).fetchall()
+        return {row["state"]: row["n"] for row in rows}
+
+    def mark_merged(self, task_ids: list[int]):
+        """Marks done tasks whose results the owning session has applied, so they are not applied twice."""
+        with self._connect() as conn:
+            conn.executemany("UPDATE tasks SET state = 'merged', updated_at = ? WHERE id = ? AND state = 'done'",
+                             [(time.time(), task_id) for task_id in task_ids])
+
+    def remove(self, session: str, kind: str | None = None):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM tasks WHERE session = ? AND (? IS NULL OR kind = ?)", (session, kind, kind))
+
+def _task(row) -> dict:
+    task = dict(row)
+    task["payload"] = json.loads(task["payload"])
+    task["result"] = json.loads(task["result"]) if task["result"] else None
+    return task
+
+def split_batches(indices: list[int], batch_size: int) -> list[list[int]]:
+    return [indices[i:i + batch_size] for i in range(0, len(indices), batch_size)]
+
+def split_segments(total_frames: int, fps: float, segment_seconds: float = HARDSUB_SEGMENT_SECONDS) -> list[tuple[int, int]]:
+    """[start_frame, end_frame) ranges covering the video."""
+    step = max(1, int(round(segment_seconds * fps)))
+    return [(start, min(start + step, total_frames)) for start in range(0, total_frames, step)]
+
+def merge_segment_events(segment_results: list[list[dict]]) -> list[dict]:
+    """
+    Joins the per-segment hardsub events (in segment order) into one list. An event still on
+    screen at a segment boundary is cut in two by the scan; when a channel's first event in a
+    segment starts on the frame right after that channel's previous event ended, the two are
+    merged and the first image kept.
+    """
+    merged = []
+    last_by_channel = {}
+    for events in segment_results:
+        seen = set()
+        for event in events:
+            channel = event.get("channel")
+            previous = last_by_channel.get(channel)
+            # Trong cùng một lần quét, hai sự kiện liên tiếp luôn cách nhau ít nhất một frame không có chữ
+            if channel not in seen and previous is not None and event["start_frame"] == previous["end_frame"] + 1:
+                previous.update(end_frame=event["end_frame"], end_ms=event["end_ms"], end_srt=event["end_srt"])
+            else:
+                merged.append(event)
+                last_by_channel[channel] = event
+            seen.add(channel)
+    return merged
+
+def _run_ocr_batch(payload: dict, settings: dict, cancellation_event: threading.Event) -> tuple[dict | None, str | None]:
+    # API key, pool và chế độ stream/hedge lấy từ settings của máy worker; khoá API không bao giờ nằm trong hàng đợi
+    from src.ocr import run_ocr_pipeline
+    from src.subtitle_track import SubtitleTrack
+
+    config = payload["config"]
+    track = SubtitleTrack.from_events(payload["events"])
+    os.makedirs(payload["log_folder"], exist_ok=True)
+    failed = set()
+    subtitles, message = run_ocr_pipeline(
+        track, payload["image_folder"], payload["log_folder"], settings.get("api_key", ""), config["model_name"],
+        config["generation_config"], config["safety_settings"], config["batch_size"], config["max_retries"], config["prompt"],
+        cancellation_event, None, None, failed, settings.get("stream_ocr", False), settings.get("stream_stall_timeout", 90),
+        settings.get("hedge_requests", False), settings.get("hedge_model", ""), settings.get("api_pool", []),
+        backend=config["backend"], ocr_language=config["ocr_language"], cascade_confidence=config["cascade_confidence"],
+        prompt_mode=settings.get("prompt_cache", "auto"),
+    )
+    if subtitles is None: return None, message
+    indices = payload["indices"]
+    done = [i for i in range(len(track)) if i not in failed]
+    return {
+        "texts": {str(indices[i]): track.texts[i] for i in done},
+        "confidence": {str(indices[i]): float(track.confidence[i]) for i in done if track.confidence[i] == track.confidence[i]}, # bỏ NaN
+        "failed": [indices[i] for i in sorted(failed)],
+    }, None
+
+def _run_hardsub_segment(payload: dict, settings: dict, cancellation_event: threading.Event) -> tuple[dict | None, str | None]:
+    from src.hardsub_processor import run_hardsub_pipeline
+
+    options = dict(payload["options"], start_frame=payload["start_frame"], end_frame=payload["end_frame"],
+                   image_prefix=f"seg{payload['segment']:04d}_")
+    subtitles, error = run_hardsub_pipeline(payload["video_path"], payload["image_folder"], options, None, cancellation_event)
+    if error: return None, error
+    if cancellation_event.is_set(): return None, "Segment scan cancelled."
+    return {"events": subtitles}, None
+
+# Loại task -> hàm chạy(payload, settings, cancellation_event) trả về (result, error)
+TASK_RUNNERS = {"ocr_batch": _run_ocr_batch, "hardsub_segment": _run_hardsub_segment}
+
+def run_worker(queue: WorkQueue, worker_id: str | None = None, kinds=TASK_KINDS, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+               stop_event: threading.Event | None = None, settings: dict | None = None, exit_when_idle: bool = False) -> int:
+    """
+    Claims and runs tasks until `stop_event` is set (or, with exit_when_idle, the queue has
+    nothing left for this worker). A heartbeat thread renews the lease every third of
+    `lease_seconds`; if the lease is lost the task is cancelled and its result discarded.
+    Returns the number of tasks completed.
+    """
+    from src.settings import load_settings
+
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    stop_event = stop_event or threading.Event()
+    settings = settings if settings is not None else load_settings()
+    completed = 0
+    logging.info(f"Worker {worker_id} polling {queue.path} for {', '.join(kinds)}.")
+    while not stop_event.is_set():
+        task = queue.claim(worker_id, kinds, lease_seconds)
+        if task is None:
+            if exit_when_idle: break
+            stop_event.wait(IDLE_POLL_SECONDS)
+            continue
+        logging.info(f"Task {task['id']} ({task['kind']}, attempt {task['attempts']}) claimed.")
+        lease_lost = threading.Event()
+        finished = threading.Event()
+
+        def heartbeat(task=task):
+            while not finished.wait(lease_seconds / 3):
+                try:
+                    if queue.heartbeat(task, lease_seconds): continue
+                except sqlite3.Error as e:
+                    logging.warning(f"Heartbeat for task {task['id']} failed: {e}")
+                    continue # thử lại ở nhịp sau; lease còn hiệu lực cho tới khi hết hạn
+                logging.warning(f"Lease on task {task['id']} was lost; abandoning it.")
+                lease_lost.set()
+                return
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+        try:
+            result, error = TASK_RUNNERS[task["kind"]](task["payload"], settings, lease_lost)
+        except Exception as e:
+            logging.exception(f"Task {task['id']} crashed: {e}")
+            result, error = None, f"{type(e).__name__}: {e}"
+        finally:
+            finished.set()
+        if lease_lost.is_set(): continue
+        if error:
+            logging.error(f"Task {task['id']} failed: {error}")
+            queue.fail(task, error)
+        elif queue.complete(task, result):
+            completed += 1
+            logging.info(f"Task {task['id']} done.")
+    return completed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker")
+    worker.add_argument("--queue", required=True, help="path of the shared queue database")
+    worker.add_argument("--kinds", nargs="+", choices=TASK_KINDS, default=list(TASK_KINDS))
+    worker.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS, help="lease length in seconds")
+    worker.add_argument("--id", help="worker name shown in the queue (default: host-pid)")
+    worker.add_argument("--exit-when-idle", action="store_true")
+    status = commands.add_parser("status")
+    status.add_argument("--queue", required=True)
+    status.add_argument("--session")
+    args = parser.parse_args(argv)
+
+    queue = WorkQueue(args.queue)
+    if args.command == "status":
+        print(json.dumps(queue.counts(args.session), indent=2))
+        return 0
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    stop_event = threading.Event()
+    try:
+        completed = run_worker(queue, args.id, tuple(args.kinds), args.lease, stop_event, exit_when_idle=args.exit_when_idle)
+    except KeyboardInterrupt:
+        stop_event.set()
+        return 130
+    logging.info(f"Worker finished {completed} task(s).")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+# tests/test_app_context.py
+
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import settings
+from src.app_context import AppContext
+
+EVENT = {"start_srt": "00:00:01,000", "end_srt": "00:00:02,000", "image_file": "0001.png"}
+
+@pytest.fixture
+def context(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Store riêng cho test: store chung ghi settings.json vào thư mục làm việc khi thoát
+    monkeypatch.setattr(settings, "_store", settings.SettingsStore(str(tmp_path / "settings.json")))
+    context = AppContext(collect_garbage=False)
+    yield context
+    context.cleanup_current_session_temp()
+
+def make_session(name: str, files: dict) -> str:
+    path = os.path.join("app_temp", name)
+    os.makedirs(os.path.join(path, "images"))
+    for filename, content in files.items():
+        with open(os.path.join(path, filename), "w", encoding="utf-8") as f:
+            json.dump(content, f)
+    return path
+
+def test_old_trace_in_session_root_is_not_taken_for_a_hardsub_log(context):
+    # Trace do phiên bản trước ghi vào gốc phiên
+    path = make_session("HARDSUB_old", {"trace_ocr_20250101_000000.json": {"traceEvents": []}})
+    track, message = context.load_session_from_folder(path)
+    assert track is None and message.startswith("No timing file")
+
+def test_legacy_hardsub_log_still_loads(context):
+    path = make_session("HARDSUB_legacy", {"hardsub.json": [EVENT]})
+    track, _ = context.load_session_from_folder(path)
+    assert [(e["start_ms"], e["image_file"]) for e in track] == [(1000, "0001.png")]
+
+def test_unreadable_legacy_log_is_reported_not_raised(context):
+    path = make_session("HARDSUB_broken", {"hardsub.json": {"not": "a list of events"}})
+    track, message = context.load_session_from_folder(path)
+    assert track is None and "corrupt" in message
@@ -0,0 +1,71 @@
+# tests/test_batch_planner.py
+
+import os
+import sys
+from collections import deque
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.batch_planner import BatchPlanner, INITIAL_TOKENS_PER_BYTE, OUTPUT_SAFETY, SHRINK_FACTOR, TOKENS_PER_ENTRY
+
+def planner(tmp_path, max_images=100, max_output_tokens=100_000, max_input_bytes=10**9) -> BatchPlanner:
+    return BatchPlanner("test-model", max_images, max_output_tokens, max_input_bytes, stats_dir=str(tmp_path))
+
+def batches(p: BatchPlanner, sizes: list[int]) -> list[list[int]]:
+    pending, image_sizes, result = deque(range(len(sizes))), dict(enumerate(sizes)), []
+    while pending:
+        result.append(p.take_batch(pending, image_sizes))
+    return result
+
+@pytest.mark.parametrize("sizes, max_input_bytes, expected", [
+    ([400] * 5, 1000, [[0, 1], [2, 3], [4]]),
+    ([400, 600, 1, 999, 1], 1000, [[0, 1], [2, 3], [4]]), # đúng bằng ngân sách vẫn vừa
+    ([5000, 10, 10], 1000, [[0], [1, 2]]),          # ảnh quá lớn vẫn được gửi một mình
+])
+def test_batches_respect_the_input_byte_budget(tmp_path, sizes, max_input_bytes, expected):
+    assert batches(planner(tmp_path, max_input_bytes=max_input_bytes), sizes) == expected
+
+def test_batches_respect_the_output_token_budget(tmp_path):
+    # 1000 byte -> 14 + 2 = 16 token mỗi ảnh; mục tiêu 100 * 0.7 = 70 token -> 4 ảnh mỗi batch
+    p = planner(tmp_path, max_output_tokens=100)
+    assert p.output_target == int(100 * OUTPUT_SAFETY)
+    assert p.estimate_output_tokens(1000) == TOKENS_PER_ENTRY + INITIAL_TOKENS_PER_BYTE * 1000
+    assert [len(b) for b in batches(p, [1000] * 10)] == [4, 4, 2]
+
+def test_image_cap_applies_first(tmp_path):
+    assert [len(b) for b in batches(planner(tmp_path, max_images=3), [10] * 7)] == [3, 3, 1]
+
+def test_truncated_batch_is_resent_at_half_size_by_any_worker(tmp_path):
+    p = planner(tmp_path, max_images=8)
+    sizes = {i: 10 for i in range(40)}
+    pending = deque(range(40))
+    first = p.take_batch(pending, sizes)
+    assert first == list(range(8))
+    assert p.take_batch(pending, sizes) == list(range(8, 16)) # worker khác lấy batch khi batch đầu còn đang chạy
+
+    p.observe(8, 80, 8000, truncated=True, first_index=first[0])
+    assert p.scale == pytest.approx(SHRINK_FACTOR)
+    # Một batch mới không đụng tới giới hạn của batch bị cắt
+    assert len(p.take_batch(pending, sizes)) == 8
+    # Worker bị cắt trả batch về đầu hàng đợi; ai lấy nó cũng chỉ lấy một nửa
+    pending.extendleft(reversed(first))
+    assert p.take_batch(pending, sizes) == list(range(4))
+    assert p.take_batch(pending, sizes) == list(range(4, 8)) + list(range(24, 28))
+
+def test_comfortable_responses_grow_the_scale_back(tmp_path):
+    p = planner(tmp_path, max_output_tokens=1000)
+    p.observe(4, 4000, 10_000, truncated=True, first_index=0)
+    shrunk = p.scale
+    for _ in range(3):
+        p.observe(4, 4000, 60, truncated=False)
+    assert shrunk < p.scale <= 1.0
+
+def test_learned_stats_are_kept_between_runs(tmp_path):
+    p = planner(tmp_path)
+    p.observe(10, 10_000, 140 + 50, truncated=False)
+    p.save()
+    again = planner(tmp_path)
+    assert again.tokens_per_byte == pytest.approx(50 / 10_000)
+    assert again.samples == 1
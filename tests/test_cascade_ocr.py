@@ -0,0 +1,58 @@
+# tests/test_cascade_ocr.py
+
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import cascade_ocr
+from src.cascade_ocr import CascadeBackend, dictionary_ratio
+from src.ocr_backends import OcrBackend
+
+class ScriptedBackend(OcrBackend):
+    """Returns fixed (text, confidence) readings and records which images it was asked for."""
+
+    def __init__(self, name, readings):
+        self.name = name
+        self.readings = readings
+        self.asked = []
+
+    def recognize(self, subtitles, indices, image_folder, cancellation_event, on_result, on_failed):
+        self.asked.extend(indices)
+        for i in indices:
+            on_result(i, *self.readings[i])
+        return None
+
+def cascade(monkeypatch, dictionary, local_readings) -> tuple[CascadeBackend, ScriptedBackend]:
+    monkeypatch.setattr(cascade_ocr, "load_dictionary", lambda language: dictionary)
+    remote = ScriptedBackend("remote", {i: ("remote", None) for i in local_readings})
+    return CascadeBackend(ScriptedBackend("local", local_readings), remote, "English", accept_confidence=0.85), remote
+
+@pytest.mark.parametrize("text, dictionary, expected", [
+    ("the cat sat", {"the", "cat", "sat"}, 1.0),
+    ("the cat zzq", {"the", "cat", "sat"}, 2 / 3),
+    ("the c4t sat", {"the", "cat", "sat"}, 0.0), # chữ số giữa chữ cái
+    ("|| ~~ the", {"the"}, 0.0),
+    ("the cat sat", None, 0.0),                   # không có từ điển: không từ nào được xác nhận
+    ("...", {"the"}, 0.0),
+])
+def test_dictionary_ratio(text, dictionary, expected):
+    assert dictionary_ratio(text, dictionary) == pytest.approx(expected)
+
+def test_without_a_word_list_only_confident_reads_are_accepted(monkeypatch):
+    # "Tbe cat" là lỗi đọc điển hình: đúng bảng chữ, trông hợp lý, nhưng sai
+    backend, remote = cascade(monkeypatch, None, {0: ("Tbe cat", 0.6), 1: ("The cat", 0.9)})
+    assert not backend.accepts("Tbe cat", 0.6)
+    results = {}
+    backend.recognize(None, [0, 1], "", threading.Event(), lambda i, text, confidence: results.setdefault(i, text), lambda failed: None)
+    assert remote.asked == [0]
+    assert results == {0: "remote", 1: "The cat"}
+
+def test_word_list_lets_checked_reads_through_below_accept_confidence(monkeypatch):
+    backend, _ = cascade(monkeypatch, {"the", "cat"}, {})
+    assert backend.accepts("The cat", 0.6)
+    assert not backend.accepts("Tbe cat", 0.6)
+    assert not backend.accepts("The cat", cascade_ocr.CHECKS_MIN_CONFIDENCE - 0.1)
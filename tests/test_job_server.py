@@ -0,0 +1,125 @@
+# tests/test_job_server.py
+
+import os
+import sys
+import json
+import time
+import threading
+import http.client
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import job_server
+from src.job_server import JobClient, JobManager, make_server
+
+class FakeContext:
+    """Stands in for AppContext: records what the cleanup was told to protect."""
+
+    def __init__(self, cleanups):
+        self.current_session_dir = None
+        self.cleanups = cleanups
+
+    @property
+    def current_session_name(self):
+        return os.path.basename(self.current_session_dir) if self.current_session_dir else None
+
+    def release_session_lock(self):
+        pass
+
+    def collect_session_garbage(self, protect):
+        self.cleanups.append(protect())
+        return [], 0
+
+@pytest.fixture
+def server():
+    manager = JobManager(workers=1, context_factory=lambda: FakeContext([]))
+    httpd = make_server(manager, port=0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    manager.shutdown()
+
+def post(httpd, body: bytes, headers: dict) -> tuple[int, dict]:
+    conn = http.client.HTTPConnection(*httpd.server_address[:2], timeout=5)
+    conn.request("POST", "/jobs", body=body, headers=headers)
+    response = conn.getresponse()
+    status, data = response.status, json.loads(response.read())
+    conn.close()
+    return status, data
+
+def test_post_requires_json_content_type(server):
+    # Form HTML gửi text/plain mà không cần preflight
+    status, _ = post(server, b'{"kind": "ocr"}', {"Content-Type": "text/plain"})
+    assert status == 415
+
+def test_post_with_browser_origin_is_refused(server):
+    status, _ = post(server, b'{"kind": "ocr"}', {"Content-Type": "application/json", "Origin": "https://example.com"})
+    assert status == 403
+
+def test_delete_with_browser_origin_is_refused(server):
+    conn = http.client.HTTPConnection(*server.server_address[:2], timeout=5)
+    conn.request("DELETE", "/jobs/abc", headers={"Origin": "null"})
+    assert conn.getresponse().status == 403
+    conn.close()
+
+def test_client_requests_are_accepted(server):
+    client = JobClient(*server.server_address[:2])
+    job, error = client.submit("no-such-kind")
+    assert job is None and "Unknown job kind" in error
+    jobs, error = client.jobs()
+    assert error is None and jobs == []
+
+def test_cleanup_protects_sessions_of_unfinished_jobs(monkeypatch):
+    cleanups, started, release = [], threading.Event(), threading.Event()
+
+    def run_blocking(context, params, progress, cancellation_event):
+        context.current_session_dir = os.path.join("app_temp", "running_session")
+        started.set()
+        release.wait(5)
+        return {}, None
+
+    monkeypatch.setitem(job_server.JOB_RUNNERS, "blocking", run_blocking)
+    manager = JobManager(workers=1, context_factory=lambda: FakeContext(cleanups))
+    try:
+        manager.submit("blocking", {})
+        assert started.wait(5)
+        manager.submit("blocking", {"session": "app_temp/queued_session/"})
+        manager.collect_garbage()
+        assert cleanups == [{"running_session", "queued_session"}]
+    finally:
+        release.set()
+        manager.shutdown()
+
+def test_queued_videos_are_probed_ahead(monkeypatch):
+    probed, started, release = [], threading.Event(), threading.Event()
+
+    class FakeProbeCache:
+        def probe_many(self, paths):
+            probed.extend(paths)
+            return {}
+
+    def run_blocking(context, params, progress, cancellation_event):
+        started.set()
+        release.wait(5)
+        return {}, None
+
+    monkeypatch.setattr(job_server, "get_probe_cache", FakeProbeCache)
+    monkeypatch.setitem(job_server.JOB_RUNNERS, "blocking", run_blocking)
+    manager = JobManager(workers=1, context_factory=lambda: FakeContext([]))
+    try:
+        manager.submit("blocking", {"video_path": "running.mkv"})
+        assert started.wait(5)
+        for name in ("b.mkv", "a.mkv", "b.mkv"):
+            manager.submit("blocking", {"video_path": name})
+        deadline = time.monotonic() + 5
+        while sorted(set(probed)) != ["a.mkv", "b.mkv"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Video của job đang chạy không được probe lại, mỗi video chỉ một lần
+        assert sorted(probed) == ["a.mkv", "b.mkv"]
+    finally:
+        release.set()
+        manager.shutdown()
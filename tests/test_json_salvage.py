@@ -0,0 +1,76 @@
+# tests/test_json_salvage.py
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.json_salvage import IncrementalJsonObjectParser, salvage_json_objects, validate_results
+
+RESPONSES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "responses")
+
+def load_response(name: str) -> str:
+    with open(os.path.join(RESPONSES_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+def feed_in_chunks(text: str, size: int) -> tuple[IncrementalJsonObjectParser, list[dict]]:
+    parser, objects = IncrementalJsonObjectParser(), []
+    for start in range(0, len(text), size):
+        objects.extend(parser.feed(text[start:start + size]))
+    return parser, objects
+
+@pytest.mark.parametrize("name", ["truncated.txt", "duplicated.txt", "garbage.txt"])
+@pytest.mark.parametrize("size", [1, 3, 17, 4096])
+def test_chunked_feed_matches_whole_text(name, size):
+    # Kết quả không được phụ thuộc vào cách luồng cắt văn bản thành chunk
+    text = load_response(name)
+    assert feed_in_chunks(text, size)[1] == salvage_json_objects(text)
+
+def test_truncated_response_keeps_complete_objects():
+    parser, objects = feed_in_chunks(load_response("truncated.txt"), 5)
+    assert objects == [
+        {"index": 0, "text": "Where were you last night?"},
+        {"index": 1, "text": "At the station, waiting\nfor the last train."},
+    ]
+    assert parser.has_partial
+    assert parser.skipped == 0
+
+    texts, missing, duplicates = validate_results(objects, 3)
+    assert texts == {0: "Where were you last night?", 1: "At the station, waiting\nfor the last train."}
+    assert missing == [2]
+    assert duplicates == []
+
+def test_duplicated_response_drops_conflicting_answers():
+    items = salvage_json_objects(load_response("duplicated.txt"))
+    assert len(items) == 6
+
+    texts, missing, duplicates = validate_results(items, 4)
+    # Lặp lại giống hệt thì giữ; hai câu trả lời khác nhau cho cùng chỉ số thì bỏ cả hai
+    assert texts == {0: "Hold the door!", 1: "I can't, it's stuck.", 3: "Fine."}
+    assert missing == []
+    assert duplicates == [2]
+
+def test_garbage_response_skips_prose_and_invalid_objects():
+    parser = IncrementalJsonObjectParser()
+    items = parser.feed(load_response("garbage.txt"))
+    assert parser.skipped == 1 # {"index": 2, "text": "broken" "object"}
+    assert not parser.has_partial
+    assert items[0] == {"index": 0, "text": 'He said {quietly} "don\'t move".'}
+    assert items[1] == {"index": 1, "text": "Brackets ] and [ inside text"}
+
+    texts, missing, duplicates = validate_results(items, 4)
+    assert texts == {0: 'He said {quietly} "don\'t move".', 1: "Brackets ] and [ inside text", 3: ""}
+    assert missing == [2]
+    assert duplicates == []
+
+def test_escaped_quote_split_across_chunks():
+    parser = IncrementalJsonObjectParser()
+    assert parser.feed('[{"index": 0, "text": "a\\"}') == []
+    assert parser.has_partial
+    assert parser.feed('"}, {"index": 1, "text": "b"}]') == [{"index": 0, "text": 'a"}'}, {"index": 1, "text": "b"}]
+    assert not parser.has_partial
+
+def test_validate_results_empty_response():
+    assert validate_results([], 3) == ({}, [0, 1, 2], [])
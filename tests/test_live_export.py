@@ -0,0 +1,76 @@
+# tests/test_live_export.py
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.ocr import run_ocr_pipeline
+from src.ocr_backends import OcrBackend
+from src.subtitle_export import LiveExport
+from src.subtitle_track import SubtitleTrack
+
+class ScriptedBackend(OcrBackend):
+    """Replays a fixed list of callback calls, like a streaming engine would make them."""
+
+    name = "scripted"
+
+    def __init__(self, script):
+        self.script = script
+
+    def recognize(self, subtitles, indices, image_folder, cancellation_event, on_result, on_failed):
+        for call, args, kwargs in self.script:
+            (on_result if call == "result" else on_failed)(*args, **kwargs)
+        return None
+
+def make_track(count: int) -> SubtitleTrack:
+    return SubtitleTrack.from_events(
+        {"start_ms": i * 1000, "end_ms": i * 1000 + 800, "image_file": f"{i}.png", "text": ""} for i in range(count))
+
+def run(track, script, listener):
+    return run_ocr_pipeline(track, "", "", "", "", {}, [], 10, 1, "", threading.Event(),
+                            backend=ScriptedBackend(script), result_listener=listener)
+
+def test_provisional_results_are_not_reported_until_final():
+    track, reported = make_track(3), []
+    run(track, [
+        ("result", (0, "streamed", None), {"provisional": True}),
+        ("result", (1, "streamed twice", None), {"provisional": True}),
+        ("result", (0, "validated", None), {}),
+        ("result", (2, "local", 0.9), {}),
+        ("result", (1, "resent", None), {}),
+    ], reported.extend)
+    assert reported == [0, 2, 1]
+    assert track.texts.tolist() == ["validated", "resent", "local"]
+
+def test_failed_index_loses_its_provisional_text():
+    track, reported = make_track(2), []
+    track[1]["text"] = "from an earlier run"
+    failed = set()
+    run_ocr_pipeline(track, "", "", "", "", {}, [], 10, 1, "", threading.Event(), failed_indices=failed,
+                     backend=ScriptedBackend([
+                         ("result", (0, "conflicting", None), {"provisional": True}),
+                         ("result", (1, "conflicting", None), {"provisional": True}),
+                         ("failed", ([0, 1],), {}),
+                     ]), result_listener=reported.extend)
+    assert reported == [0, 1]
+    assert failed == {0, 1}
+    assert track.texts.tolist() == ["", "from an earlier run"]
+
+def test_live_export_only_contains_final_cues(tmp_path):
+    track = make_track(3)
+    path = str(tmp_path / "live.srt")
+    live = LiveExport(track, path)
+    try:
+        run(track, [
+            ("result", (0, "maybe", None), {"provisional": True}),
+            ("result", (1, "second", None), {}),
+            ("result", (0, "first", None), {}),
+        ], live.mark_done)
+    finally:
+        assert not live.close() # phụ đề 2 chưa có kết quả
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    assert "maybe" not in content
+    assert content.count("-->") == 2 and content.index("first") < content.index("second")
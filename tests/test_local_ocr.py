@@ -0,0 +1,53 @@
+# tests/test_local_ocr.py
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.local_ocr import parse_tesseract_tsv, tesseract_language
+
+HEADER = "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext"
+
+def tsv(*rows: tuple) -> str:
+    """Rows are (level, block, par, line, conf, text); the box columns do not matter to the parser."""
+    lines = [HEADER] + [f"{level}\t1\t{block}\t{par}\t{line}\t1\t0\t0\t10\t10\t{conf}\t{text}" for level, block, par, line, conf, text in rows]
+    return "\n".join(lines) + "\n"
+
+@pytest.mark.parametrize("rows, expected_text, expected_confidence", [
+    ((), "", 0.0),
+    (((5, 1, 1, 1, 90, "Hello"),), "Hello", 0.9),
+    # Độ tin cậy trung bình theo số ký tự: (2*90 + 5*80) / 7
+    (((5, 1, 1, 1, 90, "Hi"), (5, 1, 1, 1, 80, "there")), "Hi there", (2 * 90 + 5 * 80) / 7 / 100),
+    (((5, 1, 1, 2, 90, "second"), (5, 1, 1, 1, 90, "first")), "first\nsecond", 0.9),
+    (((5, 1, 1, 10, 90, "ten"), (5, 1, 1, 2, 90, "two")), "two\nten", 0.9),      # số dòng so sánh như số, không như chuỗi
+    (((5, 2, 1, 1, 90, "b"), (5, 1, 3, 1, 90, "a")), "a\nb", 0.9),
+    (((4, 1, 1, 1, 95, ""), (5, 1, 1, 1, 70, "word")), "word", 0.7),            # hàng cấp dòng bị bỏ qua
+    (((5, 1, 1, 1, -1, "ghost"), (5, 1, 1, 1, 60, "real")), "real", 0.6),      # conf -1: không phải từ
+    (((5, 1, 1, 1, 90, "  "), (5, 1, 1, 1, 50, "x")), "x", 0.5),
+    (((5, 1, 1, 1, "n/a", "bad"), (5, 1, 1, 1, 50, "ok")), "ok", 0.5),
+    (((5, 1, 1, 1, 96.5, '"Quoted'),), '"Quoted', 0.965),                      # dấu nháy không mở trường trích dẫn
+])
+def test_parse_tesseract_tsv(rows, expected_text, expected_confidence):
+    text, confidence = parse_tesseract_tsv(tsv(*rows))
+    assert text == expected_text
+    assert confidence == pytest.approx(expected_confidence)
+
+def test_parse_empty_output():
+    assert parse_tesseract_tsv("") == ("", 0.0)
+
+@pytest.mark.parametrize("ocr_language, expected", [
+    (None, "eng"),
+    ("", "eng"),
+    ("Auto", "eng"),
+    ("  Vietnamese ", "vie"),
+    ("Chinese", "chi_sim"),
+    ("JAPANESE", "jpn"),
+    ("eng+jpn", "eng+jpn"),     # mã Tesseract được giữ nguyên
+    ("chi_tra", "chi_tra"),
+    ("Klingon", "klingon"),
+])
+def test_tesseract_language(ocr_language, expected):
+    assert tesseract_language(ocr_language) == expected
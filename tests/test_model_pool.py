@@ -0,0 +1,30 @@
+# tests/test_model_pool.py
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.model_pool import classify_error, make_model
+
+def test_models_keep_their_own_api_key():
+    pytest.importorskip("google.generativeai")
+    # Key thứ hai được cấu hình trước khi model đầu tiên gửi request nào
+    first = make_model("test-key-first", "gemini-2.5-flash")
+    second = make_model("test-key-second", "gemini-2.5-flash")
+    assert first._client is not second._client
+    assert first._client._transport._credentials.token == "test-key-first"
+    assert second._client._transport._credentials.token == "test-key-second"
+    assert make_model("test-key-first", "gemini-2.5-flash") is first
+
+@pytest.mark.parametrize("message, expected", [
+    (None, None),
+    ("429 Resource has been exhausted (e.g. check quota).", "quota"),
+    ("400 API key not valid. Please pass a valid API key.", "auth"),
+    ("403 Permission denied", "auth"),
+    ("500 Internal error encountered.", "error"),
+])
+def test_classify_error(message, expected):
+    assert classify_error(message) == expected
@@ -0,0 +1,79 @@
+# tests/test_prompt_cache.py
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import prompt_cache
+from src.prompt_cache import PromptCache, compact_prompt
+
+PROMPT = """Transcribe the subtitle in every image.
+
+Example response:
+```json
+[{"index": 0, "text": "First line\\nSecond line"}]
+```
+
+Return only the JSON array."""
+
+@pytest.fixture(autouse=True)
+def forget_refusals():
+    prompt_cache._refusals.clear()
+    yield
+    prompt_cache._refusals.clear()
+
+def recording_factory(calls):
+    def make(api_key, model_name, system_instruction=None, cached_content=None):
+        calls.append({"key": api_key, "model": model_name, "system_instruction": system_instruction, "cached_content": cached_content})
+        return object()
+    return make
+
+def refusing_cache(attempts):
+    def create(api_key, model_name, prompt, ttl):
+        attempts.append((api_key, model_name))
+        raise RuntimeError("400 Cached content is too small")
+    return create
+
+def test_refused_cache_falls_back_to_the_unchanged_prompt():
+    calls, attempts = [], []
+    cache = PromptCache(PROMPT, "auto", recording_factory(calls), refusing_cache(attempts), lambda key, c: None)
+    cache.model_factory("key", "gemini-2.5-flash")
+    assert calls[0]["system_instruction"] == PROMPT
+    assert cache.fallbacks == 1
+
+def test_refusal_is_remembered_across_runs():
+    attempts = []
+    for _ in range(3):
+        # Mỗi lần chạy OCR tạo một PromptCache mới
+        PromptCache(PROMPT, "auto", recording_factory([]), refusing_cache(attempts), lambda key, c: None).model_factory("key", "gemini-2.5-flash")
+    assert attempts == [("key", "gemini-2.5-flash")]
+    PromptCache(PROMPT, "auto", recording_factory([]), refusing_cache(attempts), lambda key, c: None).model_factory("key", "gemini-2.5-pro")
+    assert attempts[-1] == ("key", "gemini-2.5-pro")
+
+def test_refusal_expires(monkeypatch):
+    attempts = []
+    PromptCache(PROMPT, "auto", recording_factory([]), refusing_cache(attempts), lambda key, c: None).model_factory("key", "m")
+    monkeypatch.setattr(prompt_cache, "CACHE_REFUSAL_SECONDS", 0)
+    PromptCache(PROMPT, "auto", recording_factory([]), refusing_cache(attempts), lambda key, c: None).model_factory("key", "m")
+    assert len(attempts) == 2
+
+def test_compaction_is_opt_in():
+    calls = []
+    PromptCache(PROMPT, "system", recording_factory(calls)).model_factory("key", "m")
+    PromptCache(PROMPT, "compact", recording_factory(calls)).model_factory("key", "m")
+    assert calls[0]["system_instruction"] == PROMPT
+    assert calls[1]["system_instruction"] == compact_prompt(PROMPT)
+    assert "```" not in calls[1]["system_instruction"]
+
+def test_accepted_cache_is_used_and_deleted():
+    calls, deleted = [], []
+    cache = PromptCache(PROMPT, "auto", recording_factory(calls), lambda key, model, prompt, ttl: "cache-1",
+                        lambda key, c: deleted.append((key, c)))
+    cache.model_factory("key", "m")
+    cache.model_factory("key", "m")
+    assert [c["cached_content"] for c in calls] == ["cache-1", "cache-1"]
+    cache.close()
+    assert deleted == [("key", "cache-1")]
@@ -0,0 +1,93 @@
+# tests/test_session_catalog.py
+
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.session_catalog import SessionCatalog, lock_session_dir, unlock_session_dir, SESSION_LOCK_FILE, STALE_LOCK_SECONDS
+
+def make_session(temp_dir: str, name: str, size: int = 1000) -> str:
+    path = os.path.join(temp_dir, name)
+    os.makedirs(path)
+    with open(os.path.join(path, "data.bin"), "wb") as f:
+        f.write(b"\0" * size)
+    return path
+
+def test_concurrent_sync_with_disk_does_not_collide(tmp_path):
+    for i in range(20):
+        make_session(str(tmp_path), f"session_{i:02d}")
+    # Mỗi luồng một catalog riêng, như nhiều AppContext cùng mở app_temp
+    catalogs = [SessionCatalog(str(tmp_path)) for _ in range(4)]
+    errors = []
+
+    def sync(catalog):
+        try:
+            catalog.sync_with_disk()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=sync, args=(catalog,)) for catalog in catalogs]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert errors == []
+    assert len(catalogs[0].list_sessions()) == 20
+
+def test_protect_callback_is_asked_before_every_removal(tmp_path):
+    catalog = SessionCatalog(str(tmp_path))
+    for name in ("old", "middle", "new"):
+        catalog.register(name, make_session(str(tmp_path), name))
+        catalog.refresh_size(name)
+    opened = set()
+
+    def protect():
+        # Phiên "new" được mở trong lúc dọn dẹp đang chạy
+        if not opened: opened.add("new")
+        return set(opened)
+
+    removed, _ = catalog.collect_garbage(0, None, protect, grace_seconds=0)
+    assert removed == ["old", "middle"]
+    assert os.path.isdir(os.path.join(str(tmp_path), "new"))
+
+def test_protect_accepts_a_plain_set(tmp_path):
+    catalog = SessionCatalog(str(tmp_path))
+    for name in ("a", "b"):
+        catalog.register(name, make_session(str(tmp_path), name))
+        catalog.refresh_size(name)
+    removed, freed = catalog.collect_garbage(0, None, {"b"}, grace_seconds=0)
+    assert removed == ["a"]
+    assert freed == 1000
+
+def test_recently_used_sessions_survive_a_cleanup_over_quota(tmp_path):
+    catalog = SessionCatalog(str(tmp_path))
+    catalog.register("old", make_session(str(tmp_path), "old"))
+    catalog.register("fresh", make_session(str(tmp_path), "fresh"))
+    catalog.refresh_size("fresh")
+    with catalog._connect() as conn:
+        conn.execute("UPDATE sessions SET updated_at = ?, disk_bytes = 1000 WHERE name = 'old'", (time.time() - 7200,))
+    # Phiên "fresh" có thể đang được một cửa sổ khác dùng mà catalog chưa biết
+    removed, _ = catalog.collect_garbage(0, None, grace_seconds=3600)
+    assert removed == ["old"]
+
+def test_locked_sessions_survive_until_the_lock_is_stale(tmp_path):
+    catalog = SessionCatalog(str(tmp_path))
+    path = make_session(str(tmp_path), "open_elsewhere")
+    catalog.register("open_elsewhere", path)
+    catalog.refresh_size("open_elsewhere")
+    lock_session_dir(path)
+    assert catalog.collect_garbage(0, None, grace_seconds=0)[0] == []
+
+    stale = time.time() - STALE_LOCK_SECONDS - 60
+    os.utime(os.path.join(path, SESSION_LOCK_FILE), (stale, stale))
+    assert catalog.collect_garbage(0, None, grace_seconds=0)[0] == ["open_elsewhere"]
+
+def test_unlocked_session_can_be_collected(tmp_path):
+    catalog = SessionCatalog(str(tmp_path))
+    path = make_session(str(tmp_path), "closed")
+    catalog.register("closed", path)
+    catalog.refresh_size("closed")
+    lock_session_dir(path)
+    unlock_session_dir(path)
+    assert catalog.collect_garbage(0, None, grace_seconds=0)[0] == ["closed"]
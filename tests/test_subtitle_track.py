@@ -0,0 +1,90 @@
+# tests/test_subtitle_track.py
+
+import os
+import sys
+import json
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.subtitle_track import SubtitleTrack, CHANNEL_TOP, CHANNEL_BOTTOM, CHANNEL_NONE
+
+EVENTS = [
+    {"start_srt": "00:00:01,000", "end_srt": "00:00:02,500", "start_ms": 1000, "end_ms": 2500, "image_file": "a.png", "text": "Hello"},
+    {"start_srt": "00:00:00,500", "end_srt": "00:00:01,200", "start_ms": 500, "end_ms": 1200, "image_file": "b.png", "text": "Xin chào\nbạn", "channel": "top"},
+    {"start_srt": "00:00:03,000", "end_srt": "00:00:04,000", "start_ms": 3000, "end_ms": 4000, "image_file": "c.png", "text": "", "channel": "bottom"},
+]
+
+def test_from_events_round_trip():
+    track = SubtitleTrack.from_events(EVENTS)
+    assert track.to_dicts() == EVENTS
+    assert track.channel.tolist() == [CHANNEL_NONE, CHANNEL_TOP, CHANNEL_BOTTOM]
+    assert "channel" not in track[0] and track[1]["channel"] == "top"
+
+def test_from_legacy_events_with_srt_times_only():
+    track = SubtitleTrack.from_events([{"start_srt": "00:01:00,250", "end_srt": "00:01:02,000", "image_file": "x.png"}])
+    assert (track[0]["start_ms"], track[0]["end_ms"], track[0]["text"]) == (60_250, 62_000, "")
+
+def test_event_view_writes_through():
+    track = SubtitleTrack.from_events(EVENTS)
+    track[0]["text"] = "Changed"
+    track[-1]["end_srt"] = "00:00:05,000"
+    assert track.texts[0] == "Changed" and track.end_ms[2] == 5000
+
+def test_slice_is_a_view_and_take_is_a_copy():
+    track = SubtitleTrack.from_events(EVENTS)
+    view, copy = track[0:2], track.take([0, 1])
+    view[0]["text"] = "via view"
+    copy[1]["text"] = "via copy"
+    assert track.texts.tolist() == ["via view", "Xin chào\nbạn", ""]
+
+def test_sort_by_start_keeps_rows_together():
+    track = SubtitleTrack.from_events(EVENTS)
+    track.confidence[:] = [0.1, 0.2, 0.3]
+    order = track.sort_by_start()
+    assert order.tolist() == [1, 0, 2]
+    assert [e["image_file"] for e in track] == ["b.png", "a.png", "c.png"]
+    assert track.texts.tolist() == ["Xin chào\nbạn", "Hello", ""]
+    assert np.allclose(track.confidence, [0.2, 0.1, 0.3])
+
+def test_merge_adjacent_joins_same_text_within_gap_and_channel():
+    track = SubtitleTrack.from_events([
+        {"start_ms": 0, "end_ms": 1000, "image_file": "1.png", "text": "Same", "channel": "bottom"},
+        {"start_ms": 1040, "end_ms": 2000, "image_file": "2.png", "text": "Same", "channel": "bottom"},
+        {"start_ms": 1040, "end_ms": 2000, "image_file": "3.png", "text": "Same", "channel": "top"},
+        {"start_ms": 2500, "end_ms": 3000, "image_file": "4.png", "text": "Same", "channel": "bottom"},
+        {"start_ms": 3000, "end_ms": 3500, "image_file": "5.png", "text": "Other", "channel": "bottom"},
+    ])
+    merged = track.merge_adjacent(max_gap_ms=50)
+    assert [(e["start_ms"], e["end_ms"], e["image_file"], e["channel"]) for e in merged] == [
+        (0, 2000, "1.png", "bottom"),
+        (1040, 2000, "3.png", "top"),
+        (2500, 3000, "4.png", "bottom"),
+        (3000, 3500, "5.png", "bottom"),
+    ]
+
+def test_concat_rebases_image_ids():
+    first, second = SubtitleTrack.from_events(EVENTS[:1]), SubtitleTrack.from_events(EVENTS[1:])
+    joined = SubtitleTrack.concat([first, SubtitleTrack(), second])
+    assert joined.to_dicts() == EVENTS
+
+def test_save_load_round_trip(tmp_path):
+    track = SubtitleTrack.from_events(EVENTS)
+    track.confidence[:] = [0.5, np.nan, 1.0]
+    path = str(tmp_path / "track.npz")
+    track.save(path)
+    loaded = SubtitleTrack.load(path)
+    assert loaded.to_dicts() == EVENTS
+    assert np.array_equal(loaded.confidence, track.confidence, equal_nan=True)
+
+def test_load_version_1_track_without_confidence(tmp_path):
+    # Định dạng trước khi có cột confidence
+    strings = json.dumps({"image_files": ["a.png", "b.png"], "texts": ["One", "Hai"]}, ensure_ascii=False).encode("utf-8")
+    path = str(tmp_path / "v1.npz")
+    with open(path, "wb") as f:
+        np.savez(f, version=np.array([1]), start_ms=np.array([0, 1000], dtype=np.int64), end_ms=np.array([900, 1900], dtype=np.int64),
+                 channel=np.zeros(2, dtype=np.int8), image_id=np.arange(2, dtype=np.int32), strings=np.frombuffer(strings, dtype=np.uint8))
+    loaded = SubtitleTrack.load(path)
+    assert [(e["start_ms"], e["image_file"], e["text"]) for e in loaded] == [(0, "a.png", "One"), (1000, "b.png", "Hai")]
+    assert loaded.confidence.dtype == np.float32 and np.isnan(loaded.confidence).all()
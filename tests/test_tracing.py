@@ -0,0 +1,57 @@
+# tests/test_tracing.py
+
+import os
+import sys
+import json
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.tracing import carry_trace, span, tracing, trace_path, TRACE_DIR_NAME
+
+def span_names(path: str) -> list[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return sorted(e["name"] for e in json.load(f)["traceEvents"] if e["ph"] == "X")
+
+def test_overlapping_jobs_keep_their_own_spans(tmp_path):
+    # Hai job chạy chồng lên nhau trên hai luồng, như hai worker của job server
+    both_open = threading.Barrier(2)
+
+    def job(name):
+        with tracing(str(tmp_path / f"{name}.json")):
+            both_open.wait(5)
+            with span(f"{name}_work"):
+                both_open.wait(5)
+
+    threads = [threading.Thread(target=job, args=(name,)) for name in ("first", "second")]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert span_names(tmp_path / "first.json") == ["first_work"]
+    assert span_names(tmp_path / "second.json") == ["second_work"]
+
+def test_worker_threads_join_the_trace_through_carry_trace(tmp_path):
+    path = str(tmp_path / "trace.json")
+    with tracing(path):
+        def work():
+            with span("worker"):
+                pass
+        carried = carry_trace(work)
+        threads = [threading.Thread(target=carried) for _ in range(3)] + [threading.Thread(target=work)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+    # Luồng không đi qua carry_trace không thấy trace nào
+    assert span_names(path) == ["worker"] * 3
+
+def test_span_outside_tracing_is_a_no_op(tmp_path):
+    with span("nothing", extra=1) as args:
+        args["more"] = 2
+    assert carry_trace(len) is len
+
+def test_traces_are_written_to_their_own_folder(tmp_path):
+    path = trace_path(str(tmp_path), "ocr")
+    assert os.path.dirname(path) == os.path.join(str(tmp_path), TRACE_DIR_NAME)
+    with tracing(path):
+        with span("work"):
+            pass
+    assert span_names(path) == ["work"]
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".json")]
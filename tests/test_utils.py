@@ -0,0 +1,86 @@
+# tests/test_utils.py
+
+import os
+import sys
+from fractions import Fraction
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils import (ms_to_srt_time, srt_time_to_ms, timecode_to_ms, format_time_for_srt,
+                       parse_bdsup2sub_xml, parse_subtitle_edit_html)
+
+@pytest.mark.parametrize("tc, rate, expected", [
+    ("00:00:00:00", "23.976", 0),
+    ("00:00:00:02", "29.97", 67),          # 66.73: làm tròn lên, không cắt xuống 66
+    ("00:00:00:01", "29.97", 33),          # 33.37: làm tròn xuống
+    ("00:00:00:01", "16", 63),             # đúng nửa ms: làm tròn lên
+    ("00:00:00:23", "23.976", 959),        # frame cuối của giây
+    ("00:00:59:29", "30000/1001", 59968),
+    ("01:02:03:04", "25", 3723160),
+    ("00:00:01:00", Fraction(24000, 1001), 1000),
+])
+def test_timecode_to_ms_rounds_to_nearest_millisecond(tc, rate, expected):
+    assert timecode_to_ms(tc, rate) == expected
+
+def test_float_and_string_frame_rates_agree():
+    for frame in range(24):
+        tc = f"00:10:00:{frame:02d}"
+        assert timecode_to_ms(tc, 23.976) == timecode_to_ms(tc, "23.976") == timecode_to_ms(tc, Fraction(23976, 1000))
+
+def test_srt_time_round_trip():
+    for ms in (0, 1, 999, 1000, 59_999, 3_600_000, 86_399_999):
+        assert srt_time_to_ms(ms_to_srt_time(ms)) == ms
+    assert srt_time_to_ms("1:02:03.4") == 3_723_400
+    assert format_time_for_srt("bad", "23.976") == "00:00:00,000"
+
+def write(path, text: str) -> str:
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+def test_bdsup2sub_xml_uses_the_declared_frame_rate(tmp_path):
+    path = write(tmp_path / "sub.xml", """<?xml version="1.0" encoding="UTF-8"?>
+<BDN Version="0.93">
+<Description><Format VideoFormat="1080p" FrameRate="29.97" DropFrame="False"/></Description>
+<Events>
+<Event InTC="00:00:01:02" OutTC="00:00:02:00" Forced="False"><Graphic Width="10" Height="10" X="0" Y="0"> a.png </Graphic></Event>
+<Event InTC="00:00:03:00" OutTC="00:00:04:00" Forced="False"><Graphic Width="10" Height="10" X="0" Y="0"></Graphic></Event>
+<Event InTC="broken" OutTC="00:00:05:00" Forced="False"><Graphic Width="10" Height="10" X="0" Y="0">c.png</Graphic></Event>
+</Events>
+</BDN>
+""")
+    events = parse_bdsup2sub_xml(path)
+    assert [(e["start_ms"], e["end_ms"], e["image_file"]) for e in events] == [(1067, 2000, "a.png"), (0, 0, "c.png")]
+    assert events[0]["start_srt"] == "00:00:01,067"
+
+def test_broken_xml_returns_none(tmp_path):
+    assert parse_bdsup2sub_xml(write(tmp_path / "broken.xml", "<BDN><Events><Event")) is None
+
+def test_html_table_format(tmp_path):
+    path = write(tmp_path / "table.html", """<html><body><table>
+<tr><th>#</th><th>Time</th><th>Dur</th><th>Text</th><th>Image</th></tr>
+<tr><td>1</td><td>00:00:01,500 --> 00:00:03,000</td><td>1.5</td><td></td><td><img src="0001.png"></td></tr>
+<tr><td>2</td><td>00:00:04,000 --> 00:00:05,250</td><td>1.2</td><td></td><td><img src="0002.png"></td></tr>
+</table></body></html>
+""")
+    events = parse_subtitle_edit_html(path)
+    assert [(e["start_ms"], e["end_ms"], e["image_file"]) for e in events] == [(1500, 3000, "0001.png"), (4000, 5250, "0002.png")]
+
+def test_html_body_text_format(tmp_path):
+    path = write(tmp_path / "body.html", "<html><body>\n"
+                 "<div>#1:0:01.500->0:03.000<br /><img src='0001.png' /></div>\n"
+                 "<div>#2:1:00:04.000->1:00:05.250<br /><img src='0002.png' /></div>\n"
+                 "</body></html>\n")
+    events = parse_subtitle_edit_html(path)
+    assert [(e["start_ms"], e["end_ms"], e["image_file"]) for e in events] == [(1500, 3000, "0001.png"), (3_604_000, 3_605_250, "0002.png")]
+    assert events[1]["start_srt"] == "01:00:04,000"
+
+def test_html_table_without_data_rows_falls_back_to_body_text(tmp_path):
+    # Trước đây bảng chỉ có tiêu đề trả về danh sách rỗng; giờ vẫn đọc được phần thân
+    path = write(tmp_path / "mixed.html", "<html><body>\n"
+                 "<table><tr><th>#</th><th>Time</th></tr><tr><td>legend</td></tr></table>\n"
+                 "<div>#1:0:01.500->0:03.000<br /><img src='0001.png' /></div>\n"
+                 "</body></html>\n")
+    events = parse_subtitle_edit_html(path)
+    assert [(e["start_ms"], e["end_ms"], e["image_file"]) for e in events] == [(1500, 3000, "0001.png")]
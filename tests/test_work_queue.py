@@ -0,0 +1,82 @@
+# tests/test_work_queue.py
+
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.work_queue import WorkQueue, merge_segment_events
+
+def make_queue(tmp_path, tasks: int, **kwargs) -> WorkQueue:
+    queue = WorkQueue(str(tmp_path / "work_queue.db"), **kwargs)
+    queue.enqueue("session", "ocr_batch", [{"batch": i} for i in range(tasks)])
+    return queue
+
+def test_two_claimers_never_get_the_same_task(tmp_path):
+    make_queue(tmp_path, 60)
+    claimed, errors = [], []
+    start = threading.Barrier(6)
+
+    def worker(name):
+        # Mỗi worker một WorkQueue riêng, như các tiến trình trên nhiều máy
+        queue = WorkQueue(str(tmp_path / "work_queue.db"))
+        try:
+            start.wait(5)
+            while (task := queue.claim(name)) is not None:
+                claimed.append((task["id"], name))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(6)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert errors == []
+    ids = [task_id for task_id, _ in claimed]
+    assert sorted(ids) == list(range(1, 61))
+
+def test_expired_lease_is_reclaimed_but_heartbeated_one_is_not(tmp_path):
+    queue = make_queue(tmp_path, 2)
+    crashed = queue.claim("crashed", lease_seconds=0.2)
+    alive = queue.claim("alive", lease_seconds=0.2)
+    assert queue.heartbeat(alive, lease_seconds=60)
+    time.sleep(0.3)
+    assert queue.reclaim_expired() == 1
+
+    # Worker bị thu hồi không được ghi kết quả hay gia hạn nữa
+    assert not queue.heartbeat(crashed)
+    assert not queue.complete(crashed, {"texts": {}})
+    retried = queue.claim("other")
+    assert (retried["id"], retried["attempts"]) == (crashed["id"], 2)
+    assert queue.complete(alive, {"texts": {}})
+    assert queue.counts() == {"done": 1, "leased": 1}
+
+def test_expired_lease_fails_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, 1, max_attempts=1)
+    # Lease âm: đã hết hạn ngay khi nhận
+    task = queue.claim("crashed", lease_seconds=-1)
+    assert queue.claim("other") is None
+    assert queue.tasks("session")[0]["state"] == "failed"
+    assert not queue.complete(task, {})
+
+def event(start: int, end: int, channel: str, image: str) -> dict:
+    return {"start_frame": start, "end_frame": end, "start_ms": start * 40, "end_ms": end * 40,
+            "end_srt": f"end {end}", "channel": channel, "image_file": image}
+
+def test_segment_boundary_merges_only_the_continued_event():
+    first = [event(100, 299, "bottom", "a.png"), event(200, 250, "top", "b.png")]
+    second = [
+        event(300, 340, "bottom", "c.png"), # tiếp nối sự kiện bị cắt ở ranh giới
+        event(300, 320, "top", "d.png"),    # kênh top đã tắt từ frame 251: sự kiện mới
+        event(341, 400, "bottom", "e.png"), # sự kiện thứ hai trong đoạn không bao giờ được gộp
+    ]
+    merged = merge_segment_events([first, second])
+    assert [(e["start_frame"], e["end_frame"], e["image_file"]) for e in merged] == [
+        (100, 340, "a.png"), (200, 250, "b.png"), (300, 320, "d.png"), (341, 400, "e.png"),
+    ]
+    assert merged[0]["end_ms"] == 340 * 40 and merged[0]["end_srt"] == "end 340"
+
+def test_segment_gap_is_not_merged():
+    merged = merge_segment_events([[event(0, 299, "bottom", "a.png")], [event(301, 350, "bottom", "b.png")], []])
+    assert [e["image_file"] for e in merged] == ["a.png", "b.png"]